@@ -0,0 +1,162 @@
+"""
+Token authentication with a process-local cache of the token lookups
+"""
+import copy
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+
+def copy_token(token):
+    """
+    Return a copy of the token and its user, requests may change them.
+    """
+    token = copy.copy(token)
+    token.user = copy.copy(token.user)
+    return token
+
+
+class TokenCache:
+    """
+    Maps token keys to their token, user included, so authenticating a
+    request doesn't query the database.
+
+    Entries expire after `TOKEN_AUTH_CACHE_TTL` seconds and the least
+    recently used ones are evicted once `TOKEN_AUTH_CACHE_MAX_SIZE` is
+    reached. Signals drop the entries of a user when their token is deleted
+    or the user is saved in this process.
+
+    With `TOKEN_AUTH_VERSION_CACHE` set to the alias of a cache shared by the
+    processes, the default, each user also has a version number there,
+    bumped on the same signals. An entry cached under an older version is a
+    miss, so a revoked token stops working everywhere right away, for one
+    cache read per request. Without it, the other processes keep
+    authenticating a revoked token for up to the TTL.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, "TOKEN_AUTH_CACHE_TTL", 60)
+
+    @property
+    def max_size(self):
+        return getattr(settings, "TOKEN_AUTH_CACHE_MAX_SIZE", 10000)
+
+    @property
+    def versions(self):
+        alias = getattr(settings, "TOKEN_AUTH_VERSION_CACHE", "")
+        return caches[alias] if alias else None
+
+    def get_version(self, user_id):
+        if self.versions is None:
+            return None
+        # A missing version starts at a random number, so entries cached
+        # before it was evicted can't match again.
+        return self.versions.get_or_set(
+            f"token-version:{user_id}", lambda: secrets.randbits(48), timeout=None
+        )
+
+    def get(self, key):
+        """
+        Return the cached token, or `None` on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] <= self.clock():
+                del self.entries[key]
+                entry = None
+        if entry is not None and entry[1] != self.get_version(entry[0].user_id):
+            with self.lock:
+                self.entries.pop(key, None)
+            entry = None
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return copy_token(entry[0])
+
+    def set(self, key, token):
+        version = self.get_version(token.user_id)
+        with self.lock:
+            self.entries[key] = (copy_token(token), version, self.clock() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        """
+        Drop the entries of a user and, when enabled, bump their version,
+        now and again when the current database transaction commits, so a
+        token authenticated from the rows as they were before the commit
+        isn't kept.
+        """
+        self.drop_user(user_id)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self.drop_user(user_id))
+
+    def drop_user(self, user_id):
+        with self.lock:
+            for key in [
+                key
+                for key, entry in self.entries.items()
+                if entry[0].user_id == user_id
+            ]:
+                del self.entries[key]
+        if self.versions is not None:
+            try:
+                self.versions.incr(f"token-version:{user_id}")
+            except ValueError:
+                # Not set, no entry was cached under a version yet.
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    `TokenAuthentication` answering from the token cache, the database is
+    only queried on a miss. Inactive users and unknown keys aren't cached,
+    they are refused by the query every time.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        return token.user, token
@@ -0,0 +1,30 @@
+"""
+Delete the throttle counters of idle clients
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import ThrottleCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the throttle counters whose window started long enough ago "
+        "that both their counts are expired, such as the ones of anonymous "
+        "clients that never came back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=2 * 24 * 60 * 60,
+            help="Age of the window in seconds, at least twice the longest "
+            "throttle period (two days by default).",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = int(time.time()) - options["older_than"]
+        deleted, _ = ThrottleCounter.objects.filter(window_start__lt=cutoff).delete()
+        self.stdout.write(f"Deleted {deleted} throttle counters.")
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-17 07:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("transactions", "0008_exchange_rates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="base_currency",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="transactions.currencycode",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-17 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0002_user_base_currency"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ThrottleCounter",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("window_start", models.BigIntegerField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("previous_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
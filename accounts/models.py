@@ -14,6 +14,7 @@ class User(AbstractUser):
 
     Attributes:
         uuid (UUIDField): The universally unique identifier for this user.
+        base_currency (ForeignKey): Currency reports are converted to.
     """
 
     uuid = models.UUIDField(
@@ -21,6 +22,39 @@ class User(AbstractUser):
         default=uuid.uuid4,
         editable=False,
     )
+    base_currency = models.ForeignKey(
+        "transactions.CurrencyCode",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        to_field="uuid",
+    )
 
     def __str__(self):
         return self.username
+
+
+class ThrottleCounter(models.Model):
+    """
+    Request counters of a throttle key, shared by every worker process.
+
+    Only the current window and the one before are kept, so a key takes one
+    fixed-size row whatever its rate.
+
+    Attributes:
+        key (CharField): Throttle scope and client, such as `throttle_user_<id>`.
+        window_start (BigIntegerField): Start of the current window, in
+            seconds since the epoch.
+        count (PositiveIntegerField): Requests allowed in the current window.
+        previous_count (PositiveIntegerField): Requests allowed in the window
+            before.
+    """
+
+    key = models.CharField(primary_key=True, max_length=255)
+    window_start = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    previous_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,26 @@
+"""
+Signal handlers for the accounts app
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+
+@receiver(post_delete, sender=Token, dispatch_uid="token_cache_token_delete")
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Stop authenticating a deleted token.
+    """
+    token_cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid="token_cache_user_save")
+@receiver(post_delete, sender=get_user_model(), dispatch_uid="token_cache_user_delete")
+def invalidate_saved_user(sender, instance, **kwargs):
+    """
+    Reload a changed user, and stop authenticating a deactivated one.
+    """
+    token_cache.invalidate(instance.pk)
@@ -0,0 +1,130 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from accounts.authentication import (
+    CachedTokenAuthentication,
+    TokenCache,
+    copy_token,
+    token_cache,
+)
+from transactions.tests.factories import UserFactory
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Test case for authenticating tokens through the token cache and its
+    invalidation.
+    """
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.user = UserFactory()
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def authenticate(self):
+        return self.authentication.authenticate_credentials(self.token.key)
+
+    def test_second_lookup_is_served_from_cache(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+
+        self.assertEqual((user, token), (self.user, self.token))
+        # Every request gets its own copy.
+        self.assertIsNot(self.authenticate()[0], user)
+        self.assertEqual(token_cache.stats()["hits"], 2)
+
+    def test_deleted_tokens_and_inactive_users_are_refused(self):
+        self.authenticate()
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+        self.token = Token.objects.create(user=self.user)
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_entries_cached_before_commit_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # A request authenticated before the commit saw the active user.
+            stale = copy_token(self.token)
+            stale.user.is_active = True
+            token_cache.set(self.token.key, stale)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(TOKEN_AUTH_VERSION_CACHE="default")
+    def test_version_revokes_entries_of_other_processes(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+        # Another process deactivating the user only bumps the version here.
+        token_cache.versions.incr(f"token-version:{self.user.pk}")
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_api_requests_use_the_cache(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        url = reverse("api:transaction-changes")
+
+        client.get(url)
+        # The throttle counter and the changes.
+        with self.assertNumQueries(2):
+            response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        self.assertEqual(client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(TOKEN_AUTH_CACHE_TTL=10, TOKEN_AUTH_CACHE_MAX_SIZE=2)
+class TokenCacheTests(TestCase):
+    """
+    Test case for the expiry and eviction of `TokenCache`.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TokenCache(clock=self.clock)
+        self.tokens = [Token(key=str(index), user=UserFactory()) for index in range(3)]
+
+    def test_entries_expire(self):
+        self.cache.set("0", self.tokens[0])
+        self.assertEqual(self.cache.get("0").user, self.tokens[0].user)
+
+        self.clock.now = 11
+        self.assertIsNone(self.cache.get("0"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set("0", self.tokens[0])
+        self.cache.set("1", self.tokens[1])
+        self.cache.get("0")
+        self.cache.set("2", self.tokens[2])
+
+        self.assertIsNone(self.cache.get("1"))
+        self.assertIsNotNone(self.cache.get("0"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
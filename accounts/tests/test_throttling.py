@@ -0,0 +1,117 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from rest_framework.request import Request
+
+from accounts.models import ThrottleCounter
+from accounts.throttling import SlidingWindowUserRateThrottle, hit
+from transactions.tests.factories import UserFactory
+
+
+class SlidingWindowThrottleTests(TestCase):
+    """
+    Test case for the sliding window estimate of the throttles and their
+    shared counters.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+
+    def setUp(self):
+        super().setUp()
+        request = RequestFactory().get("/")
+        request.user = self.user
+        self.request = Request(request)
+        self.now = 1_000_000.0
+
+    def allow(self, rate="4/m"):
+        with mock.patch.object(
+            SlidingWindowUserRateThrottle, "THROTTLE_RATES", {"user": rate}
+        ):
+            throttle = SlidingWindowUserRateThrottle()
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(self.request, None), throttle
+
+    def test_limits_requests_in_a_window(self):
+        self.now = 960.0  # The start of a minute.
+        results = [self.allow()[0] for _ in range(5)]
+        self.assertEqual(results, [True] * 4 + [False])
+
+        # Refused requests aren't counted.
+        counter = ThrottleCounter.objects.get()
+        self.assertEqual((counter.window_start, counter.count), (960, 4))
+
+    def test_previous_window_counts_in_proportion(self):
+        self.now = 960.0
+        for _ in range(4):
+            self.allow()
+
+        # A quarter into the next window, 3 of the 4 previous requests still
+        # count: one more is allowed.
+        self.now = 1035.0
+        self.assertTrue(self.allow()[0])
+        allowed, throttle = self.allow()
+        self.assertFalse(allowed)
+        counter = ThrottleCounter.objects.get()
+        self.assertEqual((counter.count, counter.previous_count), (1, 4))
+        # Room for one more once 2 previous requests are left, halfway.
+        self.assertAlmostEqual(throttle.wait(), 15)
+
+        # Two windows later nothing is left of the old requests.
+        self.now = 1140.0
+        self.assertTrue(self.allow()[0])
+        counter.refresh_from_db()
+        self.assertEqual((counter.count, counter.previous_count), (1, 0))
+
+    def test_full_window_waits_for_the_next(self):
+        self.now = 990.0
+        for _ in range(4):
+            self.allow()
+        allowed, throttle = self.allow()
+        self.assertFalse(allowed)
+        # 30 seconds to the next window, then 15 more for 1 of the 4 to age.
+        self.assertAlmostEqual(throttle.wait(), 45)
+
+    def test_keys_are_separate(self):
+        self.allow("1/m")
+        self.assertFalse(self.allow("1/m")[0])
+
+        self.request.user = UserFactory()
+        self.assertTrue(self.allow("1/m")[0])
+
+
+class SharedCounterTests(TransactionTestCase):
+    """
+    Test case for concurrent hits on the same counter and for purging the
+    idle ones.
+    """
+
+    def test_concurrent_hits_are_all_counted(self):
+        def run(_):
+            try:
+                return hit("throttle_test", 60, 60)[0]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(4) as pool:
+            counts = list(pool.map(run, range(40)))
+
+        self.assertEqual(sorted(counts), list(range(1, 41)))
+        self.assertEqual(ThrottleCounter.objects.get().count, 40)
+
+    def test_purge_keeps_recent_counters(self):
+        hit("throttle_old", 60, 60)
+        hit("throttle_recent", int(time.time()) // 60 * 60, 60)
+
+        call_command("purge_throttle_counters", stdout=StringIO())
+
+        self.assertEqual(
+            list(ThrottleCounter.objects.values_list("key", flat=True)),
+            ["throttle_recent"],
+        )
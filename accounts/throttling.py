@@ -0,0 +1,117 @@
+"""
+Sliding window throttles counting requests in a shared database table
+"""
+from django.db import connection
+from django.db.models import F
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+from .models import ThrottleCounter
+
+# Counts the request in the key's current window, rolling the counters over
+# when a new window started, and returns both counts. Windows that went back
+# in time, from a clock behind the others, count in the newest one.
+HIT_SQL = """
+INSERT INTO {table} AS counter (key, window_start, count, previous_count)
+VALUES (%(key)s, %(window_start)s, 1, 0)
+ON CONFLICT (key) DO UPDATE SET
+    previous_count = CASE
+        WHEN counter.window_start >= EXCLUDED.window_start
+            THEN counter.previous_count
+        WHEN counter.window_start = EXCLUDED.window_start - %(duration)s
+            THEN counter.count
+        ELSE 0
+    END,
+    count = CASE
+        WHEN counter.window_start >= EXCLUDED.window_start THEN counter.count + 1
+        ELSE 1
+    END,
+    window_start = GREATEST(counter.window_start, EXCLUDED.window_start)
+RETURNING count, previous_count, window_start
+"""
+
+
+def hit(key, window_start, duration):
+    """
+    Count a request of `key` with one statement.
+
+    :return: `(count, previous_count, window_start)` after the request
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            HIT_SQL.format(
+                table=connection.ops.quote_name(ThrottleCounter._meta.db_table)
+            ),
+            {"key": key, "window_start": window_start, "duration": duration},
+        )
+        return cursor.fetchone()
+
+
+def release(key, window_start):
+    """
+    Take back a request counted by `hit` that wasn't allowed.
+    """
+    ThrottleCounter.objects.filter(
+        key=key, window_start=window_start, count__gt=0
+    ).update(count=F("count") - 1)
+
+
+class SlidingWindowRateThrottle:
+    """
+    Replaces the timestamp list of `SimpleRateThrottle` with two counters per
+    key, the requests of the current fixed window and of the one before.
+
+    The rate is estimated as if the previous window's requests were spread
+    evenly: with a fraction `f` of the current window elapsed, the request
+    is allowed while `previous_count * (1 - f) + count` stays within the
+    limit. That is one upsert per request whatever the rate, and the counters
+    live in the database, so every worker process shares them.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window_start = int(self.now // self.duration * self.duration)
+        self.count, self.previous_count, window_start = hit(
+            self.key, window_start, self.duration
+        )
+        self.elapsed = max(self.now - window_start, 0) / self.duration
+        if self.previous_count * (1 - self.elapsed) + self.count <= self.num_requests:
+            return True
+
+        release(self.key, window_start)
+        self.count -= 1
+        return self.throttle_failure()
+
+    def wait(self):
+        """
+        Return the seconds until the estimate leaves room for one request.
+        """
+        room = self.num_requests - self.count - 1
+        if room >= 0:
+            # The previous window's share has to shrink to `room`.
+            elapsed = 1 - room / self.previous_count
+        elif not self.count:
+            # A zero rate, never.
+            return None
+        else:
+            # Only in the next window, once this window's share shrinks.
+            elapsed = 2 - (self.num_requests - 1) / self.count
+        return max(elapsed - self.elapsed, 0) * self.duration
+
+
+class SlidingWindowAnonRateThrottle(SlidingWindowRateThrottle, AnonRateThrottle):
+    """
+    Limits the rate of API calls of anonymous clients, by IP address.
+    """
+
+
+class SlidingWindowUserRateThrottle(SlidingWindowRateThrottle, UserRateThrottle):
+    """
+    Limits the rate of API calls of each authenticated user.
+    """
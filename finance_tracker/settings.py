@@ -25,7 +25,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config("DJANGO_SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config("DJANGO_DEBUG", default=True, cast=bool)
 
 ALLOWED_HOSTS = ["localhost", "127.0.0.1"]
 
@@ -39,9 +39,11 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "accounts",
     "transactions",
-    "debug_toolbar",
+    "jobs",
+    "monitoring",
     "rest_framework",
     "drf_yasg",
     "corsheaders",
@@ -50,6 +52,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "accounts.User"
 
 MIDDLEWARE = [
+    "monitoring.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -58,9 +61,14 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+# The toolbar's middleware is sync only, it would make every ASGI request
+# hold a thread for the whole middleware chain.
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = "finance_tracker.urls"
 
 TEMPLATES = [
@@ -93,6 +101,9 @@ DATABASES = {
         "PASSWORD": "postgres",
         "HOST": "db",
         "PORT": 5432,
+        # Under ASGI every request runs its queries in a thread of its own,
+        # persistent connections would pile up: keep this at 0 there.
+        "CONN_MAX_AGE": config("DATABASE_CONN_MAX_AGE", default=0, cast=int),
     }
 }
 
@@ -126,6 +137,10 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded receipts and their thumbnails
+MEDIA_ROOT = config("MEDIA_ROOT", default=str(BASE_DIR / "media"))
+MEDIA_URL = "media/"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -149,15 +164,138 @@ CORS_LOGGING_LEVEL = "DEBUG"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "accounts.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "accounts.throttling.SlidingWindowAnonRateThrottle",
+        "accounts.throttling.SlidingWindowUserRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {"anon": "100/hour", "user": "1000/hour"},
 }
 
+# Transaction list pagination, clients may ask for smaller or larger pages
+# with `?page_size=` up to the maximum.
+TRANSACTION_PAGE_SIZE = config("TRANSACTION_PAGE_SIZE", default=100, cast=int)
+TRANSACTION_MAX_PAGE_SIZE = config("TRANSACTION_MAX_PAGE_SIZE", default=1000, cast=int)
+
+# Maximum number of rows accepted by the bulk create endpoint.
+TRANSACTION_BULK_MAX_ROWS = config("TRANSACTION_BULK_MAX_ROWS", default=1000, cast=int)
+
+# Rows fetched per round trip by the server-side cursor of exports.
+TRANSACTION_EXPORT_CHUNK_SIZE = config(
+    "TRANSACTION_EXPORT_CHUNK_SIZE", default=2000, cast=int
+)
+
+# Rows written less than this many seconds ago are held back from the
+# changes feed, so a write that commits late isn't skipped by a watermark.
+# LIMIT: a write committing more than this long after stamping `updated_at`
+# can be missed by clients that synced in between. The long writers, the
+# import and the base amount refresh, stamp their rows as late as they can;
+# raise it if other transactions writing transactions run longer.
+TRANSACTION_SYNC_LAG = config("TRANSACTION_SYNC_LAG", default=5, cast=int)
+
+# Process-local cache of the token lookups of the API authentication.
+# `TOKEN_AUTH_VERSION_CACHE` is the alias of a cache shared by the processes
+# holding per-user versions, so a revoked token or deactivated user stops
+# authenticating in every process at once, for one cache read per request.
+# WARNING: set it to "" only with a single process, the others would keep
+# accepting a revoked token for up to `TOKEN_AUTH_CACHE_TTL` seconds.
+TOKEN_AUTH_CACHE_TTL = config("TOKEN_AUTH_CACHE_TTL", default=60, cast=int)
+TOKEN_AUTH_CACHE_MAX_SIZE = config("TOKEN_AUTH_CACHE_MAX_SIZE", default=10000, cast=int)
+TOKEN_AUTH_VERSION_CACHE = config("TOKEN_AUTH_VERSION_CACHE", default="versions")
+
+# Process-local cache of currency, vendor, branch, category and user slugs.
+REFERENCE_CACHE_TTL = config("REFERENCE_CACHE_TTL", default=300, cast=int)
+REFERENCE_CACHE_MAX_SIZE = config("REFERENCE_CACHE_MAX_SIZE", default=10000, cast=int)
+
+# Rendered transaction responses, versioned per user. The versions must be
+# shared by the processes: the default file cache is for the processes of
+# one host, use memcached, redis or the database cache across hosts. A
+# local memory cache only suits a single process, the others would keep
+# serving stale responses for `RESPONSE_CACHE_TTL` after a write. Larger
+# responses than `RESPONSE_CACHE_MAX_SIZE` bytes are skipped.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "responses": {
+        "BACKEND": config(
+            "RESPONSE_CACHE_BACKEND",
+            default="django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": config(
+            "RESPONSE_CACHE_LOCATION", default=str(BASE_DIR / "cache" / "responses")
+        ),
+        "TIMEOUT": config("RESPONSE_CACHE_TTL", default=300, cast=int),
+        "OPTIONS": {
+            "MAX_ENTRIES": config("RESPONSE_CACHE_MAX_ENTRIES", default=5000, cast=int),
+        },
+    },
+    # Versions shared by the processes: of the users' tokens and of the
+    # exchange rate index.
+    "versions": {
+        "BACKEND": config(
+            "VERSION_CACHE_BACKEND",
+            default="django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": config(
+            "VERSION_CACHE_LOCATION", default=str(BASE_DIR / "cache" / "versions")
+        ),
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": TOKEN_AUTH_CACHE_MAX_SIZE},
+    },
+}
+RESPONSE_CACHE_ALIAS = "responses"
+RESPONSE_CACHE_MAX_SIZE = config(
+    "RESPONSE_CACHE_MAX_SIZE", default=1024 * 1024, cast=int
+)
+
+# Cache shared by the processes holding the version of the in-memory
+# exchange rate index, bumped when rates change so every process reloads.
+RATE_INDEX_VERSION_CACHE = config("RATE_INDEX_VERSION_CACHE", default="versions")
+
+# Largest receipt accepted by the chunked upload, in bytes.
+RECEIPT_UPLOAD_MAX_SIZE = config(
+    "RECEIPT_UPLOAD_MAX_SIZE", default=20 * 1024 * 1024, cast=int
+)
+# Seconds an unfinished receipt upload is kept after its last chunk, before
+# `clean_receipt_uploads` deletes it with its part file.
+RECEIPT_UPLOAD_EXPIRY = config("RECEIPT_UPLOAD_EXPIRY", default=24 * 60 * 60, cast=int)
+# Bounding box of the receipt thumbnails, in pixels.
+RECEIPT_THUMBNAIL_SIZE = config("RECEIPT_THUMBNAIL_SIZE", default=256, cast=int)
+
+# Fraction of the requests whose queries, database time and phases are
+# measured and sent back in a `Server-Timing` header, 0 to turn it off.
+# Requests slower than the threshold are logged, sampled or not.
+MONITORING_SAMPLE_RATE = config("MONITORING_SAMPLE_RATE", default=0.0, cast=float)
+MONITORING_SLOW_REQUEST_MS = config(
+    "MONITORING_SLOW_REQUEST_MS", default=1000, cast=int
+)
+
+# Metrics endpoint: the directory where each worker process writes its
+# metrics every few seconds for the scrapes to add up, unset to only report
+# the scraped process. Scrapes must send the token as a bearer; without one
+# the endpoint answers 404 outside of debug mode.
+MONITORING_METRICS_DIR = config("MONITORING_METRICS_DIR", default="")
+MONITORING_METRICS_FLUSH_INTERVAL = config(
+    "MONITORING_METRICS_FLUSH_INTERVAL", default=5, cast=int
+)
+MONITORING_METRICS_TOKEN = config("MONITORING_METRICS_TOKEN", default="")
+
+# Queries slower than this many milliseconds are recorded with their plan in
+# the `SlowQuery` table of the admin, 0 to turn it off.
+MONITORING_SLOW_QUERY_MS = config("MONITORING_SLOW_QUERY_MS", default=500, cast=int)
+
+# Background jobs: attempts before a job fails, the delay before the first
+# retry, doubled after each failure up to the maximum, how often running jobs
+# send a heartbeat, and the seconds without one after which a running job is
+# considered abandoned by its worker. Keep the timeout a few heartbeats long.
+JOB_MAX_ATTEMPTS = config("JOB_MAX_ATTEMPTS", default=5, cast=int)
+JOB_RETRY_BASE_DELAY = config("JOB_RETRY_BASE_DELAY", default=10, cast=int)
+JOB_RETRY_MAX_DELAY = config("JOB_RETRY_MAX_DELAY", default=3600, cast=int)
+JOB_HEARTBEAT_INTERVAL = config("JOB_HEARTBEAT_INTERVAL", default=30, cast=int)
+JOB_LOCK_TIMEOUT = config("JOB_LOCK_TIMEOUT", default=300, cast=int)
+
 
 LOGGING = {
     "version": 1,
@@ -52,6 +52,8 @@ urlpatterns = [
         name="schema-redoc",
     ),
     path("api/v1/", include("transactions.urls", namespace="api")),
+    path("api/v1/", include("jobs.urls", namespace="jobs")),
+    path("", include("monitoring.urls", namespace="monitoring")),
 ]
 
 if settings.DEBUG:
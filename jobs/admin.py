@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    ordering = ["-created_at"]
+    list_display = ("uuid", "name", "user", "status", "attempts", "run_at")
+    list_filter = ("status", "name")
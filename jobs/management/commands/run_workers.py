@@ -0,0 +1,137 @@
+"""
+Run background job workers
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from jobs.queue import claim_job, requeue_stale_jobs, run_job
+
+
+def work(worker, stop, poll_interval, once):
+    """
+    Claim and run jobs until `stop` is set, or until the queue is empty with
+    `once`. Jobs left running by a dead worker are queued again every
+    `JOB_HEARTBEAT_INTERVAL` seconds.
+    """
+    next_requeue = 0.0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            if time.monotonic() >= next_requeue:
+                requeue_stale_jobs()
+                next_requeue = time.monotonic() + settings.JOB_HEARTBEAT_INTERVAL
+            job = claim_job(worker)
+            if job is not None:
+                run_job(job)
+            elif once:
+                break
+            else:
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+def run_process(index, threads, poll_interval, once):
+    """
+    Run `threads` workers in this process until it's asked to stop.
+    """
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    if threads == 1:
+        work(f"{prefix}:0", stop, poll_interval, once)
+        return
+
+    workers = [
+        threading.Thread(
+            target=work,
+            args=(f"{prefix}:{thread}", stop, poll_interval, once),
+            name=f"job-worker-{index}-{thread}",
+        )
+        for thread in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        # Joined with a timeout so the signal handler gets to run.
+        while worker.is_alive():
+            worker.join(timeout=1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background job workers: --processes processes of --threads "
+        "threads each, claiming queued jobs with SKIP LOCKED. Running jobs "
+        "send heartbeats, the ones left without by a dead worker are queued "
+        "again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Worker processes, for CPU bound handlers.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="Worker threads per process, for I/O bound handlers.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds an idle worker waits before looking for jobs again.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for jobs.",
+        )
+
+    def handle(self, *args, **options):
+        processes, threads = options["processes"], options["threads"]
+        if processes < 1 or threads < 1:
+            raise CommandError("--processes and --threads must be at least 1.")
+
+        worker_args = (threads, options["poll_interval"], options["once"])
+        if processes == 1:
+            run_process(0, *worker_args)
+        else:
+            # Children must open their own database connections.
+            connections.close_all()
+            children = [
+                multiprocessing.Process(
+                    target=run_process, args=(index, *worker_args), daemon=False
+                )
+                for index in range(processes)
+            ]
+            for child in children:
+                child.start()
+
+            def terminate(*args):
+                for child in children:
+                    if child.is_alive():
+                        child.terminate()
+
+            signal.signal(signal.SIGTERM, terminate)
+            try:
+                for child in children:
+                    child.join()
+            except KeyboardInterrupt:
+                # The children got the SIGINT too and stop on their own.
+                for child in children:
+                    child.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,82 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Unit of background work, run by a registered handler in a
+    `run_workers` process.
+
+    Queued jobs are claimed with `SELECT ... FOR UPDATE SKIP LOCKED`, so any
+    number of workers share the table without blocking each other. Failed
+    attempts are retried at `run_at`, later after each failure.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    uuid = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+        unique=True,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+        verbose_name="User",
+    )
+    name = models.CharField(max_length=100, verbose_name="Handler name")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Payload")
+    status = models.CharField(
+        max_length=9,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name="Status",
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Attempts")
+    max_attempts = models.PositiveIntegerField(verbose_name="Max attempts")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Run at")
+    locked_by = models.CharField(max_length=255, blank=True, verbose_name="Worker")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Locked at")
+    result = models.JSONField(null=True, blank=True, verbose_name="Result")
+    error = models.TextField(blank=True, verbose_name="Last error")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created at")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated at")
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Finished at"
+    )
+
+    class Meta:
+        indexes = [
+            # Queue of the workers, due jobs first.
+            models.Index(
+                fields=["run_at"],
+                condition=models.Q(status="queued"),
+                name="job_queued_idx",
+            ),
+            # Running jobs, to requeue the ones of dead workers.
+            models.Index(
+                fields=["locked_at"],
+                condition=models.Q(status="running"),
+                name="job_running_idx",
+            ),
+            models.Index(fields=["user", "-created_at"], name="job_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.status} - {self.uuid}"
@@ -0,0 +1,229 @@
+"""
+Job handlers registry, enqueueing, claiming and running of jobs
+"""
+import datetime
+import logging
+import threading
+import traceback
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentJobError(Exception):
+    """
+    Raised by a handler when retrying can't help, the job fails right away.
+    """
+
+
+@dataclass(frozen=True)
+class Handler:
+    """
+    Registered job handler.
+
+    :param public: Whether users may enqueue it through the API
+    :param serializer_class: Serializer validating the payload of the jobs
+    enqueued through the API
+    """
+
+    function: Callable
+    max_attempts: int
+    public: bool
+    serializer_class: type | None
+
+
+handlers: dict[str, Handler] = {}
+
+
+def register(name, max_attempts=None, public=False, serializer_class=None):
+    """
+    Register the decorated function as the handler of the `name` jobs. It's
+    called with the job and returns a JSON serializable result.
+    """
+
+    def decorator(function):
+        handlers[name] = Handler(
+            function=function,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            public=public,
+            serializer_class=serializer_class,
+        )
+        return function
+
+    return decorator
+
+
+def enqueue(name, payload=None, user=None, run_at=None):
+    """
+    Queue a job for the handler `name`. Inside a transaction the job only
+    becomes visible to the workers when it commits.
+    """
+    if name not in handlers:
+        raise KeyError(f"No job handler named '{name}'.")
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        user=user,
+        max_attempts=handlers[name].max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def get_retry_delay(attempts):
+    """
+    Return how long to wait before the next attempt after `attempts` failed
+    ones, doubling from `JOB_RETRY_BASE_DELAY` up to `JOB_RETRY_MAX_DELAY`.
+    """
+    delay = settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    return datetime.timedelta(seconds=min(delay, settings.JOB_RETRY_MAX_DELAY))
+
+
+@transaction.atomic
+def claim_job(worker):
+    """
+    Mark the next due job as running for `worker` and return it, or `None`
+    when the queue is empty.
+
+    Rows locked by other workers are skipped rather than waited for, and the
+    claim commits right away so the job isn't run inside a long transaction.
+    """
+    job = (
+        Job.objects.select_for_update(skip_locked=True)
+        .filter(status=Job.QUEUED, run_at__lte=timezone.now())
+        .order_by("run_at")
+        .first()
+    )
+    if job is None:
+        return None
+    job.status = Job.RUNNING
+    job.attempts += 1
+    job.locked_by = worker
+    job.locked_at = timezone.now()
+    job.save(
+        update_fields=["status", "attempts", "locked_by", "locked_at", "updated_at"]
+    )
+    return job
+
+
+class Heartbeat:
+    """
+    Refreshes the `locked_at` of a running job every `JOB_HEARTBEAT_INTERVAL`
+    seconds from a thread with its own connection, so `requeue_stale_jobs`
+    only takes the jobs of workers that stopped, however long a job runs.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.stop = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name=f"job-heartbeat-{job.pk}", daemon=True
+        )
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop.set()
+        self.thread.join()
+
+    def run(self):
+        try:
+            while not self.stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    Job.objects.filter(
+                        pk=self.job.pk, status=Job.RUNNING, locked_by=self.job.locked_by
+                    ).update(locked_at=timezone.now())
+                except DatabaseError as exc:
+                    logger.warning("Heartbeat of job %s failed: %s", self.job.pk, exc)
+        finally:
+            # Only this thread's connections.
+            connections.close_all()
+
+
+def run_job(job):
+    """
+    Run a claimed job with its handler and record the outcome, queueing it
+    again with a backoff when it failed and has attempts left.
+    """
+    handler = handlers.get(job.name)
+    try:
+        if handler is None:
+            raise PermanentJobError(f"No job handler named '{job.name}'.")
+        with Heartbeat(job):
+            result = handler.function(job)
+    except Exception as exc:
+        job.error = traceback.format_exc()
+        if isinstance(exc, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error("Job %s (%s) failed: %s", job.pk, job.name, exc)
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + get_retry_delay(job.attempts)
+            logger.warning(
+                "Job %s (%s) failed, attempt %s of %s: %s",
+                job.pk,
+                job.name,
+                job.attempts,
+                job.max_attempts,
+                exc,
+            )
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.error = ""
+        job.finished_at = timezone.now()
+    job.locked_by = ""
+    job.locked_at = None
+    job.save(
+        update_fields=[
+            "status",
+            "result",
+            "error",
+            "run_at",
+            "finished_at",
+            "locked_by",
+            "locked_at",
+            "updated_at",
+        ]
+    )
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Queue again the running jobs without a heartbeat for `JOB_LOCK_TIMEOUT`
+    seconds, whose worker died, or fail them when that was their last
+    attempt.
+
+    :return: Number of requeued jobs
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - datetime.timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+    )
+    # Heartbeats and claims never see the jobs failed but the others not
+    # requeued yet.
+    with transaction.atomic():
+        stale.filter(attempts__gte=F("max_attempts")).update(
+            status=Job.FAILED,
+            error="The worker running the job stopped.",
+            finished_at=now,
+            updated_at=now,
+        )
+        requeued = stale.update(
+            status=Job.QUEUED, run_at=now, locked_by="", locked_at=None, updated_at=now
+        )
+    if requeued:
+        logger.warning("Requeued %s jobs of stopped workers.", requeued)
+    return requeued
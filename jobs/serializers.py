@@ -0,0 +1,56 @@
+"""
+Serializers for background jobs
+"""
+from rest_framework import serializers
+
+from .models import Job
+from .queue import handlers
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the status of a job, and for enqueueing the handlers
+    registered as public.
+    """
+
+    class Meta:
+        model = Job
+        fields = [
+            "uuid",
+            "name",
+            "payload",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_at",
+            "result",
+            "error",
+            "created_at",
+            "finished_at",
+        ]
+        read_only_fields = [
+            "uuid",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_at",
+            "result",
+            "error",
+            "created_at",
+            "finished_at",
+        ]
+
+    def validate_name(self, value):
+        handler = handlers.get(value)
+        if handler is None or not handler.public:
+            raise serializers.ValidationError(f"Unknown job '{value}'.")
+        return value
+
+    def validate(self, attrs):
+        serializer_class = handlers[attrs["name"]].serializer_class
+        if serializer_class is not None:
+            payload = serializer_class(data=attrs.get("payload", {}))
+            if not payload.is_valid():
+                raise serializers.ValidationError({"payload": payload.errors})
+            attrs["payload"] = payload.data
+        return attrs
@@ -0,0 +1,269 @@
+import datetime
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from jobs.management.commands.run_workers import work
+from jobs.models import Job
+from jobs.queue import (
+    PermanentJobError,
+    claim_job,
+    enqueue,
+    handlers,
+    register,
+    requeue_stale_jobs,
+    run_job,
+)
+from transactions.tests.factories import (
+    CurrencyCodeFactory,
+    TransactionFactory,
+    UserFactory,
+)
+
+
+def echo(job):
+    return {"payload": job.payload, "worker": job.locked_by}
+
+
+def wait_for_heartbeats(job):
+    time.sleep(0.3)
+    locked_at = Job.objects.get(pk=job.pk).locked_at
+    return {"refreshed": locked_at > job.locked_at}
+
+
+def fail(job):
+    raise ValueError("Temporary failure")
+
+
+def fail_permanently(job):
+    raise PermanentJobError("Bad payload")
+
+
+class JobHandlersMixin:
+    """
+    Registers the test handlers for the duration of a test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        registered = dict(handlers)
+        self.addCleanup(lambda: (handlers.clear(), handlers.update(registered)))
+        register("echo")(echo)
+        register("fail", max_attempts=3)(fail)
+        register("fail_permanently")(fail_permanently)
+        register("wait_for_heartbeats")(wait_for_heartbeats)
+
+
+@override_settings(JOB_RETRY_BASE_DELAY=10, JOB_RETRY_MAX_DELAY=15)
+class JobQueueTests(JobHandlersMixin, TestCase):
+    """
+    Test case for claiming, running and retrying jobs.
+    """
+
+    def claim_due(self, job):
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        return claim_job("test-worker")
+
+    def test_runs_a_job(self):
+        job = enqueue("echo", {"value": 1})
+
+        claimed = claim_job("test-worker")
+
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(claim_job("test-worker"))
+
+        run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {"payload": {"value": 1}, "worker": "test-worker"})
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claims_skip_locked_rows(self):
+        enqueue("echo")
+        with CaptureQueriesContext(connection) as queries:
+            claim_job("test-worker")
+        self.assertTrue(
+            any(
+                query["sql"].endswith("FOR UPDATE SKIP LOCKED")
+                for query in queries.captured_queries
+            )
+        )
+
+    def test_retries_with_backoff(self):
+        job = enqueue("fail")
+
+        delays = []
+        for attempt in range(3):
+            claimed = self.claim_due(job)
+            self.assertEqual(claimed.attempts, attempt + 1)
+            before = timezone.now()
+            run_job(claimed)
+            delays.append(claimed.run_at - before)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("Temporary failure", job.error)
+        # 10 seconds, doubled and capped at 15, then no more retries.
+        self.assertAlmostEqual(delays[0].total_seconds(), 10, delta=1)
+        self.assertAlmostEqual(delays[1].total_seconds(), 15, delta=1)
+
+        # A retry isn't claimed before it's due.
+        job = enqueue("fail")
+        run_job(claim_job("test-worker"))
+        self.assertIsNone(claim_job("test-worker"))
+
+    def test_permanent_errors_and_unknown_handlers_fail_right_away(self):
+        job = enqueue("fail_permanently")
+        run_job(claim_job("test-worker"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+        with self.assertRaises(KeyError):
+            enqueue("no_such_handler")
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_requeues_jobs_of_dead_workers(self):
+        stale = enqueue("echo")
+        last_attempt = enqueue("fail")
+        for job in (stale, last_attempt):
+            claim_job("dead-worker")
+        long_ago = timezone.now() - datetime.timedelta(minutes=5)
+        Job.objects.update(locked_at=long_ago)
+        Job.objects.filter(pk=last_attempt.pk).update(attempts=3)
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        stale.refresh_from_db()
+        last_attempt.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by), (Job.QUEUED, ""))
+        self.assertEqual(last_attempt.status, Job.FAILED)
+
+
+class RunWorkersTests(JobHandlersMixin, TransactionTestCase):
+    """
+    Test case for the `run_workers` command, with real concurrent workers.
+    """
+
+    def run_workers(self, *args):
+        jobs = [enqueue("echo", {"index": index}) for index in range(30)]
+        call_command("run_workers", "--once", *args, stdout=StringIO())
+        return Job.objects.filter(pk__in=[job.pk for job in jobs])
+
+    def test_threads_share_the_queue(self):
+        jobs = self.run_workers("--threads", "4")
+
+        self.assertEqual(
+            set(jobs.values_list("status", "attempts")), {(Job.SUCCEEDED, 1)}
+        )
+        workers = {job.result["worker"] for job in jobs}
+        self.assertLessEqual(len(workers), 4)
+
+    def test_processes_share_the_queue(self):
+        jobs = self.run_workers("--processes", "2", "--threads", "2")
+
+        self.assertEqual(
+            set(jobs.values_list("status", "attempts")), {(Job.SUCCEEDED, 1)}
+        )
+
+    @override_settings(JOB_HEARTBEAT_INTERVAL=0.05)
+    def test_running_jobs_send_heartbeats(self):
+        job = enqueue("wait_for_heartbeats")
+
+        run_job(claim_job("test-worker"))
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, {"refreshed": True})
+        self.assertIsNone(job.locked_at)
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_polling_workers_requeue_stale_jobs(self):
+        job = enqueue("echo")
+        claim_job("dead-worker")
+        long_ago = timezone.now() - datetime.timedelta(minutes=5)
+        Job.objects.filter(pk=job.pk).update(locked_at=long_ago)
+
+        work("test-worker", threading.Event(), poll_interval=0, once=True)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.SUCCEEDED, 2))
+        self.assertEqual(job.result["worker"], "test-worker")
+
+
+class JobViewTests(APITestCase):
+    """
+    Test case for enqueueing jobs and following their status.
+    """
+
+    endpoint_create = "jobs:job-create"
+    endpoint_detail = "jobs:job-detail"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, data):
+        return self.client.post(reverse(self.endpoint_create), data, format="json")
+
+    def test_enqueues_and_reports_a_job(self):
+        response = self.create({"name": "rebuild_monthly_spend"})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], Job.QUEUED)
+        url = reverse(self.endpoint_detail, kwargs={"pk": response.data["uuid"]})
+
+        run_job(claim_job("test-worker"))
+        response = self.client.get(url)
+        self.assertEqual(response.data["status"], Job.SUCCEEDED)
+        self.assertEqual(response.data["result"], {"rows": 0})
+
+        self.client.force_authenticate(user=UserFactory())
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_exports_to_a_file(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        TransactionFactory(user=self.user, currency=CurrencyCodeFactory())
+
+        response = self.create(
+            {"name": "export_transactions", "payload": {"format": "ndjson"}}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.settings(MEDIA_ROOT=media_root):
+            job = run_job(claim_job("test-worker"))
+
+        self.assertEqual(job.status, Job.SUCCEEDED, job.error)
+        name = job.result["file"].rsplit("/exports/", 1)[1]
+        with open(f"{media_root}/exports/{name}") as file:
+            self.assertEqual(len(file.readlines()), 1)
+
+    def test_invalid_jobs(self):
+        cases = [
+            {"name": "no_such_handler"},
+            # Not public: its payload is a server path.
+            {"name": "import_transactions", "payload": {"path": "/etc/passwd"}},
+            {"name": "export_transactions", "payload": {"format": "xml"}},
+            {"name": "export_transactions"},
+        ]
+        for data in cases:
+            with self.subTest(data=data):
+                response = self.create(data)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
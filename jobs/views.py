@@ -0,0 +1,38 @@
+"""
+Views to enqueue background jobs and follow their status
+"""
+from rest_framework.generics import CreateAPIView, RetrieveAPIView
+from rest_framework.permissions import IsAuthenticated
+
+from .models import Job
+from .queue import enqueue
+from .serializers import JobSerializer
+
+
+class JobCreateView(CreateAPIView):
+    """
+    Enqueues a job of a public handler for the user, answered right away
+    with the job to follow at its status endpoint.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = JobSerializer
+
+    def perform_create(self, serializer):
+        serializer.instance = enqueue(
+            serializer.validated_data["name"],
+            serializer.validated_data.get("payload"),
+            user=self.request.user,
+        )
+
+
+class JobDetailView(RetrieveAPIView):
+    """
+    Reports the status, attempts and result or last error of a user's job.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
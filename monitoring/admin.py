@@ -0,0 +1,25 @@
+import json
+
+from django.contrib import admin
+from django.utils.html import format_html
+
+from .models import SlowQuery
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    ordering = ["-max_duration"]
+    list_display = ("__str__", "view", "count", "max_duration", "last_seen")
+    list_filter = ("view",)
+    search_fields = ("shape", "view")
+    exclude = ("plan",)
+    readonly_fields = [
+        field.name for field in SlowQuery._meta.fields if field.name != "plan"
+    ] + ["formatted_plan"]
+
+    @admin.display(description="Latest plan")
+    def formatted_plan(self, obj):
+        return format_html("<pre>{}</pre>", json.dumps(obj.plan, indent=2))
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "monitoring"
+
+    def ready(self):
+        from .instrumentation import install_query_measurement
+        from .slow_queries import install_recorder
+
+        connection_created.connect(
+            install_query_measurement, dispatch_uid="query_measurement"
+        )
+        connection_created.connect(install_recorder, dispatch_uid="slow_queries")
@@ -0,0 +1,89 @@
+"""
+Per-request measurements of the database time and the response phases
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+
+# Measurements of the sampled request being handled, `None` otherwise
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Query count, database time and time per phase of one request, in
+    seconds.
+
+    `execute` is called for each query of the request by `measure_query`.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = defaultdict(float)
+        self.active = set()
+
+    def execute(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.queries += 1
+
+
+def measure_query(execute, sql, params, many, context):
+    """
+    `execute_wrapper` installed on every connection, measuring the queries
+    of the sampled request being handled. The context variable follows the
+    request into the threads `sync_to_async` runs its queries in.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.execute(execute, sql, params, many, context)
+
+
+def install_query_measurement(sender, connection, **kwargs):
+    """
+    `connection_created` receiver adding `measure_query` to a new connection.
+    """
+    if measure_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, measure_query)
+
+
+class phase:
+    """
+    Context manager adding the time spent in its block to the `name` phase
+    of the sampled request. Nested blocks of the same phase only count once,
+    outside a sampled request it does nothing.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.metrics = None
+
+    def __enter__(self):
+        metrics = current_metrics.get()
+        if metrics is not None and self.name not in metrics.active:
+            metrics.active.add(self.name)
+            self.metrics = metrics
+            self.start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.metrics is not None:
+            self.metrics.phases[self.name] += perf_counter() - self.start
+            self.metrics.active.discard(self.name)
+            self.metrics = None
+
+
+class TimedSerializerMixin:
+    """
+    Counts the time spent producing a serializer's `data` in the `serialize`
+    phase of the request.
+    """
+
+    @property
+    def data(self):
+        with phase("serialize"):
+            return super().data
@@ -0,0 +1,361 @@
+"""
+Request metrics of the worker processes, in the Prometheus text format
+"""
+import fcntl
+import glob
+import json
+import os
+import secrets
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Histograms: help text and bucket upper bounds, `+Inf` is implied
+HISTOGRAMS = {
+    "http_request_duration_seconds": (
+        "Request latency by URL name, in seconds.",
+        [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+    ),
+    "http_response_size_bytes": (
+        "Size of the response bodies by URL name, streams excluded.",
+        [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000],
+    ),
+}
+
+# Counters: help text
+COUNTERS = {
+    "http_requests_total": "Requests by URL name, method and status.",
+    "http_sampled_requests_total": "Requests measured by the instrumentation.",
+    "db_queries_total": "Queries of the sampled requests by URL name.",
+    "db_query_duration_seconds_total": (
+        "Database time of the sampled requests by URL name, in seconds."
+    ),
+    "cache_hits_total": "Hits of the process-local counters of each cache.",
+    "cache_misses_total": "Misses of the process-local counters of each cache.",
+}
+
+
+# Snapshot the exited processes of every host are merged into
+EXITED = "exited.json"
+
+
+def get_caches():
+    """
+    Return the caches whose counters are exposed, by name.
+    """
+    from accounts.authentication import token_cache
+    from transactions.cache import reference_cache
+    from transactions.response_cache import response_cache
+
+    return {
+        "response": response_cache,
+        "reference": reference_cache,
+        "token": token_cache,
+    }
+
+
+def get_cache_stats():
+    """
+    Return the `stats()` of the caches, by name.
+    """
+    return {name: cache.stats() for name, cache in get_caches().items()}
+
+
+def new_series():
+    """
+    Return empty counters and histograms, by metric name.
+    """
+    return {
+        "counters": {name: defaultdict(float) for name in COUNTERS},
+        "histograms": {
+            name: defaultdict(lambda buckets=buckets: [0] * (len(buckets) + 3))
+            for name, (_, buckets) in HISTOGRAMS.items()
+        },
+    }
+
+
+def add_snapshot(total, snapshot):
+    """
+    Add the counters and histograms of a snapshot to `total`.
+    """
+    for name, series in snapshot["counters"].items():
+        for key, value in series.items():
+            total["counters"][name][key] += value
+    for name, series in snapshot["histograms"].items():
+        for key, values in series.items():
+            summed = total["histograms"][name][key]
+            for index, value in enumerate(values):
+                summed[index] += value
+
+
+def read_snapshot(path):
+    """
+    Return the snapshot of a file, or `None` when it was removed or isn't
+    ours.
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path, snapshot):
+    """
+    Replace the file at `path` with the snapshot, through a temporary file
+    of this call so concurrent writers never share one.
+    """
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+@contextmanager
+def lock_directory(directory, operation):
+    """
+    Hold a `fcntl.flock` lock on the metrics directory: shared to read the
+    snapshots, exclusive to merge them.
+    """
+    with open(os.path.join(directory, "metrics.lock"), "a") as lock:
+        fcntl.flock(lock, operation)
+        yield
+
+
+def is_exited(path, host):
+    """
+    Whether the snapshot file is one of an exited process of this host.
+    Files of other hosts are left for those to merge.
+    """
+    try:
+        file_host, pid, _ = os.path.basename(path).rsplit("_", 2)
+        pid = int(pid)
+    except ValueError:
+        return False
+    if file_host != host:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def format_labels(labels):
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in labels
+    )
+    return ",".join(f'{name}="{value}"' for name, value in escaped)
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms of this worker process.
+
+    Series are keyed by their `(name, value)` label pairs, turned into JSON
+    only in the snapshots. With `MONITORING_METRICS_DIR` set, the process
+    writes a snapshot to its own file there at most every
+    `MONITORING_METRICS_FLUSH_INTERVAL` seconds and the endpoint sums the
+    files of every process. The files of exited processes are merged into
+    one, so counters never go back and the directory doesn't grow with
+    every restarted worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.pid = os.getpid()
+            self.name = f"{socket.gethostname()}_{self.pid}_{secrets.token_hex(4)}"
+            self.flushed_at = time.monotonic()
+            series = new_series()
+            self.counters = series["counters"]
+            self.histograms = series["histograms"]
+
+    def forked(self):
+        """
+        Start from zero in a forked worker, whose counts and cache counters
+        are its parent's, which the parent reports itself.
+        """
+        # Another thread of the parent may have held them.
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.reset()
+        for cache in get_caches().values():
+            cache.clear()
+
+    def increment(self, name, labels, value=1):
+        with self.lock:
+            self.counters[name][labels] += value
+
+    def observe(self, name, labels, value):
+        """
+        Count `value` in its bucket of the histogram. The last two slots of a
+        series are the sum and the count.
+        """
+        index = bisect_left(HISTOGRAMS[name][1], value)
+        with self.lock:
+            series = self.histograms[name][labels]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def record_request(self, request, response, duration, metrics=None):
+        """
+        Record a request answered by the middleware, with its instrumentation
+        measurements when it was sampled.
+        """
+        match = request.resolver_match
+        view = ("view", match.view_name if match is not None else "unmatched")
+        route = (view, ("method", request.method))
+        self.observe("http_request_duration_seconds", route, duration)
+        self.increment(
+            "http_requests_total", (*route, ("status", response.status_code))
+        )
+        if not response.streaming:
+            self.observe("http_response_size_bytes", (view,), len(response.content))
+        if metrics is not None:
+            self.increment("http_sampled_requests_total", (view,))
+            self.increment("db_queries_total", (view,), metrics.queries)
+            self.increment("db_query_duration_seconds_total", (view,), metrics.db_time)
+        elapsed = time.monotonic() - self.flushed_at
+        if elapsed >= settings.MONITORING_METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            counters = {
+                name: {json.dumps(key): value for key, value in series.items()}
+                for name, series in self.counters.items()
+            }
+            histograms = {
+                name: {json.dumps(key): list(values) for key, values in series.items()}
+                for name, series in self.histograms.items()
+            }
+        for cache, stats in get_cache_stats().items():
+            labels = json.dumps([["cache", cache]])
+            counters["cache_hits_total"][labels] = stats["hits"]
+            counters["cache_misses_total"][labels] = stats["misses"]
+        return {"counters": counters, "histograms": histograms}
+
+    def flush(self):
+        """
+        Write the snapshot to this process' file, when there is a directory.
+        """
+        directory = settings.MONITORING_METRICS_DIR
+        with self.flush_lock:
+            self.flushed_at = time.monotonic()
+            if not directory:
+                return
+            os.makedirs(directory, exist_ok=True)
+            write_snapshot(
+                os.path.join(directory, f"{self.name}.json"), self.snapshot()
+            )
+
+    def merge_exited(self, directory):
+        """
+        Add the snapshots of the exited processes of this host to `EXITED`
+        and remove their files.
+
+        The processes of a host merge under the directory lock. `EXITED`
+        keeps the names it merged last, so files left behind by a merge
+        interrupted before removing them are removed, not counted twice.
+        """
+        host = socket.gethostname()
+        paths = glob.glob(os.path.join(directory, "*.json"))
+        if not any(is_exited(path, host) for path in paths):
+            return
+
+        with lock_directory(directory, fcntl.LOCK_EX):
+            exited_path = os.path.join(directory, EXITED)
+            exited = read_snapshot(exited_path) or {"merged": []}
+            for name in exited["merged"]:
+                if os.path.exists(os.path.join(directory, name)):
+                    os.remove(os.path.join(directory, name))
+
+            paths = [
+                path
+                for path in glob.glob(os.path.join(directory, "*.json"))
+                if is_exited(path, host)
+            ]
+            total = new_series()
+            for snapshot in [exited, *map(read_snapshot, paths)]:
+                if snapshot is not None and "counters" in snapshot:
+                    add_snapshot(total, snapshot)
+            total["merged"] = [os.path.basename(path) for path in paths]
+            write_snapshot(exited_path, total)
+            for path in paths:
+                os.remove(path)
+
+    def collect(self):
+        """
+        Return the snapshots of every process summed, only this process'
+        without a directory.
+        """
+        directory = settings.MONITORING_METRICS_DIR
+        if not directory:
+            return self.snapshot()
+
+        self.flush()
+        self.merge_exited(directory)
+        total = new_series()
+        # A merge in between would count the merged files twice.
+        with lock_directory(directory, fcntl.LOCK_SH):
+            for path in glob.glob(os.path.join(directory, "*.json")):
+                snapshot = read_snapshot(path)
+                if snapshot is not None:
+                    add_snapshot(total, snapshot)
+        return total
+
+    def render(self):
+        """
+        Return the collected metrics in the Prometheus text format.
+        """
+        collected = self.collect()
+        lines = []
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for key, values in sorted(collected["histograms"][name].items()):
+                labels = json.loads(key)
+                cumulative = 0
+                for bound, count in zip([*buckets, "+Inf"], values):
+                    cumulative += count
+                    bucket_labels = format_labels([*labels, ["le", bound]])
+                    lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+                lines.append(f"{name}_sum{{{format_labels(labels)}}} {values[-2]}")
+                lines.append(f"{name}_count{{{format_labels(labels)}}} {values[-1]}")
+        for name, help_text in COUNTERS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for key, value in sorted(collected["counters"][name].items()):
+                lines.append(f"{name}{{{format_labels(json.loads(key))}}} {value}")
+
+        name = "cache_hit_ratio"
+        lines += [
+            f"# HELP {name} Hits over lookups of each cache, all processes.",
+            f"# TYPE {name} gauge",
+        ]
+        for key, hits in sorted(collected["counters"]["cache_hits_total"].items()):
+            lookups = hits + collected["counters"]["cache_misses_total"].get(key, 0)
+            ratio = hits / lookups if lookups else 0.0
+            lines.append(f"{name}{{{format_labels(json.loads(key))}}} {ratio}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+os.register_at_fork(after_in_child=metrics_registry.forked)
@@ -0,0 +1,133 @@
+"""
+Middleware measuring the queries and phases of sampled requests
+"""
+import logging
+import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import RequestMetrics, current_metrics
+from .metrics import metrics_registry
+from .slow_queries import current_request
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentationMiddleware:
+    """
+    Measures a sample of the requests: number of queries and database time
+    through the `measure_query` wrapper of the connections, time spent
+    serializing and rendering, and total time, sent back in a
+    `Server-Timing` header. Every request is recorded in the metrics
+    registry.
+
+    `MONITORING_SAMPLE_RATE` is the fraction of the requests measured, the
+    others only pay for a random number, two clock reads and the metrics
+    update. Requests slower than `MONITORING_SLOW_REQUEST_MS` are logged,
+    with their measurements when sampled.
+
+    Goes first in `MIDDLEWARE`, so the total covers the other middleware.
+    Runs sync or async like the rest of the chain, so it doesn't make ASGI
+    requests hold a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = perf_counter()
+        metrics, tokens = self.begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.end(tokens)
+        return self.finish(request, response, perf_counter() - start, metrics)
+
+    async def __acall__(self, request):
+        start = perf_counter()
+        metrics, tokens = self.begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.end(tokens)
+        return self.finish(request, response, perf_counter() - start, metrics)
+
+    def begin(self, request):
+        """
+        Make the request current, for the slow query log, and start its
+        measurements when sampled.
+
+        :return: `(metrics, tokens)`, `metrics` being `None` when not sampled
+        """
+        # Slow queries are recorded with the view that ran them.
+        tokens = [(current_request, current_request.set(request))]
+        metrics = None
+        if random.random() < settings.MONITORING_SAMPLE_RATE:
+            metrics = RequestMetrics()
+            tokens.append((current_metrics, current_metrics.set(metrics)))
+        return metrics, tokens
+
+    def end(self, tokens):
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+    def finish(self, request, response, total, metrics):
+        if metrics is not None:
+            response["Server-Timing"] = self.get_server_timing(metrics, total)
+        metrics_registry.record_request(request, response, total, metrics)
+        self.log_slow_request(request, response, total, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        Time the rendering of DRF responses, which happens after the view.
+        """
+        metrics = current_metrics.get()
+        if metrics is not None:
+            start = perf_counter()
+
+            def rendered(response):
+                metrics.phases["render"] += perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def get_server_timing(self, metrics, total):
+        entries = [
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"'
+        ]
+        for name, duration in metrics.phases.items():
+            entries.append(f"{name};dur={duration * 1000:.1f}")
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def log_slow_request(self, request, response, total, metrics=None):
+        if total * 1000 < settings.MONITORING_SLOW_REQUEST_MS:
+            return
+        details = ""
+        if metrics is not None:
+            phases = "".join(
+                f" {name}={duration * 1000:.1f}ms"
+                for name, duration in metrics.phases.items()
+            )
+            details = (
+                f" queries={metrics.queries} db={metrics.db_time * 1000:.1f}ms{phases}"
+            )
+        logger.warning(
+            "Slow request %s %s %s total=%.1fms%s",
+            request.method,
+            request.get_full_path(),
+            response.status_code,
+            total * 1000,
+            details,
+        )
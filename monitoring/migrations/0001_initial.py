@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-17 08:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="SlowQuery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "fingerprint",
+                    models.CharField(
+                        max_length=32, unique=True, verbose_name="Shape fingerprint"
+                    ),
+                ),
+                ("shape", models.TextField(verbose_name="Normalized SQL")),
+                ("sql", models.TextField(verbose_name="Latest SQL")),
+                (
+                    "params_fingerprint",
+                    models.CharField(
+                        blank=True,
+                        max_length=32,
+                        verbose_name="Latest parameters fingerprint",
+                    ),
+                ),
+                (
+                    "view",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Latest view"
+                    ),
+                ),
+                (
+                    "plan",
+                    models.JSONField(blank=True, null=True, verbose_name="Latest plan"),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(default=1, verbose_name="Slow runs"),
+                ),
+                ("duration", models.FloatField(verbose_name="Latest duration (ms)")),
+                ("max_duration", models.FloatField(verbose_name="Max duration (ms)")),
+                (
+                    "total_duration",
+                    models.FloatField(verbose_name="Total duration (ms)"),
+                ),
+                (
+                    "first_seen",
+                    models.DateTimeField(auto_now_add=True, verbose_name="First seen"),
+                ),
+                (
+                    "last_seen",
+                    models.DateTimeField(auto_now=True, verbose_name="Last seen"),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "slow queries",
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """
+    Query shape that ran slower than `MONITORING_SLOW_QUERY_MS`, with the
+    plan Postgres picked for its latest slow run.
+
+    Queries differing only by their parameters, literals or the length of
+    their `IN` lists share one row, counted in `count`.
+    """
+
+    fingerprint = models.CharField(
+        max_length=32, unique=True, verbose_name="Shape fingerprint"
+    )
+    shape = models.TextField(verbose_name="Normalized SQL")
+    sql = models.TextField(verbose_name="Latest SQL")
+    params_fingerprint = models.CharField(
+        max_length=32, blank=True, verbose_name="Latest parameters fingerprint"
+    )
+    view = models.CharField(max_length=255, blank=True, verbose_name="Latest view")
+    plan = models.JSONField(null=True, blank=True, verbose_name="Latest plan")
+    count = models.PositiveIntegerField(default=1, verbose_name="Slow runs")
+    duration = models.FloatField(verbose_name="Latest duration (ms)")
+    max_duration = models.FloatField(verbose_name="Max duration (ms)")
+    total_duration = models.FloatField(verbose_name="Total duration (ms)")
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name="First seen")
+    last_seen = models.DateTimeField(auto_now=True, verbose_name="Last seen")
+
+    class Meta:
+        verbose_name_plural = "slow queries"
+
+    def __str__(self):
+        return self.shape[:100]
@@ -0,0 +1,185 @@
+"""
+Recorder of the slow queries of every database connection
+"""
+import hashlib
+import json
+import logging
+import re
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+# Request being handled, set by the instrumentation middleware
+current_request = ContextVar("current_request", default=None)
+
+# Set while a slow query is recorded, so the recorder's own queries aren't
+# recorded too
+recording = ContextVar("recording", default=False)
+
+# Statements `EXPLAIN` accepts
+EXPLAINABLE = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|VALUES)\b", re.I)
+
+NORMALIZATIONS = [
+    # String and number literals
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    # Lists of placeholders, such as `IN (%s, %s, %s)`
+    (re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)"), "(...)"),
+    # Rows of a multi-row `VALUES`
+    (re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+"), r"\1, ..."),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_sql(sql):
+    """
+    Return the shape of a query: its SQL without literals, with placeholder
+    lists and repeated rows collapsed.
+    """
+    for pattern, replacement in NORMALIZATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(value):
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+def get_view_name():
+    request = current_request.get()
+    if request is None:
+        return ""
+    match = request.resolver_match
+    return match.view_name if match is not None else request.path
+
+
+def explain(connection, sql, params):
+    """
+    Return the JSON plan Postgres picks for the query, without running it,
+    or `None` when it can't be explained.
+    """
+    if not EXPLAINABLE.match(sql):
+        return None
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE false, FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+    except Exception:
+        return None
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def record_slow_query(connection, sql, params, many, duration):
+    """
+    Add a run of a slow query to the row of its shape, with its plan.
+
+    The plan is read right away, on the connection that ran the query. In a
+    transaction the row is only written once it commits: holding its lock
+    until then would make the transactions running a slow query of the same
+    shape wait for each other.
+    """
+    shape = normalize_sql(sql)
+    values = {
+        "shape": shape,
+        "sql": sql,
+        "params_fingerprint": fingerprint(repr(params)) if params else "",
+        "view": get_view_name()[:255],
+        "plan": None if many else explain(connection, sql, params),
+        "duration": duration,
+    }
+    if connection.in_atomic_block:
+        transaction.on_commit(
+            lambda: save_slow_query(connection.alias, values),
+            using=connection.alias,
+        )
+    else:
+        save_slow_query(connection.alias, values)
+
+
+def save_slow_query(alias, values):
+    """
+    Upsert the row of a slow query's shape, in a transaction of its own.
+    Failures are logged, the query being recorded already succeeded.
+    """
+    duration = values["duration"]
+    rows = SlowQuery.objects.using(alias).filter(
+        fingerprint=fingerprint(values["shape"])
+    )
+    update = {
+        **values,
+        "count": F("count") + 1,
+        "max_duration": Greatest(F("max_duration"), duration),
+        "total_duration": F("total_duration") + duration,
+        "last_seen": timezone.now(),
+    }
+    token = recording.set(True)
+    try:
+        with transaction.atomic(using=alias):
+            if rows.update(**update):
+                return
+            try:
+                with transaction.atomic(using=alias):
+                    SlowQuery.objects.using(alias).create(
+                        fingerprint=fingerprint(values["shape"]),
+                        max_duration=duration,
+                        total_duration=duration,
+                        **values,
+                    )
+            except IntegrityError:
+                # Recorded concurrently since the update above.
+                rows.update(**update)
+    except DatabaseError:
+        logger.exception("Could not record slow query %s", values["shape"])
+    finally:
+        recording.reset(token)
+
+
+class SlowQueryRecorder:
+    """
+    `execute_wrapper` installed on every new connection, recording the
+    queries slower than `MONITORING_SLOW_QUERY_MS` milliseconds, 0 to turn it
+    off.
+
+    Queries that fail aren't recorded, nor are the ones of a transaction
+    rolled back later.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        threshold = settings.MONITORING_SLOW_QUERY_MS
+        if not threshold or recording.get():
+            return execute(sql, params, many, context)
+
+        start = perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (perf_counter() - start) * 1000
+        if duration >= threshold:
+            token = recording.set(True)
+            try:
+                record_slow_query(connections[self.alias], sql, params, many, duration)
+            finally:
+                recording.reset(token)
+        return result
+
+
+def install_recorder(sender, connection, **kwargs):
+    """
+    `connection_created` receiver adding the recorder to a new connection.
+    """
+    if not any(
+        isinstance(wrapper, SlowQueryRecorder)
+        for wrapper in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(SlowQueryRecorder(connection.alias))
@@ -0,0 +1,209 @@
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from monitoring.metrics import MetricsRegistry, format_labels, metrics_registry
+from transactions.response_cache import response_cache
+from transactions.tests.factories import (
+    CurrencyCodeFactory,
+    TransactionFactory,
+    UserFactory,
+)
+
+
+def parse_metrics(text):
+    """
+    Return `{series: value}` of the samples of a Prometheus text page.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            samples[series] = float(value)
+    return samples
+
+
+@override_settings(MONITORING_METRICS_DIR="", MONITORING_METRICS_TOKEN="secret")
+class MetricsViewTests(APITestCase):
+    """
+    Test case for the metrics endpoint and its aggregation across processes.
+    """
+
+    endpoint_list = "api:transaction-list-create"
+    endpoint_metrics = "monitoring:metrics"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        TransactionFactory.create_batch(
+            2, user=cls.user, currency=CurrencyCodeFactory()
+        )
+
+    def setUp(self):
+        super().setUp()
+        metrics_registry.reset()
+        response_cache.cache.clear()
+        response_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def scrape(self):
+        response = self.client.get(
+            reverse(self.endpoint_metrics), HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return parse_metrics(response.content.decode())
+
+    def test_exposes_latency_sizes_and_cache_ratios(self):
+        url = reverse(self.endpoint_list)
+        for _ in range(3):
+            self.client.get(url)
+
+        samples = self.scrape()
+        labels = 'view="api:transaction-list-create",method="GET"'
+        self.assertEqual(samples[f"http_request_duration_seconds_count{{{labels}}}"], 3)
+        self.assertEqual(
+            samples[f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'], 3
+        )
+        buckets = [
+            value
+            for series, value in samples.items()
+            if series.startswith(f"http_request_duration_seconds_bucket{{{labels}")
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(
+            samples[f'http_requests_total{{{labels},status="200"}}'],
+            3,
+        )
+        self.assertGreater(
+            samples['http_response_size_bytes_sum{view="api:transaction-list-create"}'],
+            0,
+        )
+        # One miss then two hits of the response cache.
+        self.assertAlmostEqual(samples['cache_hit_ratio{cache="response"}'], 2 / 3)
+
+    @override_settings(MONITORING_SAMPLE_RATE=1)
+    def test_counts_queries_of_sampled_requests(self):
+        self.client.get(reverse(self.endpoint_list))
+
+        samples = self.scrape()
+        view = 'view="api:transaction-list-create"'
+        self.assertEqual(samples[f"http_sampled_requests_total{{{view}}}"], 1)
+        self.assertGreater(samples[f"db_queries_total{{{view}}}"], 0)
+        self.assertIn(f"db_query_duration_seconds_total{{{view}}}", samples)
+
+    def test_adds_up_the_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        url = reverse(self.endpoint_list)
+
+        with self.settings(MONITORING_METRICS_DIR=directory):
+            # Another worker process.
+            other = MetricsRegistry()
+            for _ in range(2):
+                other.observe(
+                    "http_request_duration_seconds",
+                    (("view", "api:transaction-list-create"), ("method", "GET")),
+                    0.2,
+                )
+            other.flush()
+            self.client.get(url)
+
+            samples = self.scrape()
+
+        self.assertEqual(len(glob.glob(os.path.join(directory, "*.json"))), 2)
+        labels = 'view="api:transaction-list-create",method="GET"'
+        self.assertEqual(samples[f"http_request_duration_seconds_count{{{labels}}}"], 3)
+        self.assertEqual(
+            samples[f'http_request_duration_seconds_bucket{{{labels},le="0.25"}}'],
+            samples[f'http_request_duration_seconds_bucket{{{labels},le="0.1"}}'] + 2,
+        )
+
+    def test_exited_processes_are_merged(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        process = subprocess.Popen([sys.executable, "-c", ""])
+        process.wait()
+        labels = (("view", "api:transaction-list-create"), ("method", "GET"))
+        series = f'http_requests_total{{{format_labels(labels)},status="200"}}'
+
+        with self.settings(MONITORING_METRICS_DIR=directory):
+            for index in range(2):
+                exited = MetricsRegistry()
+                exited.name = f"{socket.gethostname()}_{process.pid}_{index}"
+                exited.increment("http_requests_total", (*labels, ("status", 200)))
+                exited.flush()
+            self.client.get(reverse(self.endpoint_list))
+
+            self.assertEqual(self.scrape()[series], 3)
+            self.assertEqual(self.scrape()[series], 3)
+
+        self.assertEqual(
+            sorted(os.listdir(directory)),
+            sorted(["exited.json", f"{metrics_registry.name}.json", "metrics.lock"]),
+        )
+
+    def test_concurrent_flushes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(20):
+                    metrics_registry.flush()
+            except Exception as error:
+                errors.append(error)
+
+        with self.settings(MONITORING_METRICS_DIR=directory):
+            threads = [threading.Thread(target=flush) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(directory), [f"{metrics_registry.name}.json"])
+
+    def test_forked_workers_start_from_zero(self):
+        self.client.get(reverse(self.endpoint_list))
+        name = metrics_registry.name
+
+        metrics_registry.forked()
+
+        self.assertNotEqual(metrics_registry.name, name)
+        samples = parse_metrics(metrics_registry.render())
+        self.assertEqual(samples['cache_misses_total{cache="response"}'], 0)
+        self.assertFalse(any(series.startswith("http_requests") for series in samples))
+
+    def test_token(self):
+        url = reverse(self.endpoint_metrics)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer other")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.scrape()
+
+    @override_settings(MONITORING_METRICS_TOKEN="")
+    def test_without_a_token_only_served_in_debug_mode(self):
+        url = reverse(self.endpoint_metrics)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_labels_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.increment("http_requests_total", (("view", 'a"b\\c'),))
+        samples = parse_metrics(registry.render())
+        self.assertEqual(samples['http_requests_total{view="a\\"b\\\\c"}'], 1)
@@ -0,0 +1,114 @@
+import re
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from monitoring.instrumentation import RequestMetrics, current_metrics, phase
+from monitoring.middleware import InstrumentationMiddleware
+from transactions.response_cache import response_cache
+from transactions.tests.factories import (
+    CurrencyCodeFactory,
+    TransactionFactory,
+    UserFactory,
+)
+
+
+def parse_server_timing(header):
+    """
+    Return `{name: (duration, description)}` of a `Server-Timing` header.
+    """
+    timings = {}
+    for entry in header.split(", "):
+        match = re.fullmatch(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', entry)
+        timings[match[1]] = (float(match[2]), match[3])
+    return timings
+
+
+class InstrumentationMiddlewareTests(APITestCase):
+    """
+    Test case for the measurements of sampled requests and the slow request
+    log.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.token = Token.objects.create(user=cls.user)
+        TransactionFactory.create_batch(
+            3, user=cls.user, currency=CurrencyCodeFactory()
+        )
+
+    def setUp(self):
+        super().setUp()
+        response_cache.cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(MONITORING_SAMPLE_RATE=1)
+    def test_sampled_requests_get_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("api:transaction-list-create"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timings = parse_server_timing(response["Server-Timing"])
+        self.assertEqual(timings["db"][1], f"{len(queries)} queries")
+        self.assertEqual(set(timings), {"db", "serialize", "render", "total"}, timings)
+        self.assertLessEqual(timings["db"][0], timings["total"][0])
+
+    @override_settings(MONITORING_SAMPLE_RATE=1)
+    async def test_async_requests_are_measured(self):
+        response = await self.async_client.get(
+            reverse("api:transaction-list-async"),
+            headers={"Authorization": f"Token {self.token.key}"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timings = parse_server_timing(response["Server-Timing"])
+        # The queries run in sync_to_async threads, on their own connections.
+        self.assertNotEqual(timings["db"][1], "0 queries")
+
+    def test_runs_async_in_an_async_chain(self):
+        async def get_response(request):
+            pass
+
+        self.assertTrue(iscoroutinefunction(InstrumentationMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(InstrumentationMiddleware(lambda r: r)))
+
+    @override_settings(MONITORING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get(reverse("api:transaction-list-create"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(MONITORING_SAMPLE_RATE=0, MONITORING_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged(self):
+        url = reverse("api:transaction-list-create")
+        with self.assertLogs("monitoring.middleware", "WARNING") as logs:
+            self.client.get(url)
+            with self.settings(MONITORING_SAMPLE_RATE=1):
+                self.client.get(url, {"page_size": 1})
+
+        self.assertIn(f"Slow request GET {url} 200 total=", logs.output[0])
+        self.assertNotIn("queries=", logs.output[0])
+        self.assertIn("queries=", logs.output[1])
+        self.assertIn("serialize=", logs.output[1])
+
+    def test_nested_phases_count_once(self):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        self.addCleanup(current_metrics.reset, token)
+
+        with phase("serialize"):
+            with phase("serialize"):
+                pass
+            with phase("other"):
+                pass
+
+        self.assertEqual(set(metrics.phases), {"serialize", "other"})
+        self.assertGreaterEqual(metrics.phases["serialize"], metrics.phases["other"])
+        self.assertEqual(metrics.active, set())
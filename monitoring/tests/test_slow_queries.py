@@ -0,0 +1,182 @@
+import threading
+
+from django.contrib.admin.sites import site
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from monitoring.models import SlowQuery
+from monitoring.slow_queries import SlowQueryRecorder, normalize_sql
+from transactions.response_cache import response_cache
+from transactions.tests.factories import (
+    CurrencyCodeFactory,
+    TransactionFactory,
+    UserFactory,
+)
+
+
+class NormalizeSQLTests(TestCase):
+    """
+    Test case for the query shapes slow queries are grouped by.
+    """
+
+    def test_literals_are_replaced(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 'x''y' AND b = 4.5 LIMIT 21"),
+            "SELECT * FROM t WHERE a = ? AND b = ? LIMIT ?",
+        )
+
+    def test_lists_are_collapsed(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s,\n  %s)"),
+            normalize_sql("SELECT * FROM t WHERE id IN (%s)"),
+        )
+        self.assertEqual(
+            normalize_sql("INSERT INTO t VALUES (%s, %s), (%s, %s), (%s, %s)"),
+            "INSERT INTO t VALUES (...), ...",
+        )
+
+    def test_table_names_with_digits_are_kept(self):
+        self.assertEqual(
+            normalize_sql('SELECT "t2"."id" FROM "t2"'), 'SELECT "t2"."id" FROM "t2"'
+        )
+
+
+class SlowQueryRecorderTests(TestCase):
+    """
+    Test case for the recording of slow queries and their plans.
+    """
+
+    def test_recorder_is_installed(self):
+        connection.ensure_connection()
+        self.assertEqual(
+            sum(
+                isinstance(wrapper, SlowQueryRecorder)
+                for wrapper in connection.execute_wrappers
+            ),
+            1,
+        )
+
+    @override_settings(MONITORING_SLOW_QUERY_MS=5)
+    def test_slow_queries_are_recorded_once_per_shape(self):
+        with self.captureOnCommitCallbacks(execute=True), connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_sleep(0.01)")
+            cursor.execute("SELECT 1 FROM pg_sleep(%s)", [0.02])
+            cursor.execute("SELECT 1 FROM pg_sleep(%s)", [0.01])
+            cursor.execute("SELECT 1")
+
+        slow_query = SlowQuery.objects.get()
+        self.assertEqual(slow_query.shape, "SELECT ? FROM pg_sleep(...)")
+        self.assertEqual(slow_query.count, 3)
+        self.assertEqual(slow_query.sql, "SELECT 1 FROM pg_sleep(%s)")
+        self.assertGreaterEqual(slow_query.max_duration, 20)
+        self.assertGreaterEqual(slow_query.total_duration, 40)
+        self.assertLess(slow_query.duration, slow_query.max_duration)
+        self.assertEqual(slow_query.view, "")
+        self.assertEqual(slow_query.plan[0]["Plan"]["Node Type"], "Function Scan")
+
+    @override_settings(MONITORING_SLOW_QUERY_MS=0)
+    def test_threshold_zero_turns_recording_off(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_sleep(0.01)")
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    @override_settings(MONITORING_SLOW_QUERY_MS=5)
+    def test_statements_without_a_plan_are_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True), connection.cursor() as cursor:
+            cursor.execute("DO $$ BEGIN PERFORM pg_sleep(0.01); END $$")
+
+        slow_query = SlowQuery.objects.get()
+        self.assertIsNone(slow_query.plan)
+
+    @override_settings(MONITORING_SLOW_QUERY_MS=5)
+    def test_rolled_back_queries_are_not_recorded(self):
+        with self.assertRaises(DatabaseError):
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute("SELECT 1 FROM pg_sleep(0.01)")
+                    cursor.execute("SELECT 1 / 0")
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_admin_is_registered(self):
+        self.assertIn(SlowQuery, site._registry)
+
+
+class SlowQueryViewTests(APITestCase):
+    """
+    Test case for the view recorded with the slow queries of a request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        TransactionFactory.create_batch(
+            3, user=cls.user, currency=CurrencyCodeFactory()
+        )
+
+    def setUp(self):
+        super().setUp()
+        response_cache.cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_queries_are_recorded_with_their_view(self):
+        # Every query is slow with a threshold this low.
+        with override_settings(MONITORING_SLOW_QUERY_MS=0.0001):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(reverse("api:transaction-list-create"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        views = set(SlowQuery.objects.values_list("view", flat=True))
+        self.assertEqual(views, {"api:transaction-list-create"})
+        self.assertTrue(
+            SlowQuery.objects.filter(
+                shape__contains="transactions_transaction", plan__isnull=False
+            ).exists()
+        )
+
+
+class ConcurrentSlowQueryTests(TransactionTestCase):
+    """
+    Test case for slow queries recorded by concurrent transactions.
+    """
+
+    def run_in_thread(self, target):
+        def run():
+            try:
+                target()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    @override_settings(MONITORING_SLOW_QUERY_MS=5)
+    def test_transactions_do_not_wait_for_each_other(self):
+        first_ran = threading.Event()
+        second_ran = threading.Event()
+
+        def first():
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_sleep(0.01)")
+                first_ran.set()
+                # Still in its transaction until the second one ran.
+                second_ran.wait(5)
+
+        def second():
+            first_ran.wait(5)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_sleep(0.01)")
+            second_ran.set()
+
+        self.run_in_thread(first)
+        self.run_in_thread(second)
+
+        self.assertTrue(second_ran.wait(2))
+        self.doCleanups()
+        self.assertEqual(SlowQuery.objects.get().count, 2)
@@ -0,0 +1,36 @@
+"""
+Metrics endpoint for Prometheus scrapes
+"""
+import secrets
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views import View
+
+from .metrics import metrics_registry
+
+
+class MetricsView(View):
+    """
+    Exposes the metrics of every worker process in the Prometheus text
+    format.
+
+    A plain Django view, so scrapes aren't throttled. Scrapes must send
+    `MONITORING_METRICS_TOKEN` as `Authorization: Bearer <token>`. Without a
+    token the endpoint only exists in debug mode, it would expose the
+    routes and their timings to anyone.
+    """
+
+    http_method_names = ["get"]
+
+    def get(self, request, *args, **kwargs):
+        token = settings.MONITORING_METRICS_TOKEN
+        if not token and not settings.DEBUG:
+            raise Http404
+        if token and not secrets.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        ):
+            return HttpResponseForbidden()
+        return HttpResponse(
+            metrics_registry.render(), content_type="text/plain; version=0.0.4"
+        )
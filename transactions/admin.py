@@ -5,7 +5,10 @@ from .models import (
     Category,
     CurrencyCode,
     CurrencyData,
+    ExchangeRate,
+    MonthlySpend,
     ParentCategory,
+    ReceiptBlob,
     Tag,
     Transaction,
     TransactionTag,
@@ -48,6 +51,18 @@ class CurrencyDataAdmin(admin.ModelAdmin):
     list_display = ("uuid", "country", "currency_name", "currency_code")
 
 
+class ExchangeRateAdmin(admin.ModelAdmin):
+    ordering = ["base_currency__code", "quote_currency__code", "-date"]
+    list_display = ("uuid", "base_currency", "quote_currency", "date", "rate")
+    list_filter = ("base_currency", "quote_currency")
+
+
+class ReceiptBlobAdmin(admin.ModelAdmin):
+    ordering = ["-created_at"]
+    list_display = ("sha256", "file", "size", "content_type", "thumbnail_status")
+    list_filter = ("thumbnail_status",)
+
+
 class TagAdmin(admin.ModelAdmin):
     ordering = ["name"]
     list_display = ("uuid", "name", "created_at")
@@ -76,11 +91,12 @@ class TransactionAdmin(admin.ModelAdmin):
     )
     list_filter = [
         "type",
+        "is_deleted",
     ]
 
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.prefetch_related("transactiontag_set__tag")
+        # Include soft deleted transactions, so they can be restored.
+        return Transaction.all_objects.prefetch_related("transactiontag_set__tag")
 
     def tag_list(self, obj):
         return ", ".join(
@@ -97,6 +113,12 @@ class TransactionTagAdmin(admin.ModelAdmin):
     list_filter = ("tag",)
 
 
+class MonthlySpendAdmin(admin.ModelAdmin):
+    ordering = ["user", "-month"]
+    list_display = ("user", "month", "category", "type", "currency", "total", "count")
+    list_filter = ("type",)
+
+
 # Register the models and their associated admin classes
 admin.site.register(ParentCategory, ParentCategoryAdmin)
 admin.site.register(Category, CategoryAdmin)
@@ -104,6 +126,9 @@ admin.site.register(Branch, BranchAdmin)
 admin.site.register(Vendor, VendorAdmin)
 admin.site.register(CurrencyCode, CurrencyCodeAdmin)
 admin.site.register(CurrencyData, CurrencyDataAdmin)
+admin.site.register(ExchangeRate, ExchangeRateAdmin)
+admin.site.register(ReceiptBlob, ReceiptBlobAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Transaction, TransactionAdmin)
 admin.site.register(TransactionTag, TransactionTagAdmin)
+admin.site.register(MonthlySpend, MonthlySpendAdmin)
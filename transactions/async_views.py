@@ -0,0 +1,155 @@
+"""
+Async read-only transaction views for ASGI deployments
+
+DRF views are synchronous, so these are plain Django async views. Under
+ASGI a request only occupies a thread while one of its queries runs, not
+for its whole life, so one worker process serves many slow requests at
+once. They answer like their DRF counterparts, rendered as JSON only.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from accounts.authentication import CachedTokenAuthentication
+
+from .conditional import (
+    LIST_STATS,
+    get_detail_validators,
+    get_list_validators,
+    get_not_modified_response,
+    set_validators,
+)
+from .models import Transaction
+from .pagination import TransactionCursorPagination
+from .serializers import TransactionSerializer
+from .views import TransactionListQueryMixin
+
+
+async def authenticate(request):
+    """
+    Return the active user of the request's `Authorization: Token <key>`
+    header, through the token cache like the DRF views.
+
+    :raises NotAuthenticated: Without a token
+    :raises AuthenticationFailed: For an unknown token or an inactive user
+    """
+    auth = request.headers.get("Authorization", "").split()
+    if not auth or auth[0].lower() != "token":
+        raise exceptions.NotAuthenticated()
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed("Invalid token header.")
+    authentication = CachedTokenAuthentication()
+    user, _ = await sync_to_async(authentication.authenticate_credentials)(auth[1])
+    return user
+
+
+def render(data, status=200):
+    """
+    Return a JSON response of `data`.
+    """
+    return HttpResponse(
+        JSONRenderer().render(data), status=status, content_type="application/json"
+    )
+
+
+class AsyncTransactionView(View):
+    """
+    Base of the async views: authenticates and throttles the request and
+    turns API exceptions into responses like DRF does.
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    async def check_throttles(self):
+        """
+        Apply the configured throttle classes, which count in the same
+        shared table as for the DRF views.
+
+        :raises Throttled: When one of them refuses the request
+        """
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            if not await sync_to_async(throttle.allow_request)(self.request, self):
+                raise exceptions.Throttled(throttle.wait())
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            user = await authenticate(request)
+            # Wrapped for the query params and absolute urls the pagination
+            # and serializers use.
+            self.request = Request(request)
+            self.request.user = user
+            await self.check_throttles()
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            detail = exc.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {"detail": detail}
+            response = render(detail, status=exc.status_code)
+            if isinstance(
+                exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+            ):
+                response["WWW-Authenticate"] = "Token"
+            if getattr(exc, "wait", None):
+                response["Retry-After"] = f"{exc.wait:d}"
+            return response
+
+
+class AsyncTransactionListView(TransactionListQueryMixin, AsyncTransactionView):
+    """
+    Async listing of the user's transactions, with the filters, ordering,
+    cursor pagination and validators of `TransactionListCreateView`.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        # Building the queryset may query the database when searching.
+        queryset = await sync_to_async(self.get_queryset)()
+
+        stats = await Transaction.all_objects.filter(user=self.request.user).aaggregate(
+            **LIST_STATS
+        )
+        etag, last_modified = get_list_validators(
+            self.request.user, stats, "json", self.request.query_params
+        )
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return set_validators(response, etag, last_modified)
+
+        paginator = TransactionCursorPagination()
+        page_queryset = paginator.get_page_queryset(queryset, self.request, self)
+        page = paginator.set_page(
+            [row async for row in page_queryset.aiterator(chunk_size=paginator.limit)]
+        )
+        data = TransactionSerializer(
+            page, many=True, context={"request": self.request}
+        ).data
+        response = render(paginator.get_paginated_response(data).data)
+        return set_validators(response, etag, last_modified)
+
+
+class AsyncTransactionDetailView(AsyncTransactionView):
+    """
+    Async retrieval of one of the user's transactions, soft deleted ones
+    included, with the validators of `TransactionRetrieveUpdateDestroyView`.
+    """
+
+    async def get(self, request, pk, *args, **kwargs):
+        queryset = Transaction.all_objects.filter(user=self.request.user)
+        updated_at = (
+            await queryset.filter(pk=pk).values_list("updated_at", flat=True).afirst()
+        )
+        if updated_at is None:
+            raise exceptions.NotFound("No Transaction matches the given query.")
+
+        etag, last_modified = get_detail_validators(pk, updated_at, "json")
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return set_validators(response, etag, last_modified)
+
+        instance = await TransactionSerializer.optimize_queryset(queryset).aget(pk=pk)
+        data = TransactionSerializer(instance, context={"request": self.request}).data
+        return set_validators(render(data), etag, last_modified)
@@ -0,0 +1,132 @@
+"""
+Single statement bulk writes of transactions that keep the rollup in step
+"""
+from django.db import models, transaction
+from django.utils import timezone
+
+from .exchange import refresh_base_amounts
+from .models import Transaction
+from .response_cache import response_cache
+from .rollups import ROLLUP_FIELDS, add_rows, apply_changes
+
+# Fields a bulk update may set, none of them part of the search vector
+BULK_UPDATE_FIELDS = [
+    "category",
+    "vendor",
+    "branch",
+    "payment_method",
+    "currency",
+    "type",
+]
+
+
+class TooManyRows(Exception):
+    """
+    Raised when a bulk write matches more rows than it may change at once.
+    """
+
+    def __init__(self, max_rows):
+        super().__init__(max_rows)
+        self.max_rows = max_rows
+
+
+def lock_rows(queryset, max_rows=None):
+    """
+    Lock the rows of `queryset` and return their primary keys,
+    `ROLLUP_FIELDS` and `is_deleted`, so the rollup can be adjusted for
+    exactly the rows the following `UPDATE` writes.
+
+    :raise TooManyRows: When there are more than `max_rows` rows, before any
+    is written
+    """
+    queryset = queryset.select_for_update()
+    if max_rows is not None:
+        queryset = queryset.order_by("pk")[: max_rows + 1]
+    rows = list(queryset.values("pk", *ROLLUP_FIELDS, "is_deleted"))
+    if max_rows is not None and len(rows) > max_rows:
+        raise TooManyRows(max_rows)
+    return rows
+
+
+def invalidate_owners(rows):
+    """
+    Make the cached responses of the owners of `rows` stale, the `UPDATE`
+    bypasses the signals.
+    """
+    response_cache.invalidate(*{row["user_id"] for row in rows})
+
+
+@transaction.atomic
+def soft_delete_transactions(queryset, deleted_by=None):
+    """
+    Soft delete the live transactions of `queryset` with one `UPDATE`,
+    removing them from the monthly rollup.
+
+    :return: Number of deleted transactions
+    """
+    rows = lock_rows(queryset.filter(is_deleted=False))
+    if not rows:
+        return 0
+    deleted = Transaction.all_objects.filter(
+        pk__in=[row["pk"] for row in rows]
+    ).soft_delete(deleted_by=deleted_by)
+    add_rows(rows, -1)
+    invalidate_owners(rows)
+    return deleted
+
+
+@transaction.atomic
+def undelete_transactions(queryset, undeleted_by=None):
+    """
+    Restore the soft deleted transactions of `queryset` with one `UPDATE`,
+    adding them back to the monthly rollup.
+
+    :return: Number of restored transactions
+    """
+    rows = lock_rows(queryset.filter(is_deleted=True))
+    if not rows:
+        return 0
+    restored = Transaction.all_objects.filter(
+        pk__in=[row["pk"] for row in rows]
+    ).undelete(undeleted_by=undeleted_by)
+    add_rows(rows, 1)
+    invalidate_owners(rows)
+    return restored
+
+
+@transaction.atomic
+def update_transactions(queryset, values, updated_by=None, max_rows=None):
+    """
+    Set `values` on the transactions of `queryset` with one `UPDATE`, moving
+    them in the monthly rollup and converting their base amount again when
+    the currency changes.
+
+    :param values: Mapping of `BULK_UPDATE_FIELDS` to their new value, model
+    instances for the foreign keys
+    :param max_rows: Most transactions `queryset` may match
+    :return: Number of updated transactions
+    :raise TooManyRows: When `queryset` matches more than `max_rows`
+    """
+    rows = lock_rows(queryset, max_rows)
+    if not rows:
+        return 0
+    pks = [row["pk"] for row in rows]
+    updated = Transaction.all_objects.filter(pk__in=pks).update(
+        **values, updated_by=updated_by, updated_at=timezone.now()
+    )
+
+    # The rollup is keyed by column values, `category_id` rather than
+    # `category`.
+    new_values = {}
+    for name, value in values.items():
+        field = Transaction._meta.get_field(name)
+        if isinstance(value, models.Model):
+            value = getattr(value, field.target_field.attname)
+        new_values[field.attname] = value
+    if new_values.keys() & set(ROLLUP_FIELDS):
+        apply_changes((row, {**row, **new_values}) for row in rows)
+
+    if "currency" in values:
+        refresh_base_amounts(Transaction.all_objects.filter(pk__in=pks))
+    invalidate_owners(rows)
+    return updated
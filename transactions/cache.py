@@ -0,0 +1,89 @@
+"""
+Process-local cache of slow changing reference data
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class ReferenceCache:
+    """
+    Maps `(model, slug field, slug)` to the primary key of the row with that
+    slug, so serializers can resolve references without a query per field.
+
+    Entries expire after `REFERENCE_CACHE_TTL` seconds and the least recently
+    used ones are evicted once `REFERENCE_CACHE_MAX_SIZE` is reached. The
+    cache lives in each worker process: signals drop the entries of a model
+    when it changes in this process, the TTL bounds how stale the other
+    processes can get.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, "REFERENCE_CACHE_TTL", 300)
+
+    @property
+    def max_size(self):
+        return getattr(settings, "REFERENCE_CACHE_MAX_SIZE", 10000)
+
+    def get(self, model, slug_field, value):
+        """
+        Return the cached primary key for the slug, or `None` on a miss.
+        """
+        key = (model, slug_field, value)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= self.clock():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, model, slug_field, value, pk):
+        key = (model, slug_field, value)
+        with self.lock:
+            self.entries[key] = (pk, self.clock() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, model):
+        """
+        Drop every entry of the given model.
+        """
+        with self.lock:
+            for key in [key for key in self.entries if key[0] is model]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+reference_cache = ReferenceCache()
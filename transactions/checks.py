@@ -0,0 +1,27 @@
+"""
+System checks of the transactions app settings
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_response_cache_backend(app_configs, **kwargs):
+    """
+    Warn when the response cache is local to each process outside of debug
+    mode: a write made through one process doesn't bump the versions the
+    others read, which keep serving stale responses until they expire.
+    """
+    alias = getattr(settings, "RESPONSE_CACHE_ALIAS", "responses")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+    if settings.DEBUG or not backend.endswith(".LocMemCache"):
+        return []
+    return [
+        Warning(
+            f"The '{alias}' cache is local to each process.",
+            hint="Use a cache shared by the server processes, such as the "
+            "default file cache, unless a single process serves the API.",
+            obj="RESPONSE_CACHE_BACKEND",
+            id="transactions.W001",
+        )
+    ]
@@ -0,0 +1,137 @@
+"""
+Conditional GET support (ETag / Last-Modified) for transaction views
+"""
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Transaction
+
+
+def make_etag(*parts):
+    """
+    Return a quoted ETag hashing the given parts.
+    """
+    key = ":".join(str(part) for part in parts)
+    return quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+
+# Aggregates of a user's rows the listing validators are computed from
+LIST_STATS = {"last_modified": Max("updated_at"), "count": Count("pk")}
+
+
+def get_list_validators(user, stats, renderer_format, query_params):
+    """
+    Return `(etag, last_modified)` of a user's listing from its `LIST_STATS`.
+    """
+    etag = make_etag(
+        user.pk,
+        stats["count"],
+        stats["last_modified"] and stats["last_modified"].isoformat(),
+        renderer_format,
+        sorted(query_params.lists()),
+    )
+    return etag, stats["last_modified"]
+
+
+def get_detail_validators(pk, updated_at, renderer_format):
+    """
+    Return `(etag, last_modified)` of a transaction from its `updated_at`.
+    """
+    return make_etag(pk, updated_at.isoformat(), renderer_format), updated_at
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """
+    Return a 304 response when the request's preconditions match the
+    validators, `None` otherwise.
+    """
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Set the ETag and Last-Modified headers of a response.
+    """
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answers `If-None-Match` and `If-Modified-Since` on GET with a 304 before
+    the queryset is evaluated or any serializer runs.
+
+    Views implement `get_validators`, returning `(etag, last_modified)` from a
+    cheap query, or `(None, None)` to skip the check.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return set_validators(response, etag, last_modified)
+
+
+class TransactionListValidatorsMixin(ConditionalGetMixin):
+    """
+    Validators for a user's transaction listing, from the latest
+    `updated_at` and the number of rows.
+
+    Both come from one aggregate over the user's rows, served by the
+    `(user, updated_at, uuid)` index, so any creation, update or soft delete
+    changes the `updated_at` and any hard delete changes the count. The query
+    string and the rendered format are part of the ETag, so every page and
+    filter has its own. Last-Modified only has a one second resolution and
+    doesn't see hard deletes, clients should prefer `If-None-Match`.
+    """
+
+    def get_validators(self):
+        stats = Transaction.all_objects.filter(user=self.request.user).aggregate(
+            **LIST_STATS
+        )
+        return get_list_validators(
+            self.request.user,
+            stats,
+            self.request.accepted_renderer.format,
+            self.request.query_params,
+        )
+
+
+class TransactionDetailValidatorsMixin(ConditionalGetMixin):
+    """
+    Validators for a single transaction, from its `updated_at`.
+    """
+
+    def get_validators(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        updated_at = (
+            Transaction.all_objects.filter(
+                user=self.request.user, pk=self.kwargs[lookup_url_kwarg]
+            )
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        if updated_at is None:
+            # Let the view answer the 404.
+            return None, None
+        return get_detail_validators(
+            self.kwargs[lookup_url_kwarg],
+            updated_at,
+            self.request.accepted_renderer.format,
+        )
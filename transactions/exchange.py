@@ -0,0 +1,217 @@
+"""
+Currency conversion with the exchange rate table
+"""
+import secrets
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Func,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+
+from .models import ExchangeRate, Transaction
+from .response_cache import response_cache
+from .sync import ClockTimestamp
+
+CENT = Decimal("0.01")
+
+
+class RateIndex:
+    """
+    In-memory copy of the exchange rate table, with the dates of every
+    currency pair sorted so the rate in force on a day is found by bisection.
+
+    Loaded on first use. A version number in the `RATE_INDEX_VERSION_CACHE`
+    cache, shared by the processes, is bumped whenever a rate changes and
+    read on each lookup, so every process reloads before converting with
+    rates replaced elsewhere. A missing version starts at a random number.
+    """
+
+    version_key = "rate-index-version"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pairs = None
+        self.version = None
+
+    @property
+    def versions(self):
+        return caches[getattr(settings, "RATE_INDEX_VERSION_CACHE", "default")]
+
+    def get_version(self):
+        version = self.versions.get(self.version_key)
+        if version is None:
+            self.versions.add(self.version_key, secrets.randbits(48), timeout=None)
+            version = self.versions.get(self.version_key)
+        return version
+
+    def load(self):
+        pairs = defaultdict(lambda: ([], []))
+        rates = ExchangeRate.objects.order_by(
+            "base_currency_id", "quote_currency_id", "date"
+        ).values_list("base_currency_id", "quote_currency_id", "date", "rate")
+        for base_id, quote_id, date, rate in rates.iterator():
+            dates, values = pairs[(base_id, quote_id)]
+            dates.append(date)
+            values.append(rate)
+        return dict(pairs)
+
+    def get_pairs(self):
+        version = self.get_version()
+        with self.lock:
+            if self.pairs is None or self.version != version:
+                self.pairs = self.load()
+                self.version = version
+            return self.pairs
+
+    def bump_version(self):
+        with self.lock:
+            self.pairs = None
+        try:
+            self.versions.incr(self.version_key)
+        except ValueError:
+            # Not set, the next lookup starts a new version anyway.
+            pass
+
+    def invalidate(self):
+        """
+        Make every process reload the rates, now and again when the current
+        database transaction commits, so an index loaded from the rates as
+        they were before the commit isn't kept.
+        """
+        self.bump_version()
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(self.bump_version)
+
+    def get_rate(self, from_currency_id, to_currency_id, date):
+        """
+        Return the rate from one currency to another in force on `date`, or
+        `None` when there's no rate for the pair on or before that day.
+        """
+        if from_currency_id == to_currency_id:
+            return Decimal(1)
+        pair = self.get_pairs().get((from_currency_id, to_currency_id))
+        if pair is None:
+            return None
+        dates, rates = pair
+        position = bisect_right(dates, date)
+        return rates[position - 1] if position else None
+
+    def convert(self, amount, from_currency_id, to_currency_id, date):
+        rate = self.get_rate(from_currency_id, to_currency_id, date)
+        if rate is None:
+            return None
+        return (Decimal(amount) * rate).quantize(CENT)
+
+
+rate_index = RateIndex()
+
+
+def get_base_amount(user, amount, currency, date):
+    """
+    Return `amount` converted to the user's base currency, or `None` when the
+    user has no base currency or there's no rate for that day.
+    """
+    if user is None or user.base_currency_id is None or currency is None:
+        return None
+    date = Transaction._meta.get_field("date").to_python(date)
+    return rate_index.convert(amount, currency.pk, user.base_currency_id, date)
+
+
+def as_of_rate(base_currency_id):
+    """
+    Subquery with the rate from a transaction's currency to
+    `base_currency_id` in force on the transaction's date.
+    """
+    return Subquery(
+        ExchangeRate.objects.filter(
+            base_currency=OuterRef("currency"),
+            quote_currency=base_currency_id,
+            date__lte=OuterRef("date"),
+        )
+        .order_by("-date")
+        .values("rate")[:1]
+    )
+
+
+def converted_amount(base_currency_id):
+    """
+    Expression with the transaction amount in `base_currency_id`, converted
+    in the database with the rate in force on the transaction's date. `NULL`
+    when there's no rate.
+    """
+    output_field = DecimalField(max_digits=16, decimal_places=2)
+    return Case(
+        When(currency=base_currency_id, then=F("amount")),
+        default=ExpressionWrapper(
+            F("amount") * as_of_rate(base_currency_id),
+            output_field=output_field,
+        ),
+        output_field=output_field,
+    )
+
+
+def reporting_amount(base_currency_id):
+    """
+    Expression with the amount in `base_currency_id`, using the stored
+    `base_amount` when there is one and converting otherwise.
+    """
+    return Case(
+        When(base_amount__isnull=False, then=F("base_amount")),
+        default=converted_amount(base_currency_id),
+    )
+
+
+class IsDistinctFrom(Func):
+    """
+    `a IS DISTINCT FROM b`, inequality where `NULL` equals `NULL`.
+    """
+
+    arg_joiner = " IS DISTINCT FROM "
+    template = "(%(expressions)s)"
+    output_field = BooleanField()
+
+
+def refresh_base_amounts(queryset, only_missing=False):
+    """
+    Recompute the stored `base_amount` of the transactions in `queryset` with
+    one `UPDATE` per user.
+
+    Only the rows whose amount changes are written, and their `updated_at`
+    with it so conditional GETs and the changes feed see the new amount,
+    stamped as each row is written so a long `UPDATE` isn't stamped with
+    its start.
+
+    :return: Number of updated transactions
+    """
+    if only_missing:
+        queryset = queryset.filter(base_amount__isnull=True)
+
+    updated = 0
+    owners = queryset.values_list("user_id", "user__base_currency_id").distinct()
+    for user_id, base_currency_id in owners.order_by():
+        if base_currency_id is None:
+            base_amount = Value(None, output_field=DecimalField())
+        else:
+            base_amount = converted_amount(base_currency_id)
+        count = queryset.filter(
+            IsDistinctFrom(F("base_amount"), base_amount), user_id=user_id
+        ).update(base_amount=base_amount, updated_at=ClockTimestamp())
+        if count:
+            response_cache.invalidate(user_id)
+        updated += count
+    return updated
@@ -0,0 +1,121 @@
+"""
+Streaming exports of a user's transaction history
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, OuterRef
+
+from .models import Transaction, TransactionTag
+
+# Columns of an exported row, in order
+EXPORT_FIELDS = [
+    "uuid",
+    "date",
+    "type",
+    "amount",
+    "currency",
+    "item",
+    "quantity",
+    "brand",
+    "vendor",
+    "branch",
+    "category",
+    "parent_category",
+    "tags",
+    "payment_method",
+    "linked_transaction",
+    "comment",
+]
+
+
+class Echo:
+    """
+    File-like object whose `write` hands the value back, so `csv.writer`
+    can produce lines one at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def get_export_rows(user, date_from=None, date_to=None):
+    """
+    Yield the user's live transactions as dictionaries, oldest first.
+
+    Rows are read through a server-side cursor in chunks of
+    `TRANSACTION_EXPORT_CHUNK_SIZE`, with the related names joined and the
+    tag names collected by a subquery, so memory use doesn't depend on the
+    size of the history.
+    """
+    queryset = Transaction.objects.filter(user=user, is_deleted=False)
+    if date_from is not None:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to is not None:
+        queryset = queryset.filter(date__lte=date_to)
+
+    tag_names = ArraySubquery(
+        TransactionTag.objects.filter(transaction=OuterRef("pk"))
+        .order_by("tag__name")
+        .values("tag__name")
+    )
+    rows = (
+        queryset.order_by("date", "uuid")
+        .annotate(
+            currency_code=F("currency__code"),
+            vendor_name=F("vendor__name"),
+            branch_name=F("branch__name"),
+            category_name=F("category__name"),
+            parent_category=F("category__parent__name"),
+            tag_names=tag_names,
+        )
+        .values_list(
+            "uuid",
+            "date",
+            "type",
+            "amount",
+            "currency_code",
+            "item",
+            "quantity",
+            "brand",
+            "vendor_name",
+            "branch_name",
+            "category_name",
+            "parent_category",
+            "tag_names",
+            "payment_method",
+            "linked_transaction",
+            "comment",
+        )
+    )
+    for row in rows.iterator(chunk_size=settings.TRANSACTION_EXPORT_CHUNK_SIZE):
+        yield dict(zip(EXPORT_FIELDS, row))
+
+
+def stream_csv(rows):
+    """
+    Yield the rows as CSV lines, preceded by a header line. Tags are joined
+    with `|`.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row["tags"] = "|".join(row["tags"])
+        yield writer.writerow(row.values())
+
+
+def stream_ndjson(rows):
+    """
+    Yield the rows as newline delimited JSON objects.
+    """
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
@@ -0,0 +1,52 @@
+"""
+Filtering of transaction querysets from validated listing filters
+"""
+from django.db.models import Exists, OuterRef
+
+from .models import TransactionTag
+from .search import search_transactions
+
+# Filter name and the lookup it maps to. Related rows are matched by the
+# same slug their serializer field renders.
+FILTER_LOOKUPS = {
+    "date_from": "date__gte",
+    "date_to": "date__lte",
+    "type": "type",
+    "category": "category__name",
+    "parent_category": "category__parent__name",
+    "vendor": "vendor__name",
+    "branch": "branch__name",
+    "currency": "currency__code",
+    "amount_min": "amount__gte",
+    "amount_max": "amount__lte",
+    "is_deleted": "is_deleted",
+}
+
+
+def filter_transactions(queryset, filters):
+    """
+    Apply the filters validated by `TransactionListFilterSerializer` to a
+    queryset already scoped to a user.
+
+    Tags are matched with `EXISTS` on the transaction tag table, one for
+    `tag_match=any` and one per tag for `tag_match=all`, so a transaction is
+    never repeated and the user's rows drive the lookups. A `search`
+    annotates the rows with a `rank`.
+    """
+    for name, lookup in FILTER_LOOKUPS.items():
+        value = filters.get(name)
+        if value is not None:
+            queryset = queryset.filter(**{lookup: value})
+
+    tags = filters.get("tag")
+    if tags:
+        tagged = TransactionTag.objects.filter(transaction=OuterRef("pk"))
+        if filters.get("tag_match") == "all":
+            for tag in set(tags):
+                queryset = queryset.filter(Exists(tagged.filter(tag__name=tag)))
+        else:
+            queryset = queryset.filter(Exists(tagged.filter(tag__name__in=tags)))
+
+    if filters.get("search"):
+        queryset = search_transactions(queryset, filters["search"])
+    return queryset
@@ -0,0 +1,89 @@
+"""
+Background job handlers of the transactions app
+"""
+import os
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import transaction
+
+from jobs.queue import PermanentJobError, register
+
+from .exports import EXPORT_FORMATS, get_export_rows
+from .models import ReceiptBlob
+from .receipts import generate_thumbnail
+from .rollups import rebuild_monthly_spend
+from .serializers import TransactionExportJobSerializer
+
+
+@register("import_transactions")
+def import_transactions(job):
+    """
+    Import the CSV file at `payload["path"]` into the job user's
+    transactions, with the `import_transactions` command.
+    """
+    output = StringIO()
+    try:
+        call_command(
+            "import_transactions",
+            job.payload["path"],
+            user=job.user.username,
+            delimiter=job.payload.get("delimiter", ","),
+            stdout=output,
+        )
+    except (KeyError, CommandError) as exc:
+        raise PermanentJobError(str(exc)) from exc
+    return {"output": output.getvalue()}
+
+
+@register("rebuild_monthly_spend", public=True)
+def rebuild_user_monthly_spend(job):
+    """
+    Recompute the monthly spend rollup of the job user.
+    """
+    return {"rows": rebuild_monthly_spend(job.user)}
+
+
+@register(
+    "export_transactions", public=True, serializer_class=TransactionExportJobSerializer
+)
+def export_transactions(job):
+    """
+    Write the job user's transactions to an export file in the media
+    storage, streamed like the export endpoint.
+    """
+    serializer = TransactionExportJobSerializer(data=job.payload)
+    if not serializer.is_valid():
+        raise PermanentJobError(str(serializer.errors))
+    filters = dict(serializer.validated_data)
+    export_format = filters.pop("format")
+    stream, _ = EXPORT_FORMATS[export_format]
+
+    name = f"exports/{job.pk}.{export_format}"
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        for chunk in stream(get_export_rows(job.user, **filters)):
+            file.write(chunk)
+    return {"file": default_storage.url(name)}
+
+
+@register("process_receipt")
+def process_receipt(job):
+    """
+    Generate the thumbnail of the receipt blob `payload["blob"]`, unless
+    another worker has it or it was already processed.
+    """
+    with transaction.atomic():
+        blob = (
+            ReceiptBlob.objects.select_for_update(skip_locked=True)
+            .filter(
+                pk=job.payload["blob"], thumbnail_status=ReceiptBlob.THUMBNAIL_PENDING
+            )
+            .first()
+        )
+        if blob is None:
+            return {"thumbnail_status": None}
+        generate_thumbnail(blob)
+    return {"thumbnail_status": blob.thumbnail_status}
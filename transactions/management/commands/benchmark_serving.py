@@ -0,0 +1,256 @@
+"""
+Compare the transaction listing served over WSGI and over ASGI
+"""
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from unittest import mock
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from transactions.response_cache import response_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the transaction listing with many concurrent clients, "
+        "served by the DRF view through a WSGI thread pool and by the async "
+        "view through ASGI, in process and without a network in between. "
+        "Throttling and the response cache are disabled during the run. Every "
+        "in-flight request holds a database connection, keep --clients below "
+        "max_connections. Run it with DJANGO_DEBUG=False: debug mode records "
+        "every query and loads the sync only debug toolbar middleware, which "
+        "makes ASGI requests go through a thread."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username whose transactions are listed.",
+        )
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=100,
+            help="Concurrent clients, each sending its next request as soon "
+            "as the previous one is answered.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="Requests sent to each server.",
+        )
+        parser.add_argument(
+            "--wsgi-threads",
+            type=int,
+            default=8,
+            help="Threads of the emulated WSGI server.",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=50,
+            help="Transactions per listed page.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+        if options["clients"] < 1 or options["requests"] < 1:
+            raise CommandError("--clients and --requests must be at least 1.")
+
+        sync_only = [
+            path
+            for path in settings.MIDDLEWARE
+            if not getattr(import_string(path), "async_capable", False)
+        ]
+        if settings.DEBUG or sync_only:
+            self.stderr.write(
+                self.style.WARNING(
+                    "Debug mode or sync only middleware (%s) slows the ASGI path "
+                    "down, the results understate it." % ", ".join(sync_only)
+                )
+            )
+
+        token, created = Token.objects.get_or_create(user=user)
+        query = urlencode({"page_size": options["page_size"]})
+        headers = {"Authorization": f"Token {token.key}"}
+        wsgi_path = reverse("api:transaction-list-create")
+        asgi_path = reverse("api:transaction-list-async")
+        patches = (
+            mock.patch.object(APIView, "throttle_classes", []),
+            mock.patch.object(api_settings, "DEFAULT_THROTTLE_CLASSES", []),
+            # Both paths do the same work, the async view has no response cache.
+            mock.patch.object(response_cache, "get", return_value=None),
+        )
+        try:
+            with ExitStack() as stack:
+                for patch in patches:
+                    stack.enter_context(patch)
+                with ThreadPoolExecutor(options["wsgi_threads"]) as pool:
+                    wsgi = WSGIClient(get_wsgi_application(), pool)
+                    wsgi_stats = self.run(wsgi, wsgi_path, query, headers, options)
+                asgi = ASGIClient(get_asgi_application())
+                asgi_stats = self.run(asgi, asgi_path, query, headers, options)
+        finally:
+            if created:
+                token.delete()
+            connections.close_all()
+
+        self.stdout.write(
+            f"{'server':<6} {'path':<32} {'ok':>6} {'errors':>6} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for server, path, stats in (
+            ("wsgi", wsgi_path, wsgi_stats),
+            ("asgi", asgi_path, asgi_stats),
+        ):
+            self.stdout.write(
+                f"{server:<6} {path:<32} {stats['ok']:>6} {stats['errors']:>6} "
+                f"{stats['throughput']:>8.1f} {stats['p50']:>8.1f} "
+                f"{stats['p95']:>8.1f} {stats['p99']:>8.1f}"
+            )
+
+    def run(self, client, path, query, headers, options):
+        """
+        Send `--requests` requests from `--clients` concurrent clients and
+        return the throughput and latency percentiles.
+        """
+        remaining = options["requests"]
+        latencies, statuses = [], []
+
+        async def run_client():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                statuses.append(await client.get(path, query, headers))
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        async def run_clients():
+            await asyncio.gather(*(run_client() for _ in range(options["clients"])))
+
+        start = time.perf_counter()
+        asyncio.run(run_clients())
+        elapsed = time.perf_counter() - start
+
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        ok = statuses.count(200)
+        return {
+            "ok": ok,
+            "errors": len(statuses) - ok,
+            "throughput": len(statuses) / elapsed,
+            "p50": percentiles[49],
+            "p95": percentiles[94],
+            "p99": percentiles[98],
+        }
+
+
+class WSGIClient:
+    """
+    Calls a WSGI application from a thread pool, like a threaded WSGI
+    server with as many threads.
+    """
+
+    def __init__(self, application, pool):
+        self.application = application
+        self.pool = pool
+
+    def call(self, path, query, headers):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "wsgi.input": io.BytesIO(),
+        }
+        for name, value in headers.items():
+            environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+        setup_testing_defaults(environ)
+
+        status = []
+        response = self.application(
+            environ, lambda status_line, *args: status.append(status_line)
+        )
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return int(status[0].split()[0])
+
+    async def get(self, path, query, headers):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, self.call, path, query, headers)
+
+
+class ASGIClient:
+    """
+    Calls an ASGI application on the running event loop, like an ASGI
+    server.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def get(self, path, query, headers):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"localhost"),
+                *(
+                    (name.lower().encode(), value.encode())
+                    for name, value in headers.items()
+                ),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        done = asyncio.Event()
+        status = []
+        received_request = False
+
+        async def receive():
+            nonlocal received_request
+            if not received_request:
+                received_request = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # The client stays connected until the response is complete.
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif not message.get("more_body", False):
+                done.set()
+
+        await self.application(scope, receive, send)
+        done.set()
+        return status[0]
@@ -0,0 +1,31 @@
+"""
+Delete the receipt uploads abandoned before they completed
+"""
+from django.core.management.base import BaseCommand
+
+from transactions.receipts import delete_expired_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the receipt uploads without a chunk for RECEIPT_UPLOAD_EXPIRY "
+        "seconds that never completed, with their part files. Meant to run "
+        "periodically, from cron for instance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Uploads deleted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            deleted = delete_expired_uploads(options["batch_size"])
+            total += deleted
+            if not deleted:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} uploads."))
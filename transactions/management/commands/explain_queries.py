@@ -0,0 +1,143 @@
+"""
+Print the query plans Postgres picks for the transaction endpoints
+"""
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.http import QueryDict
+
+from transactions.models import Transaction
+from transactions.pagination import TransactionCursorPagination
+from transactions.search import search_transactions
+from transactions.sync import get_changes_queryset
+from transactions.views import (
+    TransactionListCreateView,
+    TransactionRetrieveUpdateDestroyView,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Print EXPLAIN plans for the queries run by each transaction endpoint, "
+        "to check that they are served by the expected indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Username whose data is used (defaults to the busiest user).",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run the queries and include actual timings (EXPLAIN ANALYZE).",
+        )
+        parser.add_argument(
+            "--format",
+            default="text",
+            choices=["text", "json"],
+            help="Output format of the plans.",
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["user"])
+        explain_options = {"format": options["format"]}
+        if options["analyze"]:
+            explain_options.update(analyze=True, buffers=True)
+
+        for name, queryset in self.get_queries(user):
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write("")
+
+    def get_user(self, username):
+        user_model = get_user_model()
+        if username:
+            try:
+                return user_model.objects.get(username=username)
+            except user_model.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist.")
+
+        user = (
+            user_model.objects.annotate(num_transactions=Count("transaction"))
+            .order_by("-num_transactions")
+            .first()
+        )
+        if user is None:
+            raise CommandError("There are no users to explain queries for.")
+        return user
+
+    def get_view_queryset(self, view_class, user):
+        """
+        Return the base queryset of a view as it would be built for a request
+        made by `user`.
+        """
+        view = view_class()
+        view.request = SimpleNamespace(user=user, query_params=QueryDict())
+        return view.get_queryset()
+
+    def get_queries(self, user):
+        """
+        Return `(name, queryset)` pairs for the queries issued by each
+        endpoint.
+        """
+        paginator = TransactionCursorPagination()
+        limit = paginator.page_size + 1
+
+        list_queryset = self.get_view_queryset(TransactionListCreateView, user)
+        newest_first = list_queryset.order_by("-date", "-uuid")
+        queries = [("transaction-list-create (first page)", newest_first[:limit])]
+
+        offset = newest_first.count() // 2
+        middle = next(iter(newest_first[offset : offset + 1]), None)
+        if middle is not None:
+            keyset = paginator.get_keyset_filter(
+                middle.date, middle.uuid, False, field="date", descending=True
+            )
+            queries.append(
+                (
+                    "transaction-list-create (next page)",
+                    newest_first.filter(keyset)[:limit],
+                )
+            )
+            queries.append(
+                (
+                    "transaction-list-create (date range)",
+                    newest_first.filter(
+                        date__gte=middle.date.replace(day=1),
+                        date__lte=middle.date,
+                    )[:limit],
+                )
+            )
+
+            word = next(iter(middle.item.split()), "coffee")
+            queries.append(
+                (
+                    "transaction-list-create (search)",
+                    search_transactions(list_queryset, word).order_by("-rank", "-uuid")[
+                        :limit
+                    ],
+                )
+            )
+            queries.append(
+                (
+                    "transaction-changes",
+                    get_changes_queryset(
+                        list_queryset, (middle.updated_at, middle.uuid)
+                    )[:limit],
+                )
+            )
+
+        detail_queryset = self.get_view_queryset(
+            TransactionRetrieveUpdateDestroyView, user
+        )
+        sample = Transaction.objects.filter(user=user).values_list("pk", flat=True)
+        queries.append(
+            (
+                "transaction-retrieve-update-destroy",
+                detail_queryset.filter(pk=sample.first()),
+            )
+        )
+        return queries
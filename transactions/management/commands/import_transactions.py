@@ -0,0 +1,316 @@
+"""
+Import a CSV bank statement into a user's transactions using COPY
+"""
+import csv
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from transactions.exchange import refresh_base_amounts
+from transactions.models import Transaction
+from transactions.response_cache import response_cache
+from transactions.rollups import rebuild_monthly_spend
+
+# Columns accepted in the CSV header, the same ones written by the CSV export.
+# Only `date`, `amount` and `item` are required.
+IMPORT_COLUMNS = [
+    "uuid",
+    "date",
+    "type",
+    "amount",
+    "currency",
+    "item",
+    "quantity",
+    "brand",
+    "vendor",
+    "branch",
+    "category",
+    "parent_category",
+    "tags",
+    "payment_method",
+    "linked_transaction",
+    "comment",
+]
+REQUIRED_COLUMNS = {"date", "amount", "item"}
+
+# Supported delimiters, as a Python character and as an SQL literal
+DELIMITERS = {
+    ",": (",", "','"),
+    ";": (";", "';'"),
+    "|": ("|", "'|'"),
+    "tab": ("\t", "E'\\t'"),
+}
+
+# Parent of imported categories whose row doesn't name one
+DEFAULT_PARENT_CATEGORY = "Imported"
+
+CREATE_STAGING_TABLE = """
+    CREATE TEMPORARY TABLE import_staging (
+        row_uuid uuid NOT NULL DEFAULT gen_random_uuid(),
+        uuid text,
+        date text,
+        type text,
+        amount text,
+        currency text,
+        item text,
+        quantity text,
+        brand text,
+        vendor text,
+        branch text,
+        category text,
+        parent_category text,
+        tags text,
+        payment_method text,
+        linked_transaction text,
+        comment text
+    ) ON COMMIT DROP
+"""
+
+# Reference rows missing from the database, created with one statement each.
+INSERT_REFERENCES = [
+    """
+    INSERT INTO transactions_currencycode
+        (uuid, code, created_at, updated_at, is_deleted)
+    SELECT gen_random_uuid(), s.code, now(), now(), false
+    FROM (
+        SELECT DISTINCT upper(currency) AS code FROM import_staging
+        WHERE coalesce(currency, '') <> ''
+    ) s
+    ON CONFLICT (code) DO NOTHING
+    """,
+    """
+    INSERT INTO transactions_vendor (uuid, name, created_at, updated_at, is_deleted)
+    SELECT gen_random_uuid(), s.name, now(), now(), false
+    FROM (
+        SELECT DISTINCT vendor AS name FROM import_staging
+        WHERE coalesce(vendor, '') <> ''
+    ) s
+    WHERE NOT EXISTS (SELECT 1 FROM transactions_vendor v WHERE v.name = s.name)
+    """,
+    """
+    INSERT INTO transactions_branch
+        (uuid, name, vendor_id, created_at, updated_at, is_deleted)
+    SELECT gen_random_uuid(), s.name, v.uuid, now(), now(), false
+    FROM (
+        SELECT DISTINCT branch AS name, vendor FROM import_staging
+        WHERE coalesce(branch, '') <> '' AND coalesce(vendor, '') <> ''
+    ) s
+    JOIN (
+        SELECT DISTINCT ON (name) uuid, name FROM transactions_vendor
+        ORDER BY name, created_at
+    ) v ON v.name = s.vendor
+    WHERE NOT EXISTS (
+        SELECT 1 FROM transactions_branch b
+        WHERE b.name = s.name AND b.vendor_id = v.uuid
+    )
+    """,
+    """
+    INSERT INTO transactions_parentcategory
+        (uuid, name, created_at, updated_at, is_deleted)
+    SELECT gen_random_uuid(), s.name, now(), now(), false
+    FROM (
+        SELECT DISTINCT coalesce(nullif(parent_category, ''), %(default_parent)s)
+            AS name
+        FROM import_staging
+        WHERE coalesce(category, '') <> ''
+    ) s
+    ON CONFLICT (name) DO NOTHING
+    """,
+    """
+    INSERT INTO transactions_category
+        (uuid, name, parent_id, created_at, updated_at, is_deleted)
+    SELECT gen_random_uuid(), s.name, p.uuid, now(), now(), false
+    FROM (
+        SELECT DISTINCT category AS name, parent_category FROM import_staging
+        WHERE coalesce(category, '') <> ''
+    ) s
+    JOIN transactions_parentcategory p
+        ON p.name = coalesce(nullif(s.parent_category, ''), %(default_parent)s)
+    WHERE NOT EXISTS (
+        SELECT 1 FROM transactions_category c WHERE c.name = s.name
+    )
+    ON CONFLICT (parent_id, name) DO NOTHING
+    """,
+    """
+    INSERT INTO transactions_tag (uuid, name, created_at, updated_at, is_deleted)
+    SELECT gen_random_uuid(), s.name, now(), now(), false
+    FROM (
+        SELECT DISTINCT tag.name
+        FROM import_staging,
+            unnest(string_to_array(tags, '|')) AS tag(name)
+        WHERE tag.name <> ''
+    ) s
+    ON CONFLICT (name) DO NOTHING
+    """,
+]
+
+# Names are resolved to the oldest row with that name, like a slug lookup on
+# tables where names aren't unique.
+INSERT_TRANSACTIONS = """
+    INSERT INTO transactions_transaction (
+        uuid, created_at, updated_at, is_deleted, created_by_id, user_id,
+        date, amount, type, currency_id, item, quantity, brand, vendor_id,
+        branch_id, category_id, linked_transaction, payment_method, comment
+    )
+    SELECT
+        s.row_uuid, now(), now(), false, %(user)s::uuid, %(user)s::uuid,
+        s.date::date,
+        s.amount::numeric(10, 2),
+        coalesce(nullif(s.type, ''), 'Expense'),
+        cur.uuid,
+        s.item,
+        coalesce(nullif(s.quantity, '')::integer, 1),
+        coalesce(s.brand, ''),
+        v.uuid,
+        b.uuid,
+        c.uuid,
+        nullif(s.linked_transaction, '')::uuid,
+        coalesce(s.payment_method, ''),
+        coalesce(s.comment, '')
+    FROM import_staging s
+    LEFT JOIN transactions_currencycode cur ON cur.code = upper(s.currency)
+    LEFT JOIN (
+        SELECT DISTINCT ON (name) uuid, name FROM transactions_vendor
+        ORDER BY name, created_at
+    ) v ON v.name = s.vendor
+    LEFT JOIN (
+        SELECT DISTINCT ON (vendor_id, name) uuid, vendor_id, name
+        FROM transactions_branch
+        ORDER BY vendor_id, name, created_at
+    ) b ON b.name = s.branch AND b.vendor_id = v.uuid
+    LEFT JOIN (
+        SELECT DISTINCT ON (name) uuid, name FROM transactions_category
+        ORDER BY name, created_at
+    ) c ON c.name = s.category
+"""
+
+# Last step before the commit: `now()` is the start of the import's
+# transaction, which the changes feed would treat as committed long ago.
+RESTAMP_TRANSACTIONS = """
+    UPDATE transactions_transaction SET updated_at = clock_timestamp()
+    WHERE uuid IN (SELECT row_uuid FROM import_staging)
+"""
+
+INSERT_TRANSACTION_TAGS = """
+    INSERT INTO transactions_transactiontag (
+        uuid, created_at, updated_at, is_deleted, created_by_id,
+        transaction_id, tag_id
+    )
+    SELECT gen_random_uuid(), now(), now(), false, %(user)s::uuid, s.row_uuid, t.uuid
+    FROM (
+        SELECT DISTINCT row_uuid, tag.name
+        FROM import_staging,
+            unnest(string_to_array(tags, '|')) AS tag(name)
+    ) s
+    JOIN transactions_tag t ON t.name = s.name
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Import transactions for a user from a CSV file. The file is streamed "
+        "into a staging table with COPY, missing vendors, branches, categories, "
+        "currencies and tags are created in bulk and the transactions are "
+        "inserted with a single statement. The user's monthly rollup is "
+        "rebuilt and the amounts in their base currency are filled in "
+        "afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row.")
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username of the owner of the imported transactions.",
+        )
+        parser.add_argument(
+            "--delimiter",
+            default=",",
+            choices=list(DELIMITERS),
+            help="Field delimiter of the CSV file.",
+        )
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        try:
+            user = user_model.objects.get(username=options["user"])
+        except user_model.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        delimiter = options["delimiter"]
+        try:
+            with open(options["path"], newline="", encoding="utf-8") as csv_file:
+                columns = self.get_columns(csv_file, DELIMITERS[delimiter][0])
+                csv_file.seek(0)
+                start = time.perf_counter()
+                imported = self.import_file(csv_file, columns, delimiter, user)
+        except OSError as exc:
+            raise CommandError(f"Could not read '{options['path']}': {exc}")
+        except DatabaseError as exc:
+            raise CommandError(f"Import failed, nothing was imported: {exc}")
+
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} transactions in {elapsed:.2f}s "
+                f"({rate:,.0f} rows/s)."
+            )
+        )
+
+    def get_columns(self, csv_file, delimiter):
+        """
+        Read the header row and check it only names known columns.
+        """
+        header = next(csv.reader(csv_file, delimiter=delimiter), None)
+        if not header:
+            raise CommandError("The file is empty.")
+
+        columns = [column.strip().lower() for column in header]
+        unknown = set(columns) - set(IMPORT_COLUMNS)
+        if unknown:
+            raise CommandError(f"Unknown columns: {', '.join(sorted(unknown))}.")
+        missing = REQUIRED_COLUMNS - set(columns)
+        if missing:
+            raise CommandError(f"Missing columns: {', '.join(sorted(missing))}.")
+        if len(set(columns)) != len(columns):
+            raise CommandError("Columns must not be repeated.")
+        return columns
+
+    @transaction.atomic
+    def import_file(self, csv_file, columns, delimiter, user):
+        """
+        Stream the file into the staging table and insert its rows, returning
+        the number of imported transactions.
+        """
+        params = {"user": str(user.pk), "default_parent": DEFAULT_PARENT_CATEGORY}
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_STAGING_TABLE)
+            # COPY reads the file in chunks, so it never has to fit in memory.
+            # The column names were checked against IMPORT_COLUMNS.
+            cursor.copy_expert(
+                f"COPY import_staging ({', '.join(columns)}) FROM STDIN "
+                f"WITH (FORMAT csv, HEADER true, DELIMITER {DELIMITERS[delimiter][1]})",
+                csv_file,
+            )
+            # Temporary tables aren't analyzed automatically, without stats
+            # the name joins below can get poor plans on big files.
+            cursor.execute("ANALYZE import_staging")
+            for statement in INSERT_REFERENCES:
+                cursor.execute(statement, params)
+            cursor.execute(INSERT_TRANSACTIONS, params)
+            imported = cursor.rowcount
+            if "tags" in columns:
+                cursor.execute(INSERT_TRANSACTION_TAGS, params)
+        rebuild_monthly_spend(user)
+        refresh_base_amounts(
+            Transaction.all_objects.filter(user=user), only_missing=True
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(RESTAMP_TRANSACTIONS)
+            cursor.execute("DROP TABLE import_staging")
+        # The rows were inserted without signals.
+        response_cache.invalidate(user.pk)
+        return imported
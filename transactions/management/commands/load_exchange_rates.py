@@ -0,0 +1,131 @@
+"""
+Load exchange rates from a CSV file
+"""
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from transactions.exchange import rate_index, refresh_base_amounts
+from transactions.models import CurrencyCode, ExchangeRate, Transaction
+
+RATE_COLUMNS = {"date", "base", "quote", "rate"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a CSV file with `date`, `base`, `quote` and "
+        "`rate` columns, where `rate` units of the quote currency buy one unit "
+        "of the base currency. Existing rates for the same pair and day are "
+        "replaced. Afterwards, transactions without an amount in their "
+        "owner's base currency and those a loaded rate applies to are "
+        "converted again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rates written per statement.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], newline="", encoding="utf-8") as csv_file:
+                rows = self.read_rows(csv.DictReader(csv_file))
+        except OSError as exc:
+            raise CommandError(f"Could not read '{options['path']}': {exc}")
+
+        with transaction.atomic():
+            rates = self.save_rates(rows, options["batch_size"])
+        rate_index.invalidate()
+        converted = refresh_base_amounts(
+            Transaction.all_objects.filter(self.get_affected(rates))
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Loaded {len(rates)} exchange rates, converted {converted} "
+                "transactions."
+            )
+        )
+
+    def read_rows(self, reader):
+        """
+        Parse and check every row, returning `(date, base, quote, rate)`
+        tuples.
+        """
+        missing = RATE_COLUMNS - set(reader.fieldnames or [])
+        if missing:
+            raise CommandError(f"Missing columns: {', '.join(sorted(missing))}.")
+
+        rows = []
+        for line, row in enumerate(reader, start=2):
+            try:
+                date = parse_date(row["date"].strip())
+                rate = Decimal(row["rate"].strip())
+            except (ValueError, InvalidOperation):
+                date = rate = None
+            base = row["base"].strip().upper()
+            quote = row["quote"].strip().upper()
+            if date is None or rate is None or rate <= 0 or not base or not quote:
+                raise CommandError(f"Invalid rate on line {line}.")
+            rows.append((date, base, quote, rate))
+        return rows
+
+    def save_rates(self, rows, batch_size):
+        """
+        Create the missing currency codes and upsert the rates in batches.
+
+        :return: The rates by `(base_id, quote_id, date)`
+        """
+        codes = {code for _, base, quote, _ in rows for code in (base, quote)}
+        CurrencyCode.objects.bulk_create(
+            [CurrencyCode(code=code) for code in codes], ignore_conflicts=True
+        )
+        currency_ids = dict(
+            CurrencyCode.all_objects.filter(code__in=codes).values_list("code", "uuid")
+        )
+
+        rates = {}
+        for date, base, quote, rate in rows:
+            # The last row of a repeated pair and day wins.
+            rates[(currency_ids[base], currency_ids[quote], date)] = rate
+        ExchangeRate.objects.bulk_create(
+            [
+                ExchangeRate(
+                    base_currency_id=base_id,
+                    quote_currency_id=quote_id,
+                    date=date,
+                    rate=rate,
+                )
+                for (base_id, quote_id, date), rate in rates.items()
+            ],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["base_currency", "quote_currency", "date"],
+            update_fields=["rate", "updated_at"],
+        )
+        return rates
+
+    def get_affected(self, rates):
+        """
+        Return the condition matching the transactions without a base amount
+        and those converted by a loaded pair on or after its first loaded
+        day, which a new or corrected rate may change.
+        """
+        first_dates = {}
+        for base_id, quote_id, date in rates:
+            pair = (base_id, quote_id)
+            first_dates[pair] = min(date, first_dates.get(pair, date))
+
+        affected = Q(base_amount__isnull=True)
+        for (base_id, quote_id), date in first_dates.items():
+            affected |= Q(
+                currency_id=base_id, user__base_currency_id=quote_id, date__gte=date
+            )
+        return affected
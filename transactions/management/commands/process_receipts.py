@@ -0,0 +1,47 @@
+"""
+Generate the thumbnails of uploaded receipts
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from transactions.receipts import process_pending_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the thumbnails of every receipt still pending, such as the "
+        "ones uploaded before the process_receipt jobs. Several runs can go at "
+        "once, each claims its own receipts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20,
+            help="Receipts claimed per transaction.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new receipts instead of exiting when done.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_pending_thumbnails(options["batch_size"])
+            total += processed
+            if processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} receipts."))
@@ -0,0 +1,35 @@
+"""
+Rebuild the monthly spend rollup from the transactions
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.rollups import rebuild_monthly_spend
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the monthly spend rollup from scratch, for the given users "
+        "or for every user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Username to rebuild, can be repeated (defaults to all users).",
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("username")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+            missing = set(options["usernames"]) - {user.username for user in users}
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}.")
+
+        for user in users.iterator():
+            rows = rebuild_monthly_spend(user)
+            self.stdout.write(f"{user.username}: {rows} rollup rows.")
+        self.stdout.write(self.style.SUCCESS("Monthly spend rebuilt."))
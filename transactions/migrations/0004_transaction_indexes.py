@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:48
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently so the transactions table isn't locked
+    # against writes while they are created, which can't run in a transaction.
+    atomic = False
+
+    dependencies = [
+        (
+            "transactions",
+            "0003_alter_branch_is_deleted_alter_category_is_deleted_and_more",
+        ),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "-date", "-uuid"], name="transaction_user_date_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["user", "-date", "-uuid"],
+                name="transaction_user_live_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["linked_transaction"], name="transaction_linked_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "updated_at"], name="transaction_user_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:52
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """
+    Keep the oldest tag of every duplicated name and move the transaction
+    links of the others onto it, so the unique constraint can be added.
+    """
+    Tag = apps.get_model("transactions", "Tag")
+    TransactionTag = apps.get_model("transactions", "TransactionTag")
+
+    duplicated_names = (
+        Tag.objects.values("name")
+        .annotate(count=Count("uuid"))
+        .filter(count__gt=1)
+        .values_list("name", flat=True)
+    )
+    for name in duplicated_names:
+        keep, *others = Tag.objects.filter(name=name).order_by("created_at", "uuid")
+        duplicate_ids = [tag.pk for tag in others]
+
+        linked = set(
+            TransactionTag.objects.filter(tag=keep).values_list(
+                "transaction_id", flat=True
+            )
+        )
+        for link in TransactionTag.objects.filter(tag_id__in=duplicate_ids):
+            if link.transaction_id in linked:
+                link.delete()
+            else:
+                link.tag = keep
+                link.save(update_fields=["tag"])
+                linked.add(link.transaction_id)
+
+        Tag.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("transactions", "0004_transaction_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("transactions", "0005_merge_duplicate_tags"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tag",
+            name="name",
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.0.1 on 2026-10-17 07:00
+
+import uuid
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("transactions", "0006_tag_name_unique"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlySpend",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(help_text="First day of the month.")),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("Income", "Income"), ("Expense", "Expense")],
+                        max_length=7,
+                    ),
+                ),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="transactions.category",
+                    ),
+                ),
+                (
+                    "currency",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="transactions.currencycode",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_spend",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Monthly Spend",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="monthlyspend",
+            constraint=models.UniqueConstraint(
+                models.F("user"),
+                models.F("month"),
+                django.db.models.functions.comparison.Coalesce(
+                    "category",
+                    models.Value(
+                        uuid.UUID("00000000-0000-0000-0000-000000000000"),
+                        output_field=models.UUIDField(),
+                    ),
+                ),
+                models.F("type"),
+                django.db.models.functions.comparison.Coalesce(
+                    "currency",
+                    models.Value(
+                        uuid.UUID("00000000-0000-0000-0000-000000000000"),
+                        output_field=models.UUIDField(),
+                    ),
+                ),
+                name="monthly_spend_key",
+            ),
+        ),
+    ]
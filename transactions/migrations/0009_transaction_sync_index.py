@@ -0,0 +1,28 @@
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently like the other transaction indexes.
+    atomic = False
+
+    dependencies = [
+        ("transactions", "0008_exchange_rates"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "updated_at", "uuid"],
+                name="transaction_user_sync_idx",
+            ),
+        ),
+        RemoveIndexConcurrently(
+            model_name="transaction",
+            name="transaction_user_updated_idx",
+        ),
+    ]
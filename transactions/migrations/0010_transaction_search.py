@@ -0,0 +1,49 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Weighted so matches in the item rank above the brand and then the comment.
+# The text search configuration must match `SEARCH_CONFIG` in
+# `transactions.search`.
+CREATE_TRIGGER = """
+CREATE FUNCTION transactions_transaction_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.item, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(NEW.brand, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(NEW.comment, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_transaction_search_vector_update
+BEFORE INSERT OR UPDATE OF item, brand, comment, search_vector
+ON transactions_transaction
+FOR EACH ROW EXECUTE FUNCTION transactions_transaction_search_vector();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER transactions_transaction_search_vector_update
+ON transactions_transaction;
+DROP FUNCTION transactions_transaction_search_vector();
+"""
+
+# Fires the trigger for the existing rows.
+BACKFILL = "UPDATE transactions_transaction SET item = item"
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("transactions", "0009_transaction_sync_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,53 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import DatabaseError, migrations
+
+# Trigram indexes for the typo tolerant fallback of the search. pg_trgm is
+# optional, without it the search only matches whole words, so the
+# extension and its indexes are only created when the server ships it and
+# the migration user may install it.
+TRIGRAM_INDEXES = {
+    "transaction_item_trgm_idx": "item",
+    "transaction_brand_trgm_idx": "brand",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError:
+            return
+        for name, column in TRIGRAM_INDEXES.items():
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON transactions_transaction USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for name in TRIGRAM_INDEXES:
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    # Built concurrently like the other transaction indexes.
+    atomic = False
+
+    dependencies = [
+        ("transactions", "0010_transaction_search"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="transaction_search_idx"
+            ),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
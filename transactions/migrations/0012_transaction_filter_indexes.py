@@ -0,0 +1,42 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently like the other transaction indexes.
+    atomic = False
+
+    dependencies = [
+        ("transactions", "0011_transaction_search_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "category", "-date", "-uuid"],
+                name="transaction_user_category_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "vendor", "-date", "-uuid"],
+                name="transaction_user_vendor_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "amount", "uuid"],
+                name="transaction_user_amount_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "created_at", "uuid"],
+                name="transaction_user_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,160 @@
+# Generated by Django 5.0.1 on 2026-10-17 08:30
+
+import django.db.models.manager
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("transactions", "0013_receipt_uploads"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="branch",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "Branches",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="category",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "Categories",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="currencycode",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "CurrencyCodes",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="currencydata",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "CurrenciesData",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="exchangerate",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "ExchangeRates",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="parentcategory",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "Parent Categories",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="receiptblob",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "ReceiptBlobs",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="receiptupload",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "ReceiptUploads",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="tag",
+            options={
+                "default_manager_name": "all_objects",
+                "verbose_name_plural": "Tags",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="transaction",
+            options={"default_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="transactiontag",
+            options={"default_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="vendor",
+            options={"default_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelManagers(
+            name="branch",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="category",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="currencycode",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="currencydata",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="exchangerate",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="parentcategory",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="receiptblob",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="receiptupload",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="tag",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="transaction",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="transactiontag",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="vendor",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
@@ -1,9 +1,58 @@
 import uuid
 
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+NIL_UUID = uuid.UUID(int=0)
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """
+    Queryset with bulk soft delete and undelete.
+
+    Both run as a single `UPDATE` and, like `update()`, bypass `save()` and
+    the model signals.
+    """
+
+    def soft_delete(self, deleted_by=None):
+        """
+        Mark the live rows of the queryset as deleted.
+
+        :return: Number of deleted rows
+        """
+        now = timezone.now()
+        values = {"is_deleted": True, "deleted_at": now, "updated_at": now}
+        if deleted_by:
+            values["updated_by"] = deleted_by
+        return self.filter(is_deleted=False).update(**values)
+
+    def undelete(self, undeleted_by=None):
+        """
+        Revoke the soft deletion of the deleted rows of the queryset.
+
+        :return: Number of undeleted rows
+        """
+        return self.filter(is_deleted=True).update(
+            is_deleted=False,
+            deleted_at=None,
+            updated_at=timezone.now(),
+            updated_by=undeleted_by,
+        )
+
+
+class LiveManager(models.Manager.from_queryset(SoftDeleteQuerySet)):  # type: ignore
+    """
+    Manager of the rows that aren't soft deleted.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
 
 class BaseModel(models.Model):
     """
@@ -38,8 +87,18 @@ class BaseModel(models.Model):
         editable=False,
     )
 
+    # Live rows only, `all_objects` includes the soft deleted ones. The latter
+    # stays the default manager, so unique validation, the admin and related
+    # managers still see every row.
+    objects = LiveManager()
+    all_objects = models.Manager.from_queryset(SoftDeleteQuerySet)()
+
+    # Columns written by a soft delete or undelete
+    SOFT_DELETE_FIELDS = ["is_deleted", "deleted_at", "updated_by", "updated_at"]
+
     class Meta:
         abstract = True
+        default_manager_name = "all_objects"
 
     def soft_delete(self, deleted_by=None):
         """
@@ -51,7 +110,7 @@ class BaseModel(models.Model):
             self.deleted_at = timezone.now()
             if deleted_by:
                 self.updated_by = deleted_by
-            self.save()
+            self.save(update_fields=self.SOFT_DELETE_FIELDS)
 
     def undelete(self, undeleted_by=None):
         """Revokes the soft deletion status of the instance."""
@@ -59,7 +118,7 @@ class BaseModel(models.Model):
             self.is_deleted = False
             self.deleted_at = None
             self.updated_by = undeleted_by
-            self.save()
+            self.save(update_fields=self.SOFT_DELETE_FIELDS)
 
 
 class Vendor(BaseModel):
@@ -86,7 +145,7 @@ class Branch(BaseModel):
     )
     name = models.CharField(max_length=255)
 
-    class Meta:
+    class Meta(BaseModel.Meta):
         verbose_name_plural = "Branches"
 
     def __str__(self):
@@ -100,7 +159,7 @@ class CurrencyCode(BaseModel):
 
     code = models.CharField(max_length=3, unique=True)
 
-    class Meta:
+    class Meta(BaseModel.Meta):
         verbose_name_plural = "CurrencyCodes"
 
     def __str__(self):
@@ -116,7 +175,7 @@ class CurrencyData(BaseModel):
     currency_name = models.CharField(max_length=100)
     currency_code = models.ForeignKey(CurrencyCode, on_delete=models.CASCADE)
 
-    class Meta:
+    class Meta(BaseModel.Meta):
         unique_together = ("country", "currency_name", "currency_code")
         verbose_name_plural = "CurrenciesData"
 
@@ -124,6 +183,41 @@ class CurrencyData(BaseModel):
         return f"{self.country} - {self.currency_name} - {self.currency_code}"
 
 
+class ExchangeRate(BaseModel):
+    """
+    Rate of a currency against another one from a given date on, `rate` units
+    of the quote currency buy one unit of the base currency.
+    """
+
+    base_currency = models.ForeignKey(
+        CurrencyCode,
+        on_delete=models.CASCADE,
+        related_name="base_rates",
+        to_field="uuid",
+    )
+    quote_currency = models.ForeignKey(
+        CurrencyCode,
+        on_delete=models.CASCADE,
+        related_name="quote_rates",
+        to_field="uuid",
+    )
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+
+    class Meta(BaseModel.Meta):
+        verbose_name_plural = "ExchangeRates"
+        constraints = [
+            # Also serves the as-of lookup of the latest rate before a date.
+            models.UniqueConstraint(
+                fields=["base_currency", "quote_currency", "date"],
+                name="exchange_rate_pair_date",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.base_currency}/{self.quote_currency} - {self.rate}"
+
+
 class ParentCategory(BaseModel):
     """
     Represents parent categories for transaction categorization.
@@ -131,7 +225,7 @@ class ParentCategory(BaseModel):
 
     name = models.CharField(max_length=255, unique=True)
 
-    class Meta:
+    class Meta(BaseModel.Meta):
         verbose_name_plural = "Parent Categories"
 
     def __str__(self):
@@ -150,7 +244,7 @@ class Category(BaseModel):
         related_name="child_categories",
     )
 
-    class Meta:
+    class Meta(BaseModel.Meta):
         verbose_name_plural = "Categories"
         unique_together = ("parent", "name")
 
@@ -163,15 +257,63 @@ class Tag(BaseModel):
     Represents tags that can be attached to transactions.
     """
 
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
 
-    class Meta:
+    class Meta(BaseModel.Meta):
         verbose_name_plural = "Tags"
 
     def __str__(self):
         return f"{self.name}"
 
 
+class ReceiptBlob(BaseModel):
+    """
+    Receipt file stored once per content, under a name derived from its
+    SHA-256, and shared by every upload of the same bytes.
+    """
+
+    THUMBNAIL_PENDING = "pending"
+    THUMBNAIL_DONE = "done"
+    THUMBNAIL_SKIPPED = "skipped"
+    THUMBNAIL_FAILED = "failed"
+    THUMBNAIL_STATUS_CHOICES = [
+        (THUMBNAIL_PENDING, "Pending"),
+        (THUMBNAIL_DONE, "Done"),
+        (THUMBNAIL_SKIPPED, "Skipped"),
+        (THUMBNAIL_FAILED, "Failed"),
+    ]
+
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    file = models.FileField(max_length=255, verbose_name="File")
+    size = models.PositiveBigIntegerField(verbose_name="Size")
+    content_type = models.CharField(
+        max_length=100, blank=True, verbose_name="Content type"
+    )
+    thumbnail = models.FileField(
+        max_length=255, blank=True, null=True, verbose_name="Thumbnail"
+    )
+    thumbnail_status = models.CharField(
+        max_length=7,
+        choices=THUMBNAIL_STATUS_CHOICES,
+        default=THUMBNAIL_PENDING,
+        verbose_name="Thumbnail status",
+    )
+
+    class Meta(BaseModel.Meta):
+        verbose_name_plural = "ReceiptBlobs"
+        indexes = [
+            # Queue of the thumbnail worker, oldest first.
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(thumbnail_status="pending"),
+                name="receiptblob_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return self.sha256
+
+
 class Transaction(BaseModel):
     """
     Represents a financial transaction, either income or expense.
@@ -256,6 +398,15 @@ class Transaction(BaseModel):
         null=True,
         verbose_name="Receipt",
     )
+    receipt_blob = models.ForeignKey(
+        ReceiptBlob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="transactions",
+        verbose_name="Receipt blob",
+    )
     linked_transaction = models.UUIDField(
         default=uuid.uuid4,
         editable=True,
@@ -272,6 +423,63 @@ class Transaction(BaseModel):
         blank=True,
         verbose_name="Comment",
     )
+    base_amount = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Amount in base currency",
+        help_text="Amount converted to the user's base currency when written.",
+    )
+    # Kept up to date by a database trigger on item, brand and comment, see
+    # the `0010_transaction_search` migration.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta(BaseModel.Meta):
+        indexes = [
+            # Serves the per user listing ordered by the pagination keyset.
+            models.Index(
+                fields=["user", "-date", "-uuid"],
+                name="transaction_user_date_idx",
+            ),
+            models.Index(
+                fields=["user", "-date", "-uuid"],
+                condition=models.Q(is_deleted=False),
+                name="transaction_user_live_idx",
+            ),
+            models.Index(
+                fields=["linked_transaction"],
+                name="transaction_linked_idx",
+            ),
+            # Serves the changes feed keyset and the listing ETag.
+            models.Index(
+                fields=["user", "updated_at", "uuid"],
+                name="transaction_user_sync_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="transaction_search_idx"),
+            # Serve the listing filters on selective columns, in date order.
+            # Low cardinality filters (type, currency, is_deleted) are served
+            # by walking the date index, branches and tags by their foreign
+            # key indexes.
+            models.Index(
+                fields=["user", "category", "-date", "-uuid"],
+                name="transaction_user_category_idx",
+            ),
+            models.Index(
+                fields=["user", "vendor", "-date", "-uuid"],
+                name="transaction_user_vendor_idx",
+            ),
+            # Serve the amount range filter and the listing orderings.
+            models.Index(
+                fields=["user", "amount", "uuid"],
+                name="transaction_user_amount_idx",
+            ),
+            models.Index(
+                fields=["user", "created_at", "uuid"],
+                name="transaction_user_created_idx",
+            ),
+        ]
 
     @property
     def verbose_names(self):
@@ -289,3 +497,93 @@ class TransactionTag(BaseModel):
 
     transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE)
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+
+class ReceiptUpload(BaseModel):
+    """
+    Resumable upload of a receipt, received in chunks into a part file and
+    moved to its `ReceiptBlob` once complete.
+    """
+
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="receipt_uploads",
+        verbose_name="User",
+    )
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="receipt_uploads",
+        verbose_name="Transaction",
+    )
+    filename = models.CharField(max_length=255, verbose_name="Filename")
+    content_type = models.CharField(
+        max_length=100, blank=True, verbose_name="Content type"
+    )
+    size = models.PositiveBigIntegerField(verbose_name="Size")
+    received = models.PositiveBigIntegerField(default=0, verbose_name="Received")
+    blob = models.ForeignKey(
+        ReceiptBlob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="uploads",
+        verbose_name="Blob",
+    )
+
+    class Meta(BaseModel.Meta):
+        verbose_name_plural = "ReceiptUploads"
+
+    def __str__(self):
+        return f"{self.filename} - {self.received}/{self.size}"
+
+
+class MonthlySpend(models.Model):
+    """
+    Rollup of the live transactions of a user per month, category, type and
+    currency. It is derived data, kept up to date by applying the difference
+    of every transaction write, and can be rebuilt from the transactions.
+    """
+
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="monthly_spend",
+    )
+    month = models.DateField(help_text="First day of the month.")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        to_field="uuid",
+    )
+    type = models.CharField(max_length=7, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    currency = models.ForeignKey(
+        CurrencyCode,
+        on_delete=models.SET_NULL,
+        null=True,
+        to_field="uuid",
+    )
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Monthly Spend"
+        constraints = [
+            # Missing categories and currencies are keyed as the nil uuid, so
+            # there's a single row for them too.
+            models.UniqueConstraint(
+                "user",
+                "month",
+                Coalesce("category", Value(NIL_UUID, output_field=models.UUIDField())),
+                "type",
+                Coalesce("currency", Value(NIL_UUID, output_field=models.UUIDField())),
+                name="monthly_spend_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} - {self.category} - {self.type} - {self.total}"
@@ -0,0 +1,215 @@
+"""
+Keyset (cursor) pagination for transaction listings
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TransactionCursorPagination(BasePagination):
+    """
+    Paginates transactions newest first using a `(date, uuid)` keyset.
+
+    The cursor is an opaque token holding the sort key of the last row seen,
+    so every page is served by an index range scan and never needs an OFFSET,
+    no matter how deep into the history the client is.
+
+    Views can sort by another non-null field or annotation with a
+    `get_ordering` method returning its name, prefixed with `-` for
+    descending order. The uuid always breaks ties in the same direction.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+    default_ordering = "-date"
+
+    @property
+    def page_size(self):
+        return getattr(settings, "TRANSACTION_PAGE_SIZE", 100)
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, "TRANSACTION_MAX_PAGE_SIZE", 1000)
+
+    def get_ordering(self, view):
+        """
+        Return `(field, descending)` for the view's ordering.
+        """
+        get_ordering = getattr(view, "get_ordering", None)
+        ordering = get_ordering() if get_ordering else self.default_ordering
+        return ordering.lstrip("-"), ordering.startswith("-")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Return the queryset of the requested page, ordered and sliced but not
+        evaluated, so async views can fetch it with the async ORM. Its rows
+        are handed back to `set_page`.
+        """
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.field, self.descending = self.get_ordering(view)
+
+        self.cursor = self.decode_cursor(request, queryset)
+        self.reverse = self.cursor is not None and self.cursor["reverse"]
+
+        # Walking backwards flips the order, the page is put back in place
+        # by `set_page`.
+        prefix = "-" if self.descending != self.reverse else ""
+        queryset = queryset.order_by(f"{prefix}{self.field}", f"{prefix}uuid")
+
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(
+                    self.cursor["value"],
+                    self.cursor["uuid"],
+                    self.reverse,
+                )
+            )
+
+        # Fetch one extra row to find out whether there's a following page.
+        return queryset[: self.limit + 1]
+
+    def set_page(self, results):
+        """
+        Keep the page out of the rows fetched from `get_page_queryset` and
+        return it.
+        """
+        self.has_following = len(results) > self.limit
+        self.page = results[: self.limit]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = self.has_following
+        else:
+            self.has_next = self.has_following
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_keyset_filter(self, value, pk, reverse, field=None, descending=None):
+        """
+        Build the row-value comparison `(field, uuid) < (value, pk)` (or `>`
+        for ascending orders, flipped again when paging backwards) in a form
+        the planner can turn into an index range on the sort field.
+        """
+        field = self.field if field is None else field
+        descending = self.descending if descending is None else descending
+        op = "lt" if descending != reverse else "gt"
+        return Q(**{f"{field}__{op}e": value}) & (
+            Q(**{f"{field}__{op}": value}) | Q(**{f"uuid__{op}": pk})
+        )
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        """
+        Return the url for the page that continues after (or before, when
+        `reverse` is set) the given transaction.
+        """
+        value = getattr(instance, self.field)
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.isoformat()
+        elif isinstance(value, decimal.Decimal):
+            value = str(value)
+        payload = {"o": self.field, "k": value, "u": str(instance.uuid)}
+        if reverse:
+            payload["r"] = 1
+        raw = json.dumps(payload, separators=(",", ":")).encode("ascii")
+        token = base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def get_sort_field(self, queryset):
+        """
+        Return the model field or annotation output field the queryset is
+        sorted by, used to parse the cursor value.
+        """
+        annotation = queryset.query.annotations.get(self.field)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(self.field)
+
+    def decode_cursor(self, request, queryset):
+        """
+        Decode the cursor query parameter, returning `None` for the first
+        page and raising `NotFound` for tokens that cannot be parsed or were
+        issued for another ordering.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            if payload["o"] != self.field or payload["k"] is None:
+                raise ValueError("Cursor of another ordering")
+            return {
+                "value": self.get_sort_field(queryset).to_python(payload["k"]),
+                "uuid": uuid.UUID(payload["u"]),
+                "reverse": bool(payload.get("r", False)),
+            }
+        except (
+            TypeError,
+            KeyError,
+            ValueError,
+            UnicodeEncodeError,
+            binascii.Error,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
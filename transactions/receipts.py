@@ -0,0 +1,264 @@
+"""
+Resumable chunked receipt uploads into content addressed storage
+"""
+import datetime
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.queue import enqueue
+
+from .models import ReceiptBlob, ReceiptUpload, Transaction
+from .response_cache import response_cache
+
+# Bytes read from the request or the disk at a time
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadConflict(Exception):
+    """
+    Raised when a chunk doesn't start where the upload stands, with the
+    offset the client has to resume from.
+    """
+
+    def __init__(self, received):
+        super().__init__(received)
+        self.received = received
+
+
+class IncompleteChunk(Exception):
+    """
+    Raised when the request body ends before the announced chunk length.
+    """
+
+
+def get_part_path(upload):
+    """
+    Return the path of the file an upload's chunks are written to.
+    """
+    return os.path.join(settings.MEDIA_ROOT, "uploads", f"{upload.pk}.part")
+
+
+def get_blob_name(sha256, filename):
+    """
+    Return the storage name of the content with the given hash, fanned out
+    over directories by its first two characters.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if not extension[1:].isalnum() or len(extension) > 10:
+        extension = ""
+    return f"receipts/{sha256[:2]}/{sha256}{extension}"
+
+
+def append_chunk(upload_pk, stream, offset, length):
+    """
+    Write `length` bytes of `stream` at `offset` of an upload's part file,
+    completing the upload when its last byte arrives.
+
+    The chunk is first streamed from the client to a temporary file without
+    any lock held. The upload row is then locked while the chunk is copied to
+    the part file, so concurrent chunks of one upload are written in turn
+    and a slow client doesn't hold the lock. The part file is truncated at
+    `offset` first, a chunk interrupted before it was recorded is just
+    written again.
+
+    :raises UploadConflict: When `offset` isn't the number of bytes received
+    :raises IncompleteChunk: When `stream` ends early
+    :return: Upload after the chunk
+    """
+    upload = ReceiptUpload.objects.get(pk=upload_pk)
+    if upload.blob_id is not None or offset != upload.received:
+        raise UploadConflict(upload.received)
+
+    path = get_part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.TemporaryFile(dir=os.path.dirname(path)) as chunk:
+        remaining = length
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                raise IncompleteChunk(length - remaining)
+            chunk.write(block)
+            remaining -= len(block)
+        chunk.seek(0)
+
+        with transaction.atomic():
+            upload = ReceiptUpload.objects.select_for_update().get(pk=upload_pk)
+            if upload.blob_id is not None or offset != upload.received:
+                raise UploadConflict(upload.received)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as part:
+                part.seek(offset)
+                part.truncate()
+                shutil.copyfileobj(chunk, part, BLOCK_SIZE)
+
+            upload.received += length
+            upload.save(update_fields=["received", "updated_at"])
+            if upload.received == upload.size:
+                complete_upload(upload)
+    return upload
+
+
+def hash_file(path):
+    """
+    Return the SHA-256 hex digest of a file, read a block at a time.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def store_part(path, name):
+    """
+    Move a completed part file to the storage name of its blob, or drop it
+    when that content is already stored.
+    """
+    target = default_storage.path(name)
+    if os.path.exists(target):
+        os.remove(path)
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Same content, same name: replacing a concurrent copy is harmless.
+    os.replace(path, target)
+
+
+def complete_upload(upload):
+    """
+    Point a fully received upload to the blob of its content and attach it
+    to the upload's transaction.
+
+    The part file is moved to the blob's name once the transaction commits,
+    a rolled back upload keeps it and is completed again by its last chunk.
+    A content already stored is not written again, the part file is dropped
+    and the upload shares the existing blob. The thumbnail of a new blob is
+    generated by a `process_receipt` job, queued once the file is in place.
+    """
+    path = get_part_path(upload)
+    sha256 = hash_file(path)
+    blob = ReceiptBlob.all_objects.filter(sha256=sha256).first()
+    created = False
+    if blob is None:
+        blob, created = ReceiptBlob.all_objects.get_or_create(
+            sha256=sha256,
+            defaults={
+                "file": get_blob_name(sha256, upload.filename),
+                "size": upload.size,
+                "content_type": upload.content_type,
+                "created_by": upload.user,
+            },
+        )
+
+    def store():
+        store_part(path, blob.file.name)
+        if created:
+            enqueue("process_receipt", {"blob": str(blob.pk)}, user=upload.user)
+
+    transaction.on_commit(store)
+
+    upload.blob = blob
+    upload.save(update_fields=["blob", "updated_at"])
+    if upload.transaction_id is not None:
+        Transaction.all_objects.filter(pk=upload.transaction_id).update(
+            receipt=blob.file.name,
+            receipt_blob=blob,
+            updated_by=upload.user,
+            updated_at=timezone.now(),
+        )
+        response_cache.invalidate(upload.user_id)
+    return blob
+
+
+def delete_expired_uploads(limit):
+    """
+    Delete up to `limit` unfinished uploads without a chunk for
+    `RECEIPT_UPLOAD_EXPIRY` seconds, with their part files.
+
+    The uploads are claimed with `SKIP LOCKED`, an upload receiving a chunk
+    is left alone. Its part files are removed once the deletion commits, a
+    rolled back cleanup keeps them.
+
+    :return: Number of uploads deleted
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.RECEIPT_UPLOAD_EXPIRY)
+    with transaction.atomic():
+        uploads = list(
+            ReceiptUpload.all_objects.select_for_update(skip_locked=True)
+            .filter(blob__isnull=True, updated_at__lt=cutoff)
+            .order_by("updated_at")[:limit]
+        )
+        paths = [get_part_path(upload) for upload in uploads]
+        ReceiptUpload.all_objects.filter(
+            pk__in=[upload.pk for upload in uploads]
+        ).delete()
+
+        def remove():
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        transaction.on_commit(remove)
+    return len(uploads)
+
+
+def generate_thumbnail(blob):
+    """
+    Write the thumbnail of an image blob and record the outcome in its
+    `thumbnail_status`.
+
+    Pillow is imported here, so only the worker processes load it.
+    """
+    from PIL import Image
+
+    if not blob.content_type.startswith("image/"):
+        blob.thumbnail_status = ReceiptBlob.THUMBNAIL_SKIPPED
+        blob.save(update_fields=["thumbnail_status", "updated_at"])
+        return
+
+    size = settings.RECEIPT_THUMBNAIL_SIZE
+    try:
+        with default_storage.open(blob.file.name) as file:
+            image = Image.open(file)
+            image.thumbnail((size, size))
+            output = io.BytesIO()
+            image.convert("RGB").save(output, format="JPEG", quality=85)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        blob.thumbnail_status = ReceiptBlob.THUMBNAIL_FAILED
+        blob.save(update_fields=["thumbnail_status", "updated_at"])
+        return
+
+    name = f"thumbnails/{blob.sha256[:2]}/{blob.sha256}.jpg"
+    default_storage.delete(name)
+    blob.thumbnail = default_storage.save(name, ContentFile(output.getvalue()))
+    blob.thumbnail_status = ReceiptBlob.THUMBNAIL_DONE
+    blob.save(update_fields=["thumbnail", "thumbnail_status", "updated_at"])
+
+
+def process_pending_thumbnails(limit):
+    """
+    Generate the thumbnails of up to `limit` pending blobs, oldest first.
+
+    The blobs are claimed with `SKIP LOCKED`, so several workers share the
+    queue without waiting on each other.
+
+    :return: Number of blobs processed
+    """
+    with transaction.atomic():
+        blobs = list(
+            ReceiptBlob.objects.select_for_update(skip_locked=True)
+            .filter(thumbnail_status=ReceiptBlob.THUMBNAIL_PENDING)
+            .order_by("created_at")[:limit]
+        )
+        for blob in blobs:
+            generate_thumbnail(blob)
+    return len(blobs)
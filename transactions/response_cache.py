@@ -0,0 +1,193 @@
+"""
+Shared cache of rendered transaction responses, versioned per user
+"""
+import hashlib
+import secrets
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+# Version shared by every user's responses, for the reference data
+REFERENCES = "references"
+
+
+class ResponseCache:
+    """
+    Stores rendered responses under `(user, path, format, query params,
+    version)`, in the `RESPONSE_CACHE_ALIAS` cache of the cache framework.
+
+    Each user has a version number in the same cache, bumped on every write
+    of one of their transactions. A second version, shared by every user, is
+    bumped when a currency, vendor, branch, category or tag the responses
+    show by name changes. Entries of older versions are never read again and
+    age out with the cache's `TIMEOUT` and `MAX_ENTRIES`, so invalidating is
+    one `incr` and never a pattern delete. A missing version starts at a
+    random number, so entries stored before it was evicted can't match again.
+
+    Responses larger than `RESPONSE_CACHE_MAX_SIZE` bytes aren't stored. The
+    counters are per process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.oversized = 0
+        self.invalidations = 0
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "responses")]
+
+    @property
+    def max_size(self):
+        return getattr(settings, "RESPONSE_CACHE_MAX_SIZE", 1024 * 1024)
+
+    def count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_versions(self, *names):
+        """
+        Return the versions of `names`, user ids or `REFERENCES`, in one
+        cache read when they are all set.
+        """
+        keys = [f"response-version:{name}" for name in names]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, secrets.randbits(48), timeout=None)
+                versions[key] = self.cache.get(key)
+        return [versions[key] for key in keys]
+
+    def bump_version(self, name):
+        try:
+            self.cache.incr(f"response-version:{name}")
+        except ValueError:
+            # Not set, the next read starts a new version anyway.
+            pass
+
+    def bump_versions(self, names):
+        """
+        Bump the versions now and again when the current database
+        transaction commits, so a response rendered from the rows as they
+        were before the commit isn't kept.
+        """
+        for name in names:
+            self.bump_version(name)
+            self.count("invalidations")
+        if names and transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: [self.bump_version(name) for name in names])
+
+    def invalidate(self, *user_ids):
+        """
+        Make the cached responses of the users stale.
+        """
+        self.bump_versions(set(user_ids) - {None})
+
+    def invalidate_references(self):
+        """
+        Make every cached response stale, after a change to the reference
+        data they show by name.
+        """
+        self.bump_versions({REFERENCES})
+
+    def get_key(self, request, renderer_format):
+        versions = self.get_versions(request.user.pk, REFERENCES)
+        params = sorted(request.query_params.lists())
+        digest = hashlib.md5(
+            f"{request.path}:{renderer_format}:{params}:{versions}".encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return f"response:{request.user.pk}:{digest}"
+
+    def get(self, key):
+        """
+        Return the cached response, or `None` on a miss.
+        """
+        entry = self.cache.get(key)
+        if entry is None:
+            self.count("misses")
+            return None
+        self.count("hits")
+        response = HttpResponse(entry["content"], status=entry["status"])
+        for name, value in entry["headers"]:
+            response[name] = value
+        return response
+
+    def set(self, key, response):
+        if len(response.content) > self.max_size:
+            self.count("oversized")
+            return
+        self.cache.set(
+            key,
+            {
+                "status": response.status_code,
+                "content": response.content,
+                "headers": list(response.items()),
+            },
+        )
+        self.count("stores")
+
+    def clear(self):
+        with self.lock:
+            self.hits = self.misses = self.stores = 0
+            self.oversized = self.invalidations = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "oversized": self.oversized,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache()
+
+
+class ResponseCacheMixin:
+    """
+    Serves GET requests from the response cache and stores successful ones
+    once rendered.
+
+    Goes before `ConditionalGetMixin`, a hit then skips the validators query
+    too and preconditions are checked against the cached ETag and
+    Last-Modified.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if request.method != "GET":
+            return super().get(request, *args, **kwargs)
+
+        key = response_cache.get_key(request, request.accepted_renderer.format)
+        response = response_cache.get(key)
+        if response is not None:
+            not_modified = get_conditional_response(
+                request,
+                etag=response.get("ETag"),
+                last_modified=parse_http_date_safe(response.get("Last-Modified")),
+            )
+            if not_modified is None:
+                return response
+            for header in ("ETag", "Last-Modified"):
+                if header in response:
+                    not_modified[header] = response[header]
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: response_cache.set(key, rendered)
+            )
+        return response
@@ -0,0 +1,205 @@
+"""
+Incremental maintenance of the monthly spend rollup
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import MonthlySpend, Transaction
+
+# Transaction fields that decide where and how much a row adds to the rollup
+ROLLUP_FIELDS = ["user_id", "date", "category_id", "type", "currency_id", "amount"]
+
+
+def get_contribution(values):
+    """
+    Return `(key, amount)` for the rollup row a transaction adds to, or
+    `None` when it doesn't count (soft deleted).
+
+    :param values: Mapping with the `ROLLUP_FIELDS` and `is_deleted`
+    """
+    if values["is_deleted"]:
+        return None
+    date = Transaction._meta.get_field("date").to_python(values["date"])
+    amount = Transaction._meta.get_field("amount").to_python(values["amount"])
+    key = (
+        values["user_id"],
+        date.replace(day=1),
+        values["category_id"],
+        values["type"],
+        values["currency_id"],
+    )
+    return key, amount
+
+
+def get_stored_values(instance):
+    """
+    Return the rollup relevant values of a transaction as currently stored,
+    or `None` when it isn't in the database yet.
+    """
+    if instance._state.adding:
+        return None
+    return (
+        Transaction.all_objects.filter(pk=instance.pk)
+        .values(*ROLLUP_FIELDS, "is_deleted")
+        .first()
+    )
+
+
+def get_instance_values(instance):
+    """
+    Return the rollup relevant values of a transaction instance.
+    """
+    values = {field: getattr(instance, field) for field in ROLLUP_FIELDS}
+    values["is_deleted"] = instance.is_deleted
+    return values
+
+
+def add_delta(deltas, contribution, sign):
+    """
+    Add (`sign=1`) or remove (`sign=-1`) a contribution from `deltas`, a
+    `{key: [amount, count]}` dictionary.
+    """
+    if contribution is None:
+        return
+    key, amount = contribution
+    delta = deltas[key]
+    delta[0] += sign * amount
+    delta[1] += sign
+
+
+def apply_deltas(deltas):
+    """
+    Apply `{key: [amount, count]}` deltas to the rollup with one `UPDATE`
+    per key, creating the rows that don't exist yet.
+
+    Removals from a row that doesn't exist are dropped: it was deleted along
+    with its user, whose transactions are deleted after it.
+    """
+    for (user_id, month, category_id, type_, currency_id), (amount, count) in sorted(
+        deltas.items(), key=str
+    ):
+        if not amount and not count:
+            continue
+        rows = MonthlySpend.objects.filter(
+            user_id=user_id,
+            month=month,
+            category_id=category_id,
+            type=type_,
+            currency_id=currency_id,
+        )
+        if rows.update(total=F("total") + amount, count=F("count") + count):
+            continue
+        if count < 0:
+            continue
+        try:
+            with transaction.atomic():
+                MonthlySpend.objects.create(
+                    user_id=user_id,
+                    month=month,
+                    category_id=category_id,
+                    type=type_,
+                    currency_id=currency_id,
+                    total=amount,
+                    count=count,
+                )
+        except IntegrityError:
+            # Created by a concurrent write since the update above.
+            rows.update(total=F("total") + amount, count=F("count") + count)
+
+
+def apply_changes(changes):
+    """
+    Move the contributions of transactions from their old values to their new
+    ones, given as `(old_values, new_values)` pairs. Either side may be `None`
+    for creations and deletions.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for old_values, new_values in changes:
+        if old_values is not None:
+            add_delta(deltas, get_contribution(old_values), -1)
+        if new_values is not None:
+            add_delta(deltas, get_contribution(new_values), 1)
+    apply_deltas(deltas)
+
+
+def apply_change(old_values, new_values):
+    """
+    Move a transaction's contribution from its old values to its new ones.
+    Either side may be `None` for creations and deletions.
+    """
+    apply_changes([(old_values, new_values)])
+
+
+def add_transactions(instances):
+    """
+    Add newly created transactions to the rollup, used by writes that bypass
+    the model signals like `bulk_create`.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for instance in instances:
+        add_delta(deltas, get_contribution(get_instance_values(instance)), 1)
+    apply_deltas(deltas)
+
+
+def add_rows(rows, sign=1):
+    """
+    Add (`sign=1`) or remove (`sign=-1`) live transactions given as
+    `ROLLUP_FIELDS` mappings, used by bulk updates that bypass the model
+    signals.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for values in rows:
+        add_delta(deltas, get_contribution({**values, "is_deleted": False}), sign)
+    apply_deltas(deltas)
+
+
+@transaction.atomic
+def detach_from_rollup(field, value):
+    """
+    Merge the rollup rows referencing a category or currency about to be
+    deleted into the rows without one, where its transactions land once their
+    foreign key is set to null.
+
+    :param field: `"category_id"` or `"currency_id"`
+    """
+    rows = MonthlySpend.objects.filter(**{field: value}).select_for_update()
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for row in rows:
+        values = {
+            "user_id": row.user_id,
+            "month": row.month,
+            "category_id": row.category_id,
+            "type": row.type,
+            "currency_id": row.currency_id,
+            field: None,
+        }
+        delta = deltas[tuple(values.values())]
+        delta[0] += row.total
+        delta[1] += row.count
+    rows.delete()
+    apply_deltas(deltas)
+
+
+@transaction.atomic
+def rebuild_monthly_spend(user):
+    """
+    Recompute the whole rollup of a user from their live transactions.
+
+    :return: Number of rollup rows written
+    """
+    MonthlySpend.objects.filter(user=user).delete()
+    totals = (
+        Transaction.objects.filter(user=user, is_deleted=False)
+        .annotate(month=TruncMonth("date"))
+        .values("month", "category_id", "type", "currency_id")
+        .annotate(total=Sum("amount"), count=Count("pk"))
+        .order_by()
+    )
+    rows = MonthlySpend.objects.bulk_create(
+        [MonthlySpend(user=user, **values) for values in totals]
+    )
+    return len(rows)
@@ -0,0 +1,53 @@
+"""
+Ranked free text search over the transactions' item, brand and comment
+"""
+from functools import lru_cache
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast, Greatest
+
+# Text search configuration of the `search_vector` trigger
+SEARCH_CONFIG = "english"
+
+
+@lru_cache(maxsize=None)
+def has_trigram_extension():
+    """
+    Return whether pg_trgm is installed, checked once per process.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def search_transactions(queryset, text):
+    """
+    Filter `queryset` to the transactions matching `text`, annotated with a
+    `rank` to sort them by.
+
+    Words are matched against the stored `search_vector` through its GIN
+    index, with web search syntax (`"quoted phrases"`, `or`, `-excluded`).
+    When nothing matches and pg_trgm is installed, the item and brand are
+    compared by trigram similarity instead, to find misspelled words.
+    """
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    # Ranks are cast from `real` so the cursor value compares exactly.
+    matches = queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+    )
+    if not has_trigram_extension() or matches.exists():
+        return matches
+
+    similarity = Greatest(
+        TrigramWordSimilarity(text, "item"),
+        TrigramWordSimilarity(text, "brand"),
+    )
+    return queryset.filter(
+        Q(item__trigram_word_similar=text) | Q(brand__trigram_word_similar=text)
+    ).annotate(rank=Cast(similarity, FloatField()))
@@ -1,37 +1,287 @@
 """
 Serializers for model classes
 """
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
-from .models import Branch, Category, CurrencyCode, Tag, Transaction, Vendor
+from monitoring.instrumentation import TimedSerializerMixin
 
+from .bulk import BULK_UPDATE_FIELDS
+from .cache import reference_cache
+from .exchange import get_base_amount
+from .models import (
+    Branch,
+    Category,
+    CurrencyCode,
+    ReceiptUpload,
+    Tag,
+    Transaction,
+    TransactionTag,
+    Vendor,
+)
+from .response_cache import response_cache
+from .rollups import add_transactions
 
-class TransactionSerializer(serializers.ModelSerializer):
+
+def get_or_create_tags(names):
+    """
+    Return a `{name: Tag}` dictionary for the given tag names, creating the
+    missing tags.
+
+    Existing tags are read with one query, soft deleted ones are restored.
+    Missing ones are inserted with `ON CONFLICT DO NOTHING`, so concurrent
+    writers can't create duplicates, and read back with a second query.
+    """
+    names = set(names)
+    tags = {tag.name: tag for tag in Tag.all_objects.filter(name__in=names)}
+    deleted = [tag.pk for tag in tags.values() if tag.is_deleted]
+    if deleted:
+        Tag.all_objects.filter(pk__in=deleted).undelete()
+    missing = names - tags.keys()
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        tags.update({tag.name: tag for tag in Tag.all_objects.filter(name__in=missing)})
+    return tags
+
+
+def set_transaction_tags(instance, tags):
+    """
+    Make `tags` the tags of the transaction, deleting and inserting only the
+    links that changed.
+    """
+    tag_ids = {tag.pk for tag in tags.values()}
+    links = TransactionTag.all_objects.filter(transaction=instance)
+    current_ids = set(links.values_list("tag_id", flat=True))
+
+    removed = current_ids - tag_ids
+    if removed:
+        links.filter(tag_id__in=removed).delete()
+
+    added = tag_ids - current_ids
+    if added:
+        TransactionTag.objects.bulk_create(
+            [TransactionTag(transaction=instance, tag_id=tag_id) for tag_id in added]
+        )
+
+
+class TagNameField(serializers.SlugRelatedField):
+    """
+    Accepts tag names as they are, the tags themselves are created when the
+    transaction is saved.
+    """
+
+    default_error_messages = {
+        "invalid": "Tag names must be non empty strings.",
+        "max_length": "Ensure tag names have no more than {max_length} characters.",
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or not data:
+            self.fail("invalid")
+        max_length = Tag._meta.get_field("name").max_length
+        if len(data) > max_length:
+            self.fail("max_length", max_length=max_length)
+        return data
+
+
+class LookupSlugRelatedField(serializers.SlugRelatedField):
+    """
+    Slug related field that resolves values from the lookups preloaded by
+    `TransactionListSerializer`, so bulk payloads don't run a query per row.
+
+    With `cached=True` single values are resolved through the process-local
+    reference cache, only querying the database on a miss. Otherwise it
+    falls back to the regular per value query.
+    """
+
+    def __init__(self, cached=False, **kwargs):
+        self.cached = cached
+        super().__init__(**kwargs)
+
+    @property
+    def lookup_key(self):
+        return (self.queryset.model, self.slug_field)
+
+    def to_internal_value(self, data):
+        lookups = self.context.get("slug_lookups", {})
+        if self.lookup_key in lookups:
+            if not isinstance(data, (str, int)):
+                self.fail("invalid")
+            try:
+                return lookups[self.lookup_key][str(data)]
+            except KeyError:
+                self.fail(
+                    "does_not_exist",
+                    slug_name=self.slug_field,
+                    value=str(data),
+                )
+
+        if not self.cached or not isinstance(data, (str, int)):
+            return super().to_internal_value(data)
+
+        model = self.queryset.model
+        pk = reference_cache.get(model, self.slug_field, str(data))
+        if pk is not None:
+            # Only the primary key and slug are known, any other field is
+            # loaded on access like a deferred field.
+            # `from_db` expects the values in the model's field order.
+            known = {
+                model._meta.pk.attname: pk,
+                model._meta.get_field(self.slug_field).attname: str(data),
+            }
+            field_names = [
+                field.attname
+                for field in model._meta.concrete_fields
+                if field.attname in known
+            ]
+            return model.from_db(
+                self.queryset.db,
+                field_names,
+                [known[name] for name in field_names],
+            )
+
+        instance = super().to_internal_value(data)
+        reference_cache.set(model, self.slug_field, str(data), instance.pk)
+        return instance
+
+
+class TransactionListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    List serializer used when many transactions are written at once.
+
+    Resolves every slug referenced by the payload with one query per related
+    model before validating the rows, creates all the missing tags at once,
+    and inserts the rows and their tags with one `bulk_create` each. When
+    `allow_partial` is set in the context, rows that fail validation are
+    reported in `row_errors` instead of failing the whole request.
+    """
+
+    def get_lookup_fields(self):
+        """
+        Return `(field_name, field, many)` for each writable slug field of the
+        child serializer.
+        """
+        lookup_fields = []
+        for field_name, field in self.child.fields.items():
+            if field.read_only:
+                continue
+            if isinstance(field, serializers.ManyRelatedField):
+                if isinstance(field.child_relation, LookupSlugRelatedField):
+                    lookup_fields.append((field_name, field.child_relation, True))
+            elif isinstance(field, LookupSlugRelatedField):
+                lookup_fields.append((field_name, field, False))
+        return lookup_fields
+
+    def get_slug_lookups(self, data):
+        """
+        Map each slug field to a `{slug: instance}` dictionary holding the
+        instances referenced anywhere in `data`.
+        """
+        lookups = {}
+        for field_name, field, many in self.get_lookup_fields():
+            values = set()
+            for row in data:
+                if not isinstance(row, dict) or row.get(field_name) is None:
+                    continue
+                value = row[field_name]
+                for item in value if many and isinstance(value, list) else [value]:
+                    if isinstance(item, (str, int)):
+                        values.add(str(item))
+
+            lookup = {}
+            queryset = field.get_queryset().filter(
+                **{f"{field.slug_field}__in": values}
+            )
+            for instance in queryset:
+                lookup.setdefault(str(getattr(instance, field.slug_field)), instance)
+            lookups[field.lookup_key] = lookup
+        return lookups
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.context["slug_lookups"] = self.get_slug_lookups(data)
+
+        # The shape of the payload is always checked as a whole.
+        self.row_errors = []
+        if not self.context.get("allow_partial") or not isinstance(data, list):
+            return super().to_internal_value(data)
+        if self.max_length is not None and len(data) > self.max_length:
+            return super().to_internal_value(data)
+
+        validated_rows = []
+        for index, row in enumerate(data):
+            try:
+                validated_rows.append(self.child.run_validation(row))
+            except serializers.ValidationError as exc:
+                self.row_errors.append({"index": index, "errors": exc.detail})
+        return validated_rows
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """
+        Insert all the transactions and their tag links with one query each.
+        """
+        tags_per_row = [attrs.pop("tags", []) for attrs in validated_data]
+        for attrs in validated_data:
+            attrs["base_amount"] = get_base_amount(
+                attrs.get("user"), attrs["amount"], attrs.get("currency"), attrs["date"]
+            )
+        tags = get_or_create_tags(name for names in tags_per_row for name in names)
+        instances = Transaction.objects.bulk_create(
+            [Transaction(**attrs) for attrs in validated_data]
+        )
+        TransactionTag.objects.bulk_create(
+            [
+                TransactionTag(transaction=instance, tag=tags[name])
+                for instance, names in zip(instances, tags_per_row)
+                for name in dict.fromkeys(names)
+            ]
+        )
+        add_transactions(instances)
+        response_cache.invalidate(*{instance.user_id for instance in instances})
+        prefetch_related_objects(instances, "tags")
+        return instances
+
+
+class TransactionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Transaction model.
     Handles serialization and deserialization of Transaction instances,
     including custom create and update methods.
     """
 
-    user = serializers.SlugRelatedField(
+    user = LookupSlugRelatedField(
         slug_field="username",
         queryset=get_user_model().objects.all(),
+        cached=True,
     )
-    currency = serializers.SlugRelatedField(
-        slug_field="code", queryset=CurrencyCode.objects.all()
+    currency = LookupSlugRelatedField(
+        slug_field="code",
+        queryset=CurrencyCode.objects.all(),
+        cached=True,
     )
-    vendor = serializers.SlugRelatedField(
-        slug_field="name", queryset=Vendor.objects.all()
+    vendor = LookupSlugRelatedField(
+        slug_field="name",
+        queryset=Vendor.objects.all(),
+        cached=True,
     )
-    branch = serializers.SlugRelatedField(
-        slug_field="name", queryset=Branch.objects.all()
+    branch = LookupSlugRelatedField(
+        slug_field="name",
+        queryset=Branch.objects.all(),
+        cached=True,
     )
-    category = serializers.SlugRelatedField(
-        slug_field="name", queryset=Category.objects.all()
+    category = LookupSlugRelatedField(
+        slug_field="name",
+        queryset=Category.objects.all(),
+        cached=True,
     )
-    tags = serializers.SlugRelatedField(
+    tags = TagNameField(
         many=True,
         queryset=Tag.objects.all(),
         slug_field="name",
@@ -39,11 +289,13 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Transaction
+        list_serializer_class = TransactionListSerializer
         fields = [
             "uuid",
             "date",
             "type",
             "amount",
+            "base_amount",
             "item",
             "quantity",
             "brand",
@@ -65,6 +317,28 @@ class TransactionSerializer(serializers.ModelSerializer):
             "updated_by",
         ]
 
+    # Related rows whose slug is rendered for every transaction
+    select_related_fields = ["user", "currency", "vendor", "branch", "category"]
+
+    @classmethod
+    def optimize_queryset(cls, queryset):
+        """
+        Load exactly what the serializer renders: the slugs of the related
+        rows through joins and the tag names with a single prefetch.
+        `created_by` and `updated_by` are rendered from their ids, so they
+        aren't joined.
+        """
+        slug_fields = [
+            f"{name}__{cls._declared_fields[name].slug_field}"
+            for name in cls.select_related_fields
+        ]
+        model_fields = [name for name in cls.Meta.fields if name != "tags"]
+        return (
+            queryset.select_related(*cls.select_related_fields)
+            .only(*model_fields, *slug_fields)
+            .prefetch_related(Prefetch("tags", queryset=Tag.objects.only("name")))
+        )
+
     def __init__(self, *args, **kwargs):
         """
         Initialize the serializer.
@@ -83,32 +357,315 @@ class TransactionSerializer(serializers.ModelSerializer):
         Using transaction.atomic to ensure database integrity.
         """
         tag_names = validated_data.pop("tags")
-        new_transactions = Transaction.objects.create(**validated_data)
-
-        tags_to_add = []
-
-        for tag_name in tag_names:
-            tag, _ = Tag.objects.get_or_create(name=tag_name)
-            tags_to_add.append(tag)
-
-        new_transactions.tags.add(*tags_to_add)
-        return new_transactions
+        validated_data["base_amount"] = get_base_amount(
+            validated_data.get("user"),
+            validated_data["amount"],
+            validated_data.get("currency"),
+            validated_data["date"],
+        )
+        new_transaction = Transaction.objects.create(**validated_data)
+        set_transaction_tags(new_transaction, get_or_create_tags(tag_names))
+        return new_transaction
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
         Custom update method to handle soft deletion and related fields like
-        tags.
+        tags. Only the tag links that changed are written.
         """
-        tag_names = []
-        if "tags" in validated_data:
-            tag_names = validated_data.pop("tags")
+        tag_names = validated_data.pop("tags", None)
+
+        if {"user", "amount", "currency", "date"} & validated_data.keys():
+            validated_data["base_amount"] = get_base_amount(
+                validated_data.get("user", instance.user),
+                validated_data.get("amount", instance.amount),
+                validated_data.get("currency", instance.currency),
+                validated_data.get("date", instance.date),
+            )
 
         instance = super().update(instance, validated_data)
 
-        if tag_names:
-            instance.tags.clear()
-            for tag_name in tag_names:
-                tag, _ = Tag.objects.get_or_create(name=tag_name)
-                instance.tags.add(tag)
+        if tag_names is not None:
+            set_transaction_tags(instance, get_or_create_tags(tag_names))
 
         return instance
+
+
+class TransactionExportFilterSerializer(serializers.Serializer):
+    """
+    Validates the date range of a transaction export.
+    """
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        date_from = attrs.get("date_from")
+        date_to = attrs.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise serializers.ValidationError("date_from must not be after date_to.")
+        return attrs
+
+
+class TransactionExportJobSerializer(TransactionExportFilterSerializer):
+    """
+    Validates the format and date range of an export run as a background
+    job.
+    """
+
+    format = serializers.ChoiceField(choices=["csv", "ndjson"])
+
+
+class TransactionListFilterSerializer(TransactionExportFilterSerializer):
+    """
+    Validates the filters, search text and ordering of the transaction
+    listing.
+    """
+
+    # Non-null fields the listing can be sorted by, each with an index
+    ORDERING_FIELDS = ["date", "amount", "created_at", "updated_at"]
+
+    search = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    type = serializers.ChoiceField(
+        choices=Transaction.TRANSACTION_TYPE_CHOICES, required=False
+    )
+    category = serializers.CharField(required=False)
+    parent_category = serializers.CharField(required=False)
+    vendor = serializers.CharField(required=False)
+    branch = serializers.CharField(required=False)
+    currency = serializers.CharField(required=False)
+    tag = serializers.ListField(child=serializers.CharField(), required=False)
+    tag_match = serializers.ChoiceField(choices=["any", "all"], default="any")
+    amount_min = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+    amount_max = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+    is_deleted = serializers.BooleanField(required=False, allow_null=True, default=None)
+    ordering = serializers.ChoiceField(
+        choices=[
+            *ORDERING_FIELDS,
+            *(f"-{field}" for field in ORDERING_FIELDS),
+        ],
+        required=False,
+    )
+
+    def validate_currency(self, value):
+        # Codes are stored upper-case, an exact match uses their unique index.
+        return value.upper()
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        amount_min = attrs.get("amount_min")
+        amount_max = attrs.get("amount_max")
+        if amount_min is not None and amount_max is not None:
+            if amount_min > amount_max:
+                raise serializers.ValidationError(
+                    "amount_min must not be above amount_max."
+                )
+        return attrs
+
+
+class MonthlySpendFilterSerializer(TransactionExportFilterSerializer):
+    """
+    Validates the date range and grouping of the monthly spend report.
+    """
+
+    group_by = serializers.ChoiceField(
+        choices=["category", "parent_category"],
+        default="category",
+    )
+
+
+class MonthlySpendSerializer(serializers.Serializer):
+    """
+    Serializer for a row of the monthly spend report.
+    """
+
+    month = serializers.DateField()
+    category = serializers.CharField(allow_null=True, required=False)
+    parent_category = serializers.CharField(allow_null=True, required=False)
+    type = serializers.CharField()
+    currency = serializers.CharField(allow_null=True)
+    total = serializers.DecimalField(max_digits=16, decimal_places=2)
+    count = serializers.IntegerField()
+
+    def __init__(self, *args, **kwargs):
+        """
+        Only render the category level the report was grouped by.
+        """
+        super().__init__(*args, **kwargs)
+        group_by = self.context.get("group_by", "category")
+        self.fields.pop(
+            "category" if group_by == "parent_category" else "parent_category"
+        )
+
+
+class ConvertedTotalSerializer(serializers.Serializer):
+    """
+    Serializer for a row of the converted totals report.
+    """
+
+    month = serializers.DateField()
+    type = serializers.CharField()
+    total = serializers.DecimalField(max_digits=16, decimal_places=2)
+    count = serializers.IntegerField()
+    unconverted = serializers.IntegerField()
+
+
+class TransactionTombstoneSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a soft deleted transaction in the changes feed.
+    """
+
+    class Meta:
+        model = Transaction
+        fields = ["uuid", "deleted_at"]
+
+
+class BulkUUIDsField(serializers.ListField):
+    """
+    Non-empty list of transaction uuids, at most `TRANSACTION_BULK_MAX_ROWS`
+    of them.
+    """
+
+    child = serializers.UUIDField()
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("allow_empty", False)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        max_rows = settings.TRANSACTION_BULK_MAX_ROWS
+        if len(value) > max_rows:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {max_rows} elements."
+            )
+        return value
+
+
+class TransactionBulkDeleteSerializer(serializers.Serializer):
+    """
+    Validates the transactions of a bulk soft delete or undelete.
+    """
+
+    uuids = BulkUUIDsField()
+    is_deleted = serializers.BooleanField(default=True)
+
+
+class TransactionBulkUpdateValuesSerializer(serializers.ModelSerializer):
+    """
+    Validates the fields set by a bulk update, all optional but at least one
+    required.
+    """
+
+    currency = LookupSlugRelatedField(
+        slug_field="code",
+        queryset=CurrencyCode.objects.all(),
+        cached=True,
+        allow_null=True,
+        required=False,
+    )
+    vendor = LookupSlugRelatedField(
+        slug_field="name",
+        queryset=Vendor.objects.all(),
+        cached=True,
+        allow_null=True,
+        required=False,
+    )
+    branch = LookupSlugRelatedField(
+        slug_field="name",
+        queryset=Branch.objects.all(),
+        cached=True,
+        allow_null=True,
+        required=False,
+    )
+    category = LookupSlugRelatedField(
+        slug_field="name",
+        queryset=Category.objects.all(),
+        cached=True,
+        allow_null=True,
+        required=False,
+    )
+
+    class Meta:
+        model = Transaction
+        fields = BULK_UPDATE_FIELDS
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError(
+                f"Set at least one of {', '.join(BULK_UPDATE_FIELDS)}."
+            )
+        return attrs
+
+
+class TransactionBulkUpdateSerializer(serializers.Serializer):
+    """
+    Validates a bulk update: the transactions, picked by `uuids` or by the
+    listing `filter`, and the values to `set` on them.
+    """
+
+    uuids = BulkUUIDsField(required=False)
+    filter = TransactionListFilterSerializer(required=False)
+    set = TransactionBulkUpdateValuesSerializer()
+
+    def validate(self, attrs):
+        if ("uuids" in attrs) == ("filter" in attrs):
+            raise serializers.ValidationError("Provide either uuids or filter.")
+        return attrs
+
+
+class ReceiptUploadSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a chunked receipt upload: what the client announces when
+    starting it, and where it stands afterwards.
+    """
+
+    transaction = serializers.PrimaryKeyRelatedField(
+        queryset=Transaction.all_objects.all(), required=False, allow_null=True
+    )
+    # Null until the last chunk is received
+    receipt = serializers.FileField(source="blob.file", read_only=True, default=None)
+    thumbnail = serializers.FileField(
+        source="blob.thumbnail", read_only=True, default=None
+    )
+    thumbnail_status = serializers.CharField(
+        source="blob.thumbnail_status", read_only=True, default=None
+    )
+
+    class Meta:
+        model = ReceiptUpload
+        fields = [
+            "uuid",
+            "filename",
+            "content_type",
+            "size",
+            "received",
+            "transaction",
+            "receipt",
+            "thumbnail",
+            "thumbnail_status",
+            "created_at",
+        ]
+        read_only_fields = ["uuid", "received", "created_at"]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is not None:
+            # Receipts are only attached to the user's own transactions.
+            fields["transaction"].queryset = Transaction.all_objects.filter(
+                user=request.user
+            )
+        return fields
+
+    def validate_size(self, value):
+        max_size = settings.RECEIPT_UPLOAD_MAX_SIZE
+        if not 0 < value <= max_size:
+            raise serializers.ValidationError(
+                f"Ensure this value is between 1 and {max_size} bytes."
+            )
+        return value
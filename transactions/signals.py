@@ -0,0 +1,167 @@
+"""
+Signal handlers for the transactions app
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .cache import reference_cache
+from .exchange import rate_index, refresh_base_amounts
+from .models import (
+    Branch,
+    Category,
+    CurrencyCode,
+    ExchangeRate,
+    Tag,
+    Transaction,
+    Vendor,
+)
+from .response_cache import response_cache
+from .rollups import (
+    apply_change,
+    detach_from_rollup,
+    get_instance_values,
+    get_stored_values,
+)
+
+# Models resolved by slug through the reference cache
+REFERENCE_MODELS = (CurrencyCode, Vendor, Branch, Category, get_user_model())
+# Models shown by name in the cached transaction responses
+RESPONSE_REFERENCE_MODELS = (CurrencyCode, Vendor, Branch, Category, Tag)
+
+
+def invalidate_reference_cache(sender, **kwargs):
+    """
+    Drop the cached slugs of a reference model when one of its rows changes.
+    """
+    reference_cache.invalidate(sender)
+
+
+for model in REFERENCE_MODELS:
+    post_save.connect(
+        invalidate_reference_cache,
+        sender=model,
+        dispatch_uid=f"reference_cache_save_{model._meta.label_lower}",
+    )
+    post_delete.connect(
+        invalidate_reference_cache,
+        sender=model,
+        dispatch_uid=f"reference_cache_delete_{model._meta.label_lower}",
+    )
+
+
+@receiver(pre_save, sender=Transaction, dispatch_uid="rollup_pre_save")
+def remember_stored_values(sender, instance, raw=False, **kwargs):
+    """
+    Keep the values the transaction had before the save, to know what to
+    remove from the monthly rollup.
+    """
+    if not raw:
+        instance._rollup_old_values = get_stored_values(instance)
+
+
+@receiver(post_save, sender=Transaction, dispatch_uid="rollup_post_save")
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Move the transaction's contribution to the monthly rollup, covering
+    creations, updates, soft deletes and undeletes.
+    """
+    if not raw:
+        old_values = getattr(instance, "_rollup_old_values", None)
+        apply_change(old_values, get_instance_values(instance))
+
+
+@receiver(post_delete, sender=Transaction, dispatch_uid="rollup_post_delete")
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """
+    Remove a hard deleted transaction from the monthly rollup.
+    """
+    apply_change(get_instance_values(instance), None)
+
+
+@receiver(pre_delete, sender=Category, dispatch_uid="rollup_category_delete")
+@receiver(pre_delete, sender=CurrencyCode, dispatch_uid="rollup_currency_delete")
+def detach_rollup_on_delete(sender, instance, **kwargs):
+    """
+    Move the monthly rollup of a hard deleted category or currency to the
+    rows without one, which may already exist.
+    """
+    field = "category_id" if sender is Category else "currency_id"
+    detach_from_rollup(field, instance.pk)
+
+
+@receiver(post_save, sender=Transaction, dispatch_uid="response_cache_save")
+@receiver(post_delete, sender=Transaction, dispatch_uid="response_cache_delete")
+def invalidate_response_cache(sender, instance, raw=False, **kwargs):
+    """
+    Make the owner's cached responses stale when a transaction is written,
+    soft deleted, undeleted or deleted.
+    """
+    if not raw:
+        response_cache.invalidate(instance.user_id)
+
+
+def invalidate_response_cache_references(
+    sender, instance, created=False, raw=False, **kwargs
+):
+    """
+    Make the cached responses stale when a currency, vendor, branch,
+    category or tag they show by name is changed or deleted, or only the
+    user's own when a user is. New rows aren't in any response yet.
+    """
+    if raw or created:
+        return
+    if sender is get_user_model():
+        response_cache.invalidate(instance.pk)
+    else:
+        response_cache.invalidate_references()
+
+
+for model in (*RESPONSE_REFERENCE_MODELS, get_user_model()):
+    post_save.connect(
+        invalidate_response_cache_references,
+        sender=model,
+        dispatch_uid=f"response_cache_save_{model._meta.label_lower}",
+    )
+    post_delete.connect(
+        invalidate_response_cache_references,
+        sender=model,
+        dispatch_uid=f"response_cache_delete_{model._meta.label_lower}",
+    )
+
+
+@receiver(post_save, sender=ExchangeRate, dispatch_uid="rate_index_save")
+@receiver(post_delete, sender=ExchangeRate, dispatch_uid="rate_index_delete")
+def invalidate_rate_index(sender, **kwargs):
+    """
+    Drop the in-memory rate index when a rate changes.
+    """
+    rate_index.invalidate()
+
+
+@receiver(post_init, sender=get_user_model(), dispatch_uid="base_currency_init")
+def remember_base_currency(sender, instance, **kwargs):
+    """
+    Keep the base currency a user was loaded with, read from `__dict__` so
+    deferred instances don't trigger a query.
+    """
+    instance._stored_base_currency_id = instance.__dict__.get("base_currency_id")
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid="base_currency_save")
+def convert_to_new_base_currency(sender, instance, created, raw=False, **kwargs):
+    """
+    Recompute the stored base amounts of a user's transactions when their
+    base currency changes.
+    """
+    if created or raw or "base_currency_id" not in instance.__dict__:
+        return
+    if instance.base_currency_id != instance._stored_base_currency_id:
+        refresh_base_amounts(Transaction.all_objects.filter(user=instance))
+        instance._stored_base_currency_id = instance.base_currency_id
@@ -0,0 +1,92 @@
+"""
+Delta sync of a user's transactions from a watermark
+"""
+import base64
+import binascii
+import datetime
+import json
+import uuid
+
+from django.conf import settings
+from django.db.models import DateTimeField, Func, Q
+from django.utils import timezone
+
+
+class ClockTimestamp(Func):
+    """
+    Time each row is written at, for writers of many rows: unlike `now()`,
+    not the start of the statement or transaction.
+    """
+
+    function = "clock_timestamp"
+    template = "%(function)s()"
+    output_field = DateTimeField()
+
+
+class InvalidWatermark(ValueError):
+    """
+    Raised when a watermark token cannot be parsed.
+    """
+
+
+def encode_watermark(instance):
+    """
+    Return the opaque token of the `(updated_at, uuid)` key of a transaction.
+    """
+    payload = {"t": instance.updated_at.isoformat(), "u": str(instance.uuid)}
+    raw = json.dumps(payload, separators=(",", ":")).encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_watermark(token):
+    """
+    Return the `(updated_at, uuid)` key held by a watermark token.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        updated_at = datetime.datetime.fromisoformat(payload["t"])
+        if timezone.is_naive(updated_at):
+            raise ValueError("Naive timestamp")
+        return updated_at, uuid.UUID(payload["u"])
+    except (TypeError, KeyError, ValueError, UnicodeEncodeError, binascii.Error):
+        raise InvalidWatermark(token)
+
+
+def get_changes_queryset(queryset, watermark):
+    """
+    Return the transactions of `queryset` changed after the watermark, oldest
+    change first.
+
+    Changes are ordered by `(updated_at, uuid)`, so rows saved in the same
+    instant are neither skipped nor repeated across pages, and the scan starts
+    at the watermark in the `(user, updated_at, uuid)` index. Rows written in
+    the last `TRANSACTION_SYNC_LAG` seconds are held back: `updated_at` is set
+    before the write commits, and a slow transaction could otherwise commit
+    a row behind a watermark already handed out.
+
+    This only holds for writers committing within `TRANSACTION_SYNC_LAG` of
+    stamping their rows. Writers of many rows stamp them last: the import
+    restamps its rows right before its commit and `refresh_base_amounts`
+    stamps each row with `ClockTimestamp` as it writes it.
+
+    :param watermark: `(updated_at, uuid)` key or `None` to start from the
+    beginning
+    """
+    lag = datetime.timedelta(seconds=settings.TRANSACTION_SYNC_LAG)
+    queryset = queryset.filter(updated_at__lt=timezone.now() - lag)
+    if watermark is not None:
+        updated_at, pk = watermark
+        after = Q(updated_at__gt=updated_at) | Q(uuid__gt=pk)
+        queryset = queryset.filter(Q(updated_at__gte=updated_at) & after)
+    return queryset.order_by("updated_at", "uuid")
+
+
+def get_changes(queryset, watermark, limit):
+    """
+    Return up to `limit` changes after the watermark and whether there are
+    more.
+    """
+    # Fetch one extra row to find out whether there's more.
+    rows = list(get_changes_queryset(queryset, watermark)[: limit + 1])
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from accounts.throttling import SlidingWindowUserRateThrottle
+
+from .factories import CurrencyCodeFactory, TransactionFactory, UserFactory
+
+
+class AsyncTransactionViewTests(APITestCase):
+    """
+    Test case for the async list and detail views, which must answer like
+    the DRF views they mirror.
+    """
+
+    endpoint_list = "api:transaction-list-create"
+    endpoint_detail = "api:transaction-retrieve-update-destroy"
+    endpoint_async_list = "api:transaction-list-async"
+    endpoint_async_detail = "api:transaction-detail-async"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.token = Token.objects.create(user=cls.user)
+        currency = CurrencyCodeFactory()
+        cls.transactions = TransactionFactory.create_batch(
+            5, user=cls.user, currency=currency
+        )
+        cls.other = TransactionFactory(currency=currency)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_list_matches_the_drf_view(self):
+        for params in ({}, {"page_size": 2}, {"ordering": "amount", "page_size": 3}):
+            with self.subTest(params=params):
+                expected = self.client.get(reverse(self.endpoint_list), params)
+                response = self.client.get(reverse(self.endpoint_async_list), params)
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.json()["results"], expected.json()["results"])
+                self.assertEqual(response["ETag"], expected["ETag"])
+
+    def test_list_follows_cursors(self):
+        url = reverse(self.endpoint_async_list) + "?page_size=2"
+        uuids = []
+        while url:
+            data = self.client.get(url).json()
+            uuids.extend(row["uuid"] for row in data["results"])
+            url = data["next"]
+
+        self.assertEqual(
+            sorted(uuids), sorted(str(tr.uuid) for tr in self.transactions)
+        )
+
+    def test_detail_matches_the_drf_view(self):
+        tr = self.transactions[0]
+        expected = self.client.get(reverse(self.endpoint_detail, kwargs={"pk": tr.pk}))
+        url = reverse(self.endpoint_async_detail, kwargs={"pk": tr.pk})
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected.json())
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other = reverse(self.endpoint_async_detail, kwargs={"pk": self.other.pk})
+        self.assertEqual(self.client.get(other).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_errors(self):
+        url = reverse(self.endpoint_async_list)
+
+        response = self.client.get(url, {"type": "Gift"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("type", response.json())
+        response = self.client.get(url, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token nope")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+
+        self.client.credentials()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = False
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_requests_are_throttled_with_the_drf_views(self):
+        with mock.patch.object(
+            SlidingWindowUserRateThrottle, "THROTTLE_RATES", {"user": "2/hour"}
+        ):
+            self.client.get(reverse(self.endpoint_list))
+            response = self.client.get(reverse(self.endpoint_async_list))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.get(reverse(self.endpoint_async_list))
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response["Retry-After"]), 0)
@@ -0,0 +1,223 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from transactions.bulk import soft_delete_transactions, update_transactions
+from transactions.cache import ReferenceCache, reference_cache
+from transactions.checks import check_response_cache_backend
+from transactions.models import Transaction, Vendor
+from transactions.response_cache import response_cache
+from transactions.serializers import TransactionSerializer
+
+from .factories import (
+    CurrencyCodeFactory,
+    TransactionFactory,
+    UserFactory,
+    VendorFactory,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ReferenceCacheTests(SimpleTestCase):
+    """
+    Test case for the expiry, eviction and counters of `ReferenceCache`.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ReferenceCache(clock=self.clock)
+
+    @override_settings(REFERENCE_CACHE_TTL=10)
+    def test_entries_expire(self):
+        self.cache.set(Vendor, "name", "shop", 1)
+        self.assertEqual(self.cache.get(Vendor, "name", "shop"), 1)
+
+        self.clock.now = 11
+        self.assertIsNone(self.cache.get(Vendor, "name", "shop"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    @override_settings(REFERENCE_CACHE_MAX_SIZE=2)
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set(Vendor, "name", "a", 1)
+        self.cache.set(Vendor, "name", "b", 2)
+        self.cache.get(Vendor, "name", "a")
+        self.cache.set(Vendor, "name", "c", 3)
+
+        self.assertIsNone(self.cache.get(Vendor, "name", "b"))
+        self.assertEqual(self.cache.get(Vendor, "name", "a"), 1)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_counters(self):
+        self.cache.set(Vendor, "name", "a", 1)
+        self.cache.get(Vendor, "name", "a")
+        self.cache.get(Vendor, "name", "missing")
+
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+
+class ReferenceCacheFieldTests(TestCase):
+    """
+    Test case for the slug fields of `TransactionSerializer` backed by the
+    reference cache.
+    """
+
+    def setUp(self):
+        reference_cache.clear()
+        self.vendor = VendorFactory()
+        self.field = TransactionSerializer().fields["vendor"]
+
+    def test_second_lookup_is_served_from_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.field.to_internal_value(self.vendor.name).pk, self.vendor.pk
+            )
+        with self.assertNumQueries(0):
+            vendor = self.field.to_internal_value(self.vendor.name)
+        self.assertEqual(vendor.pk, self.vendor.pk)
+        self.assertEqual(vendor.name, self.vendor.name)
+
+    def test_saving_a_row_invalidates_the_model(self):
+        self.field.to_internal_value(self.vendor.name)
+        self.vendor.name = "renamed"
+        self.vendor.save()
+
+        self.assertEqual(reference_cache.stats()["size"], 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.field.to_internal_value("renamed").pk, self.vendor.pk)
+
+
+class ResponseCacheTests(APITestCase):
+    """
+    Test case for the per-user versioned cache of transaction responses.
+    """
+
+    endpoint_list = "api:transaction-list-create"
+    endpoint_detail = "api:transaction-retrieve-update-destroy"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.currency = CurrencyCodeFactory()
+        cls.transactions = TransactionFactory.create_batch(
+            3, user=cls.user, currency=cls.currency
+        )
+
+    def setUp(self):
+        super().setUp()
+        response_cache.cache.clear()
+        response_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_repeated_reads_are_served_from_cache(self):
+        url = reverse(self.endpoint_list)
+        first = self.client.get(url, {"page_size": 2, "ordering": "amount"})
+
+        # Only the throttle counter.
+        with self.assertNumQueries(1):
+            second = self.client.get(url, {"ordering": "amount", "page_size": 2})
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second["Content-Type"], first["Content-Type"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url,
+                {"page_size": 2, "ordering": "amount"},
+                HTTP_IF_NONE_MATCH=first["ETag"],
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], first["ETag"])
+
+        # Other parameters, formats and users have their own entries.
+        self.assertNotEqual(self.client.get(url).content, first.content)
+        self.client.force_authenticate(user=UserFactory())
+        self.assertEqual(self.client.get(url).data["results"], [])
+
+        self.assertEqual(
+            {name: response_cache.stats()[name] for name in ("hits", "stores")},
+            {"hits": 2, "stores": 3},
+        )
+
+    def test_writes_make_responses_stale(self):
+        list_url = reverse(self.endpoint_list)
+        tr = self.transactions[0]
+        detail_url = reverse(self.endpoint_detail, kwargs={"pk": tr.pk})
+
+        writes = [
+            lambda: self.client.patch(detail_url, {"comment": "Edited"}, format="json"),
+            lambda: self.client.patch(detail_url, {"is_deleted": True}, format="json"),
+            lambda: self.client.patch(detail_url, {"is_deleted": False}, format="json"),
+            lambda: update_transactions(
+                Transaction.objects.filter(pk=tr.pk), {"type": "Income"}
+            ),
+            lambda: soft_delete_transactions(Transaction.objects.filter(pk=tr.pk)),
+        ]
+        for write in writes:
+            before = self.client.get(list_url).content, self.client.get(detail_url)
+            write()
+            after = self.client.get(list_url).content, self.client.get(detail_url)
+            self.assertNotEqual(after[0], before[0])
+            self.assertNotEqual(after[1]["ETag"], before[1]["ETag"])
+
+        before = self.client.get(list_url).content
+        TransactionFactory(user=self.user, currency=self.currency)
+        self.assertNotEqual(self.client.get(list_url).content, before)
+
+    def test_reference_changes_make_responses_stale(self):
+        url = reverse(self.endpoint_list)
+        before = self.client.get(url).content
+
+        # New reference rows aren't in any response.
+        VendorFactory()
+        self.assertEqual(self.client.get(url).content, before)
+        self.assertEqual(response_cache.stats()["hits"], 1)
+
+        self.currency.code = "ZZZ"
+        self.currency.save()
+        response = self.client.get(url)
+        self.assertNotEqual(response.content, before)
+        self.assertEqual(response.data["results"][0]["currency"], "ZZZ")
+
+    def test_evicted_version_does_not_reuse_entries(self):
+        url = reverse(self.endpoint_list)
+        first = self.client.get(url)
+        response_cache.cache.delete(f"response-version:{self.user.pk}")
+
+        self.client.get(url)
+        self.assertEqual(response_cache.stats()["hits"], 0)
+        self.assertEqual(self.client.get(url).content, first.content)
+
+    @override_settings(RESPONSE_CACHE_MAX_SIZE=10)
+    def test_large_responses_are_not_stored(self):
+        url = reverse(self.endpoint_list)
+        self.client.get(url)
+        self.client.get(url)
+
+        stats = response_cache.stats()
+        self.assertEqual((stats["hits"], stats["oversized"]), (0, 2))
+
+
+class ResponseCacheBackendCheckTests(SimpleTestCase):
+    """
+    Test case for the check of the response cache backend.
+    """
+
+    def test_local_memory_cache_is_reported(self):
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with self.settings(DEBUG=False, CACHES={"default": local, "responses": local}):
+            [warning] = check_response_cache_backend(None)
+        self.assertEqual(warning.id, "transactions.W001")
+
+        with self.settings(DEBUG=False):
+            self.assertEqual(check_response_cache_backend(None), [])
@@ -0,0 +1,146 @@
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from transactions.models import Category, Tag, Transaction, Vendor
+from transactions.response_cache import response_cache
+from transactions.rollups import rebuild_monthly_spend
+from transactions.sync import get_changes
+
+from .factories import (
+    CategoryFactory,
+    CurrencyCodeFactory,
+    TransactionFactory,
+    UserFactory,
+    VendorFactory,
+)
+
+
+class ExplainQueriesCommandTests(TestCase):
+    """
+    Test case for the `explain_queries` management command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        TransactionFactory.create_batch(3, user=cls.user)
+
+    def test_prints_a_plan_per_endpoint_query(self):
+        out = StringIO()
+        call_command("explain_queries", user=self.user.username, stdout=out)
+        output = out.getvalue()
+
+        self.assertIn("transaction-list-create (first page)", output)
+        self.assertIn("transaction-list-create (next page)", output)
+        self.assertIn("transaction-list-create (search)", output)
+        self.assertIn("transaction-changes", output)
+        self.assertIn("transaction-retrieve-update-destroy", output)
+        self.assertIn("Scan", output)
+
+
+class ImportTransactionsCommandTests(TestCase):
+    """
+    Test case for the `import_transactions` management command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.vendor = VendorFactory()
+        cls.category = CategoryFactory()
+        cls.currency_code = CurrencyCodeFactory()
+
+    def write_csv(self, content):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as csv_file:
+            csv_file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_csv(self, content, **options):
+        out = StringIO()
+        call_command(
+            "import_transactions",
+            self.write_csv(content),
+            user=self.user.username,
+            stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def test_import_resolves_and_creates_references(self):
+        content = (
+            "date,amount,item,vendor,branch,category,currency,tags\n"
+            f"2024-01-02,10.50,coffee,{self.vendor.name},downtown,"
+            f"{self.category.name},{self.currency_code.code},food|morning\n"
+            "2024-01-03,99,shoes,New Vendor,,New Category,,food\n"
+        )
+
+        output = self.import_csv(content)
+
+        self.assertIn("Imported 2 transactions", output)
+        self.assertIn("rows/s", output)
+        coffee = Transaction.objects.get(user=self.user, item="coffee")
+        self.assertEqual(coffee.amount, Decimal("10.50"))
+        self.assertEqual(coffee.vendor, self.vendor)
+        self.assertEqual(coffee.branch.name, "downtown")
+        self.assertEqual(coffee.branch.vendor, self.vendor)
+        self.assertEqual(coffee.category, self.category)
+        self.assertEqual(coffee.currency, self.currency_code)
+        self.assertEqual(coffee.created_by, self.user)
+        self.assertEqual(
+            sorted(tag.name for tag in coffee.tags.all()), ["food", "morning"]
+        )
+
+        shoes = Transaction.objects.get(user=self.user, item="shoes")
+        self.assertEqual(shoes.vendor, Vendor.objects.get(name="New Vendor"))
+        self.assertEqual(shoes.category, Category.objects.get(name="New Category"))
+        self.assertEqual(shoes.category.parent.name, "Imported")
+        self.assertIsNone(shoes.currency)
+        self.assertEqual(Tag.objects.filter(name="food").count(), 1)
+
+    def test_import_makes_cached_responses_stale(self):
+        before = response_cache.get_versions(self.user.pk)
+        self.import_csv("date,amount,item\n2024-01-02,1,tea\n")
+        self.assertNotEqual(response_cache.get_versions(self.user.pk), before)
+
+    def test_imported_rows_are_in_the_changes_after_a_watermark(self):
+        watermarks = []
+
+        def rebuild(user):
+            # A client syncs another write while the import runs.
+            written = TransactionFactory(user=self.user)
+            watermarks.append((written.updated_at, written.uuid))
+            return rebuild_monthly_spend(user)
+
+        with mock.patch(
+            "transactions.management.commands.import_transactions"
+            ".rebuild_monthly_spend",
+            side_effect=rebuild,
+        ), self.settings(TRANSACTION_SYNC_LAG=0):
+            self.import_csv("date,amount,item\n2024-01-02,1,tea\n")
+            changes, _ = get_changes(
+                Transaction.objects.filter(user=self.user), watermarks[0], 10
+            )
+
+        self.assertEqual([tr.item for tr in changes], ["tea"])
+
+    def test_tab_delimited_file(self):
+        self.import_csv("date\tamount\titem\n2024-01-02\t1\ttea\n", delimiter="tab")
+        self.assertTrue(Transaction.objects.filter(item="tea").exists())
+
+    def test_invalid_rows_abort_the_import(self):
+        content = "date,amount,item\n2024-01-02,1,tea\nnot a date,1,cake\n"
+        with self.assertRaises(CommandError):
+            self.import_csv(content)
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+    def test_unknown_columns_are_rejected(self):
+        with self.assertRaises(CommandError):
+            self.import_csv("date,amount,item,colour\n")
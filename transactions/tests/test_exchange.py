@@ -0,0 +1,346 @@
+import datetime
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from transactions.exchange import rate_index
+from transactions.models import CurrencyCode, ExchangeRate, Transaction
+
+from .factories import (
+    BranchFactory,
+    CategoryFactory,
+    CurrencyCodeFactory,
+    TransactionFactory,
+    UserFactory,
+)
+
+
+class RateIndexTests(TestCase):
+    """
+    Test case for the in-memory rate index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.eur = CurrencyCodeFactory(code="EUR")
+        cls.usd = CurrencyCodeFactory(code="USD")
+        for day, rate in ((1, "1.10"), (10, "1.20"), (20, "1.30")):
+            ExchangeRate.objects.create(
+                base_currency=cls.eur,
+                quote_currency=cls.usd,
+                date=datetime.date(2024, 3, day),
+                rate=Decimal(rate),
+            )
+
+    def setUp(self):
+        rate_index.invalidate()
+
+    def test_uses_the_rate_in_force_on_the_day(self):
+        cases = [
+            (datetime.date(2024, 3, 1), Decimal("1.10")),
+            (datetime.date(2024, 3, 9), Decimal("1.10")),
+            (datetime.date(2024, 3, 10), Decimal("1.20")),
+            (datetime.date(2024, 4, 1), Decimal("1.30")),
+        ]
+        for date, rate in cases:
+            with self.subTest(date=date):
+                self.assertEqual(
+                    rate_index.get_rate(self.eur.pk, self.usd.pk, date), rate
+                )
+
+    def test_missing_rates(self):
+        self.assertIsNone(
+            rate_index.get_rate(self.eur.pk, self.usd.pk, datetime.date(2024, 2, 1))
+        )
+        self.assertIsNone(
+            rate_index.get_rate(self.usd.pk, self.eur.pk, datetime.date(2024, 3, 5))
+        )
+        self.assertEqual(
+            rate_index.get_rate(self.usd.pk, self.usd.pk, datetime.date(2024, 3, 5)),
+            Decimal(1),
+        )
+
+    def test_loads_once_and_reloads_after_a_rate_change(self):
+        date = datetime.date(2024, 3, 15)
+        rate_index.get_rate(self.eur.pk, self.usd.pk, date)
+        with self.assertNumQueries(0):
+            rate_index.get_rate(self.eur.pk, self.usd.pk, date)
+
+        ExchangeRate.objects.create(
+            base_currency=self.eur, quote_currency=self.usd, date=date, rate="1.25"
+        )
+        self.assertEqual(
+            rate_index.convert("10.00", self.eur.pk, self.usd.pk, date),
+            Decimal("12.50"),
+        )
+
+    def test_reloads_after_a_rate_change_in_another_process(self):
+        date = datetime.date(2024, 3, 15)
+        rate_index.get_rate(self.eur.pk, self.usd.pk, date)
+
+        # Another process loaded rates: only the shared version changes here.
+        ExchangeRate.objects.filter(date=datetime.date(2024, 3, 10)).update(
+            rate=Decimal("1.50")
+        )
+        rate_index.versions.incr(rate_index.version_key)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                rate_index.get_rate(self.eur.pk, self.usd.pk, date), Decimal("1.50")
+            )
+
+
+class BaseAmountTests(APITestCase):
+    """
+    Test case for the amounts stored in the user's base currency and the
+    report converted in the database.
+    """
+
+    endpoint_list_create = "api:transaction-list-create"
+    endpoint_detail = "api:transaction-retrieve-update-destroy"
+    endpoint_report = "api:converted-totals"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.eur = CurrencyCodeFactory(code="EUR")
+        cls.usd = CurrencyCodeFactory(code="USD")
+        cls.gbp = CurrencyCodeFactory(code="GBP")
+        cls.user = UserFactory(base_currency=cls.usd)
+        cls.category = CategoryFactory()
+        cls.branch = BranchFactory()
+        ExchangeRate.objects.create(
+            base_currency=cls.eur,
+            quote_currency=cls.usd,
+            date=datetime.date(2024, 3, 1),
+            rate=Decimal("1.10"),
+        )
+        ExchangeRate.objects.create(
+            base_currency=cls.eur,
+            quote_currency=cls.usd,
+            date=datetime.date(2024, 4, 1),
+            rate=Decimal("1.20"),
+        )
+
+    def setUp(self):
+        super().setUp()
+        rate_index.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get_payload(self, **kwargs):
+        payload = {
+            "user": self.user.username,
+            "date": "2024-03-15",
+            "type": Transaction.EXPENSE,
+            "amount": "10.00",
+            "currency": "EUR",
+            "item": "Coffee",
+            "brand": "Roastery",
+            "vendor": self.branch.vendor.name,
+            "branch": self.branch.name,
+            "category": self.category.name,
+            "tags": [],
+        }
+        payload.update(kwargs)
+        return payload
+
+    def test_create_stores_the_base_amount(self):
+        response = self.client.post(
+            reverse(self.endpoint_list_create), self.get_payload(), format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["base_amount"], "11.00")
+        transaction = Transaction.objects.get(pk=response.data["uuid"])
+        self.assertEqual(transaction.base_amount, Decimal("11.00"))
+
+    def test_update_converts_with_the_new_date(self):
+        response = self.client.post(
+            reverse(self.endpoint_list_create), self.get_payload(), format="json"
+        )
+        url = reverse(self.endpoint_detail, args=[response.data["uuid"]])
+
+        response = self.client.patch(url, {"date": "2024-04-02"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["base_amount"], "12.00")
+
+    def test_base_amount_without_a_rate_is_null(self):
+        response = self.client.post(
+            reverse(self.endpoint_list_create),
+            self.get_payload(currency="GBP"),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data["base_amount"])
+
+    def test_base_amount_is_read_only(self):
+        response = self.client.post(
+            reverse(self.endpoint_list_create),
+            self.get_payload(currency="USD", base_amount="99.00"),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["base_amount"], "10.00")
+
+    def test_changing_the_base_currency_converts_the_stored_amounts(self):
+        response = self.client.post(
+            reverse(self.endpoint_list_create),
+            self.get_payload(currency="USD"),
+            format="json",
+        )
+        transaction = Transaction.objects.get(pk=response.data["uuid"])
+        self.assertEqual(transaction.base_amount, Decimal("10.00"))
+
+        self.user.base_currency = self.eur
+        self.user.save()
+
+        updated_at = transaction.updated_at
+        transaction.refresh_from_db()
+        self.assertIsNone(transaction.base_amount)
+        self.assertGreater(transaction.updated_at, updated_at)
+
+    def test_converted_totals_use_the_rate_of_each_day(self):
+        for date, amount, currency in (
+            (datetime.date(2024, 3, 5), "10.00", self.eur),
+            (datetime.date(2024, 3, 20), "5.00", self.usd),
+            (datetime.date(2024, 4, 5), "10.00", self.eur),
+            (datetime.date(2024, 4, 6), "7.00", self.gbp),
+        ):
+            TransactionFactory(
+                user=self.user,
+                date=date,
+                amount=Decimal(amount),
+                currency=currency,
+                type=Transaction.EXPENSE,
+            )
+
+        response = self.client.get(reverse(self.endpoint_report))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["currency"], "USD")
+        self.assertEqual(
+            [dict(row) for row in response.data["results"]],
+            [
+                {
+                    "month": "2024-03-01",
+                    "type": Transaction.EXPENSE,
+                    "total": "16.00",
+                    "count": 2,
+                    "unconverted": 0,
+                },
+                {
+                    "month": "2024-04-01",
+                    "type": Transaction.EXPENSE,
+                    "total": "12.00",
+                    "count": 2,
+                    "unconverted": 1,
+                },
+            ],
+        )
+
+    def test_converted_totals_need_a_base_currency(self):
+        user = UserFactory()
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get(reverse(self.endpoint_report))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LoadExchangeRatesCommandTests(TestCase):
+    """
+    Test case for the `load_exchange_rates` management command.
+    """
+
+    def setUp(self):
+        rate_index.invalidate()
+
+    def write_csv(self, content):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w", encoding="utf-8") as csv_file:
+            csv_file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_loads_rates_and_converts_missing_amounts(self):
+        eur = CurrencyCodeFactory(code="EUR")
+        usd = CurrencyCodeFactory(code="USD")
+        user = UserFactory(base_currency=usd)
+        transaction = TransactionFactory(
+            user=user,
+            date=datetime.date(2024, 3, 5),
+            amount=Decimal("10.00"),
+            currency=eur,
+        )
+        ExchangeRate.objects.create(
+            base_currency=eur,
+            quote_currency=usd,
+            date=datetime.date(2024, 3, 1),
+            rate=Decimal("2"),
+        )
+        path = self.write_csv(
+            "date,base,quote,rate\n"
+            "2024-03-01,eur,usd,1.5\n"
+            "2024-03-01,JPY,USD,0.0067\n"
+        )
+
+        out = StringIO()
+        call_command("load_exchange_rates", path, stdout=out)
+
+        self.assertIn("Loaded 2 exchange rates, converted 1", out.getvalue())
+        self.assertEqual(ExchangeRate.objects.count(), 2)
+        self.assertTrue(CurrencyCode.objects.filter(code="JPY").exists())
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.base_amount, Decimal("15.00"))
+
+    def test_corrected_rates_convert_again(self):
+        eur = CurrencyCodeFactory(code="EUR")
+        usd = CurrencyCodeFactory(code="USD")
+        user = UserFactory(base_currency=usd)
+        ExchangeRate.objects.create(
+            base_currency=eur,
+            quote_currency=usd,
+            date=datetime.date(2024, 3, 1),
+            rate=Decimal("2"),
+        )
+        before, after = (
+            TransactionFactory(
+                user=user,
+                date=date,
+                amount=Decimal("10"),
+                currency=eur,
+                base_amount=Decimal("20.00"),
+            )
+            for date in (datetime.date(2024, 3, 5), datetime.date(2024, 3, 20))
+        )
+        path = self.write_csv("date,base,quote,rate\n2024-03-10,EUR,USD,1.5\n")
+
+        out = StringIO()
+        call_command("load_exchange_rates", path, stdout=out)
+
+        self.assertIn("converted 1 transactions", out.getvalue())
+        updated_at = before.updated_at
+        before.refresh_from_db()
+        self.assertEqual(before.base_amount, Decimal("20.00"))
+        self.assertEqual(before.updated_at, updated_at)
+        updated_at = after.updated_at
+        after.refresh_from_db()
+        self.assertEqual(after.base_amount, Decimal("15.00"))
+        self.assertGreater(after.updated_at, updated_at)
+
+    def test_rejects_invalid_rows(self):
+        path = self.write_csv("date,base,quote,rate\n2024-03-01,EUR,USD,abc\n")
+
+        with self.assertRaisesMessage(CommandError, "line 2"):
+            call_command("load_exchange_rates", path, stdout=StringIO())
+        self.assertFalse(ExchangeRate.objects.exists())
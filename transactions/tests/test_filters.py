@@ -0,0 +1,344 @@
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+
+from transactions.filters import filter_transactions
+from transactions.models import Branch, Category, Tag, Transaction, Vendor
+from transactions.pagination import TransactionCursorPagination
+from transactions.serializers import TransactionListFilterSerializer
+from transactions.views import TransactionListCreateView
+
+from .factories import (
+    BranchFactory,
+    CategoryFactory,
+    CurrencyCodeFactory,
+    ParentCategoryFactory,
+    TagFactory,
+    TransactionFactory,
+    UserFactory,
+    VendorFactory,
+)
+
+
+class TransactionFilterTests(APITestCase):
+    """
+    Test case for the filters and ordering of the transaction listing.
+    """
+
+    endpoint_list = "api:transaction-list-create"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.usd = CurrencyCodeFactory(code="USD")
+        cls.eur = CurrencyCodeFactory(code="EUR")
+        cls.food = ParentCategoryFactory(name="Food")
+        cls.groceries = CategoryFactory(name="Groceries", parent=cls.food)
+        cls.restaurants = CategoryFactory(name="Restaurants", parent=cls.food)
+        cls.rent = CategoryFactory(name="Rent")
+        cls.market = VendorFactory(name="Market")
+        cls.downtown = BranchFactory(name="Downtown", vendor=cls.market)
+        cls.weekly = TagFactory(name="weekly")
+        cls.shared = TagFactory(name="shared")
+
+        cls.market_run = cls.create_transaction(
+            date="2024-03-01",
+            amount=Decimal("40.00"),
+            category=cls.groceries,
+            vendor=cls.market,
+            branch=cls.downtown,
+            tags=[cls.weekly, cls.shared],
+        )
+        cls.dinner = cls.create_transaction(
+            date="2024-03-15",
+            amount=Decimal("60.00"),
+            category=cls.restaurants,
+            currency=cls.eur,
+            tags=[cls.shared],
+        )
+        cls.rent_payment = cls.create_transaction(
+            date="2024-04-01",
+            amount=Decimal("900.00"),
+            category=cls.rent,
+            tags=[],
+        )
+        cls.salary = cls.create_transaction(
+            date="2024-04-05",
+            amount=Decimal("3000.00"),
+            type=Transaction.INCOME,
+            category=cls.rent,
+            tags=[cls.weekly],
+        )
+        cls.deleted = cls.create_transaction(
+            date="2024-04-10", amount=Decimal("5.00"), category=cls.rent, tags=[]
+        )
+        cls.deleted.soft_delete()
+        TransactionFactory(currency=cls.usd, category=cls.groceries)
+
+    @classmethod
+    def create_transaction(cls, **kwargs):
+        values = {
+            "user": cls.user,
+            "type": Transaction.EXPENSE,
+            "currency": cls.usd,
+        }
+        values.update(kwargs)
+        return TransactionFactory(**values)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get_uuids(self, **params):
+        response = self.client.get(reverse(self.endpoint_list), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["uuid"] for row in response.data["results"]]
+
+    def assert_filter(self, params, expected):
+        self.assertEqual(
+            sorted(self.get_uuids(**params)),
+            sorted(str(tr.uuid) for tr in expected),
+        )
+
+    def test_filters(self):
+        cases = [
+            ({"date_from": "2024-04-01"}, [self.rent_payment, self.salary]),
+            (
+                {"date_from": "2024-03-10", "date_to": "2024-04-01"},
+                [self.dinner, self.rent_payment],
+            ),
+            ({"type": Transaction.INCOME}, [self.salary]),
+            ({"category": "Groceries"}, [self.market_run]),
+            ({"parent_category": "Food"}, [self.market_run, self.dinner]),
+            ({"vendor": "Market"}, [self.market_run]),
+            ({"branch": "Downtown"}, [self.market_run]),
+            ({"currency": "eur"}, [self.dinner]),
+            (
+                {"amount_min": "50", "amount_max": "900"},
+                [self.dinner, self.rent_payment],
+            ),
+            ({"is_deleted": "true"}, [self.deleted]),
+            (
+                {"is_deleted": "false", "category": "Rent"},
+                [self.rent_payment, self.salary],
+            ),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assert_filter(params, expected)
+
+    def test_currency_is_matched_exactly(self):
+        serializer = TransactionListFilterSerializer(data={"currency": "eur"})
+        serializer.is_valid(raise_exception=True)
+        queryset = filter_transactions(
+            Transaction.objects.all(), serializer.validated_data
+        )
+
+        self.assertIn('."code" = EUR', str(queryset.query))
+        self.assertNotIn("UPPER", str(queryset.query))
+
+    def test_tag_filters(self):
+        self.assert_filter(
+            {"tag": ["weekly", "shared"]},
+            [self.market_run, self.dinner, self.salary],
+        )
+        self.assert_filter(
+            {"tag": ["weekly", "shared"], "tag_match": "all"}, [self.market_run]
+        )
+
+    def test_ordering(self):
+        live = [self.market_run, self.dinner, self.rent_payment, self.salary]
+        by_amount = [str(tr.uuid) for tr in sorted(live, key=lambda tr: tr.amount)]
+
+        self.assertEqual(
+            self.get_uuids(ordering="amount", is_deleted="false"), by_amount
+        )
+        self.assertEqual(
+            self.get_uuids(ordering="-amount", is_deleted="false"),
+            by_amount[::-1],
+        )
+
+    def test_ordering_pages_with_its_own_cursor(self):
+        url = reverse(self.endpoint_list) + "?ordering=-amount&page_size=2"
+        uuids = []
+        while url:
+            response = self.client.get(url)
+            uuids.extend(row["uuid"] for row in response.data["results"])
+            url = response.data["next"]
+
+        amounts = dict(
+            Transaction.objects.filter(user=self.user).values_list("uuid", "amount")
+        )
+        self.assertEqual(len(uuids), 4)
+        self.assertEqual(
+            [amounts[uuid] for uuid in map(type(self.salary.uuid), uuids)],
+            sorted(amounts.values(), reverse=True),
+        )
+
+        # A cursor of one ordering isn't valid for another.
+        cursor = response.request["QUERY_STRING"]
+        response = self.client.get(
+            reverse(self.endpoint_list) + "?" + cursor.replace("-amount", "-date")
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_filters(self):
+        cases = [
+            {"type": "Gift"},
+            {"ordering": "item"},
+            {"amount_min": "10", "amount_max": "5"},
+            {"is_deleted": "maybe"},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                response = self.client.get(reverse(self.endpoint_list), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionFilterPlanTests(TestCase):
+    """
+    Test case for the query plans of the listing filters.
+
+    On a seeded history of many users, every filter and ordering must be
+    served by an index instead of a sequential scan of the transactions.
+    """
+
+    num_users = 500
+    num_transactions = 50000
+
+    # Listing parameters whose plans are checked
+    cases = [
+        {},
+        {"date_from": "2022-01-01", "date_to": "2022-03-31"},
+        {"type": Transaction.INCOME},
+        {"category": "Category 3"},
+        {"parent_category": "Parent 1"},
+        {"vendor": "Vendor 5"},
+        {"branch": "Branch 5"},
+        {"currency": "EUR"},
+        {"tag": ["Tag 1", "Tag 2"]},
+        {"tag": ["Tag 1", "Tag 2"], "tag_match": "all"},
+        {"amount_min": "10", "amount_max": "12"},
+        {"is_deleted": "true"},
+        {"is_deleted": "false"},
+        {"ordering": "amount"},
+        {"ordering": "-created_at"},
+        {"ordering": "updated_at"},
+        {"category": "Category 3", "date_from": "2022-01-01", "ordering": "-amount"},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        users = get_user_model().objects.bulk_create(
+            [
+                get_user_model()(username=f"seed_{index}")
+                for index in range(cls.num_users)
+            ]
+        )
+        cls.user = users[0]
+        currencies = [CurrencyCodeFactory(code=code) for code in ("USD", "EUR", "GBP")]
+        parents = [ParentCategoryFactory(name=f"Parent {index}") for index in range(5)]
+        categories = Category.objects.bulk_create(
+            [
+                Category(name=f"Category {index}", parent=parents[index % 5])
+                for index in range(23)
+            ]
+        )
+        vendors = Vendor.objects.bulk_create(
+            [Vendor(name=f"Vendor {index}") for index in range(29)]
+        )
+        branches = Branch.objects.bulk_create(
+            [
+                Branch(name=f"Branch {index}", vendor=vendor)
+                for index, vendor in enumerate(vendors)
+            ]
+        )
+        tags = Tag.objects.bulk_create(
+            [Tag(name=f"Tag {index}") for index in range(31)]
+        )
+
+        def ids(rows):
+            return [str(row.pk) for row in rows]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO transactions_transaction (
+                    uuid, created_at, updated_at, is_deleted, user_id, date,
+                    amount, type, currency_id, item, quantity, brand, vendor_id,
+                    branch_id, category_id, payment_method, comment
+                )
+                SELECT
+                    gen_random_uuid(),
+                    now() - i * interval '1 minute',
+                    now() - i * interval '1 second',
+                    i %% 50 = 0,
+                    (%(users)s::uuid[])[1 + i %% %(num_users)s],
+                    date '2020-01-01' + i %% 1500,
+                    (i %% 10000) / 100.0 + 1,
+                    CASE WHEN i %% 5 = 0 THEN 'Income' ELSE 'Expense' END,
+                    (%(currencies)s::uuid[])[1 + i %% 3],
+                    'item ' || i,
+                    1,
+                    '',
+                    (%(vendors)s::uuid[])[1 + i %% 29],
+                    (%(branches)s::uuid[])[1 + i %% 29],
+                    (%(categories)s::uuid[])[1 + i %% 23],
+                    '',
+                    ''
+                FROM generate_series(1, %(num_transactions)s) AS s(i)
+                """,
+                {
+                    "users": ids(users),
+                    "num_users": cls.num_users,
+                    "currencies": ids(currencies),
+                    "vendors": ids(vendors),
+                    "branches": ids(branches),
+                    "categories": ids(categories),
+                    "num_transactions": cls.num_transactions,
+                },
+            )
+            cursor.execute(
+                """
+                INSERT INTO transactions_transactiontag (
+                    uuid, created_at, updated_at, is_deleted, transaction_id, tag_id
+                )
+                SELECT
+                    gen_random_uuid(), now(), now(), false, t.uuid,
+                    (%(tags)s::uuid[])[1 + abs(hashtext(t.uuid::text)) %% 31]
+                FROM transactions_transaction t
+                """,
+                {"tags": ids(tags)},
+            )
+            # Autovacuum would keep the statistics of a real database current.
+            cursor.execute("ANALYZE")
+
+    def get_page_queryset(self, params):
+        """
+        Return the queryset of the first listing page for `params`, as the
+        view and the paginator build it.
+        """
+        request = Request(APIRequestFactory().get("/", params))
+        request.user = self.user
+        view = TransactionListCreateView(request=request, kwargs={}, format_kwarg=None)
+        paginator = TransactionCursorPagination()
+        field, descending = paginator.get_ordering(view)
+        prefix = "-" if descending else ""
+        return view.get_queryset().order_by(f"{prefix}{field}", f"{prefix}uuid")[
+            : paginator.page_size + 1
+        ]
+
+    def test_filters_avoid_sequential_scans(self):
+        seq_scan = re.compile(r"Seq Scan on transactions_transaction(tag)?\b")
+        for params in self.cases:
+            with self.subTest(params=params):
+                plan = self.get_page_queryset(params).explain()
+                self.assertIsNone(seq_scan.search(plan), plan)
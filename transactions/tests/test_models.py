@@ -0,0 +1,98 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from transactions.models import Category, CurrencyCode, Tag, Transaction
+from transactions.serializers import get_or_create_tags, set_transaction_tags
+
+from .factories import (
+    CategoryFactory,
+    CurrencyCodeFactory,
+    TagFactory,
+    TransactionFactory,
+    UserFactory,
+)
+
+
+class SoftDeleteManagerTests(TestCase):
+    """
+    Test case for the live row manager and the bulk soft delete of the base
+    model.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.currency_code = CurrencyCodeFactory()
+        cls.transactions = TransactionFactory.create_batch(
+            3, user=cls.user, currency=cls.currency_code, tags=[]
+        )
+        cls.transactions[0].soft_delete()
+
+    def test_default_manager_excludes_deleted_rows(self):
+        live = {tr.pk for tr in self.transactions[1:]}
+        self.assertEqual(set(Transaction.objects.values_list("pk", flat=True)), live)
+        self.assertEqual(Transaction.all_objects.count(), 3)
+
+    def test_unique_validation_sees_deleted_rows(self):
+        self.currency_code.soft_delete()
+        category = CategoryFactory()
+        category.soft_delete()
+
+        for instance in (
+            CurrencyCode(code=self.currency_code.code),
+            Category(parent=category.parent, name=category.name),
+        ):
+            with self.assertRaises(ValidationError):
+                instance.full_clean()
+        self.assertEqual(CurrencyCode._default_manager.count(), 1)
+
+    def test_soft_delete_only_writes_its_fields(self):
+        tr = self.transactions[1]
+        Transaction.all_objects.filter(pk=tr.pk).update(comment="Changed")
+
+        tr.soft_delete(deleted_by=self.user)
+
+        stored = Transaction.all_objects.get(pk=tr.pk)
+        self.assertTrue(stored.is_deleted)
+        self.assertEqual(stored.updated_by, self.user)
+        self.assertEqual(stored.comment, "Changed")
+
+    def test_bulk_soft_delete_is_one_update(self):
+        before = Transaction.all_objects.get(pk=self.transactions[1].pk)
+
+        with self.assertNumQueries(1):
+            deleted = Transaction.all_objects.filter(user=self.user).soft_delete(
+                deleted_by=self.user
+            )
+
+        self.assertEqual(deleted, 2)
+        self.assertFalse(Transaction.objects.exists())
+        after = Transaction.all_objects.get(pk=before.pk)
+        self.assertIsNotNone(after.deleted_at)
+        self.assertEqual(after.updated_by, self.user)
+        self.assertGreater(after.updated_at, before.updated_at)
+
+    def test_bulk_undelete(self):
+        deleted_at = Transaction.all_objects.get(pk=self.transactions[0].pk).deleted_at
+        self.assertIsNotNone(deleted_at)
+
+        with self.assertNumQueries(1):
+            restored = Transaction.all_objects.all().undelete(undeleted_by=self.user)
+
+        self.assertEqual(restored, 1)
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertIsNone(
+            Transaction.objects.get(pk=self.transactions[0].pk).deleted_at
+        )
+
+    def test_reusing_a_deleted_tag_restores_it(self):
+        tag = TagFactory(name="holiday")
+        tag.soft_delete()
+
+        tr = self.transactions[1]
+        tags = get_or_create_tags(["holiday"])
+        set_transaction_tags(tr, tags)
+
+        self.assertEqual(tags["holiday"].pk, tag.pk)
+        self.assertTrue(Tag.objects.filter(pk=tag.pk).exists())
+        self.assertEqual(list(tr.tags.all()), [tag])
@@ -0,0 +1,242 @@
+import datetime
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from jobs.models import Job
+from jobs.queue import claim_job, run_job
+from transactions.models import ReceiptBlob, ReceiptUpload, Transaction
+from transactions.receipts import append_chunk, get_blob_name, get_part_path
+
+from .factories import CurrencyCodeFactory, TransactionFactory, UserFactory
+
+
+class ReceiptUploadTests(APITestCase):
+    """
+    Test case for the chunked receipt uploads, their content addressed
+    storage and the thumbnail worker.
+    """
+
+    endpoint_create = "api:receipt-upload-create"
+    endpoint_detail = "api:receipt-upload-detail"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.transaction = TransactionFactory(
+            user=cls.user, currency=CurrencyCodeFactory()
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def start(self, content, **kwargs):
+        data = {
+            "filename": "receipt.pdf",
+            "content_type": "application/pdf",
+            "size": len(content),
+        }
+        data.update(kwargs)
+        response = self.client.post(reverse(self.endpoint_create), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["uuid"]
+
+    def send(self, upload, content, first, last):
+        # The last chunk stores the file once the request commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(
+                reverse(self.endpoint_detail, kwargs={"pk": upload}),
+                content[first : last + 1],
+                content_type="application/octet-stream",
+                headers={"content-range": f"bytes {first}-{last}/{len(content)}"},
+            )
+
+    def upload(self, content, chunk_size=4, **kwargs):
+        upload = self.start(content, **kwargs)
+        for first in range(0, len(content), chunk_size):
+            last = min(first + chunk_size, len(content)) - 1
+            response = self.send(upload, content, first, last)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_chunked_upload_is_stored_by_content_hash(self):
+        content = b"%PDF-1.4 receipt of a groceries run"
+        upload = self.start(content, transaction=str(self.transaction.pk))
+
+        response = self.send(upload, content, 0, 9)
+        self.assertEqual(response.data["received"], 10)
+        self.assertIsNone(response.data["receipt"])
+
+        # A chunk that doesn't resume at the received offset is refused.
+        response = self.send(upload, content, 20, 29)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data, {"received": 10})
+
+        response = self.send(upload, content, 10, len(content) - 1)
+        self.assertEqual(response.data["received"], len(content))
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        blob = ReceiptBlob.objects.get()
+        self.assertEqual(blob.sha256, sha256)
+        self.assertEqual(blob.file.name, f"receipts/{sha256[:2]}/{sha256}.pdf")
+        with blob.file.open("rb") as file:
+            self.assertEqual(file.read(), content)
+        self.assertFalse(os.path.exists(get_part_path(ReceiptUpload.objects.get())))
+
+        tr = Transaction.objects.get(pk=self.transaction.pk)
+        self.assertEqual(tr.receipt_blob, blob)
+        self.assertEqual(tr.receipt.name, blob.file.name)
+        self.assertEqual(tr.updated_by, self.user)
+
+    def test_duplicates_share_one_blob(self):
+        content = b"same receipt bytes"
+        first = self.upload(content)
+        second = self.upload(content, chunk_size=100, filename="copy.PDF")
+
+        self.assertEqual(first["receipt"], second["receipt"])
+        self.assertEqual(ReceiptBlob.objects.count(), 1)
+        # Only the first upload queues the thumbnail.
+        self.assertEqual(Job.objects.filter(name="process_receipt").count(), 1)
+        stored = [
+            name
+            for _, _, names in os.walk(self.media_root)
+            for name in names
+            if name.startswith(hashlib.sha256(content).hexdigest())
+        ]
+        self.assertEqual(len(stored), 1)
+
+    def test_rolled_back_upload_keeps_its_part_file(self):
+        content = b"%PDF-1.4 rolled back receipt"
+        upload = ReceiptUpload.objects.get(pk=self.start(content))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    append_chunk(upload.pk, io.BytesIO(content), 0, len(content))
+                    raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(ReceiptBlob.objects.exists())
+        name = get_blob_name(hashlib.sha256(content).hexdigest(), upload.filename)
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(os.path.exists(get_part_path(upload)))
+
+        response = self.send(str(upload.pk), content, 0, len(content) - 1)
+        self.assertEqual(response.data["received"], len(content))
+        self.assertTrue(default_storage.exists(name))
+
+    def test_expired_uploads_are_deleted_with_their_part_files(self):
+        content = b"%PDF-1.4 abandoned receipt"
+        expired, fresh = self.start(content), self.start(content)
+        for upload in (expired, fresh):
+            self.send(upload, content, 0, 9)
+        completed = self.upload(b"%PDF-1.4 completed receipt")["uuid"]
+        paths = {
+            str(upload.pk): get_part_path(upload)
+            for upload in ReceiptUpload.objects.all()
+        }
+        self.assertTrue(os.path.exists(paths[expired]))
+        ReceiptUpload.objects.filter(pk__in=[expired, completed]).update(
+            updated_at=timezone.now() - datetime.timedelta(days=2)
+        )
+
+        with self.settings(RECEIPT_UPLOAD_EXPIRY=24 * 60 * 60):
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command("clean_receipt_uploads", stdout=StringIO())
+
+        self.assertEqual(
+            {str(pk) for pk in ReceiptUpload.objects.values_list("pk", flat=True)},
+            {fresh, completed},
+        )
+        self.assertFalse(os.path.exists(paths[expired]))
+        self.assertTrue(os.path.exists(paths[fresh]))
+
+        # A chunk of the expired upload finds it gone.
+        response = self.send(expired, content, 10, len(content) - 1)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_requests(self):
+        content = b"0123456789"
+        upload = self.start(content)
+        url = reverse(self.endpoint_detail, kwargs={"pk": upload})
+
+        for headers in (
+            {},
+            {"content-range": "bytes 0-4/20"},
+            {"content-range": "bytes 5-4/10"},
+            {"content-range": "bytes 0-9/10"},
+        ):
+            with self.subTest(headers=headers):
+                response = self.client.put(
+                    url,
+                    content[:5],
+                    content_type="application/octet-stream",
+                    headers=headers,
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for size in (0, 10**12):
+            response = self.client.post(
+                reverse(self.endpoint_create),
+                {"filename": "big.pdf", "size": size},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = TransactionFactory(currency=self.transaction.currency)
+        response = self.client.post(
+            reverse(self.endpoint_create),
+            {"filename": "a.pdf", "size": 1, "transaction": str(other.pk)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=UserFactory())
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_worker_skips_documents(self):
+        self.upload(b"%PDF-1.4 not an image")
+
+        run_job(claim_job("test-worker"))
+
+        blob = ReceiptBlob.objects.get()
+        self.assertEqual(blob.thumbnail_status, ReceiptBlob.THUMBNAIL_SKIPPED)
+        self.assertFalse(blob.thumbnail)
+
+    def test_worker_generates_thumbnails(self):
+        output = io.BytesIO()
+        Image.new("RGB", (1200, 600), "white").save(output, format="PNG")
+        data = self.upload(
+            output.getvalue(),
+            chunk_size=1024,
+            filename="receipt.png",
+            content_type="image/png",
+        )
+        self.assertEqual(data["thumbnail_status"], ReceiptBlob.THUMBNAIL_PENDING)
+
+        call_command("process_receipts", stdout=StringIO())
+
+        blob = ReceiptBlob.objects.get()
+        self.assertEqual(blob.thumbnail_status, ReceiptBlob.THUMBNAIL_DONE)
+        with blob.thumbnail.open("rb") as file:
+            self.assertEqual(Image.open(file).size, (256, 128))
@@ -0,0 +1,270 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from transactions.bulk import (
+    soft_delete_transactions,
+    undelete_transactions,
+    update_transactions,
+)
+from transactions.models import MonthlySpend, Transaction
+
+from .factories import (
+    CategoryFactory,
+    CurrencyCodeFactory,
+    TransactionFactory,
+    UserFactory,
+)
+
+
+class MonthlySpendTests(APITestCase):
+    """
+    Test case for the incremental maintenance of the monthly spend rollup
+    and the report served from it.
+    """
+
+    endpoint_report = "api:monthly-spend"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.category = CategoryFactory()
+        cls.other_category = CategoryFactory(parent=cls.category.parent)
+        cls.currency_code = CurrencyCodeFactory()
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_transaction(self, **kwargs):
+        values = {
+            "user": self.user,
+            "date": datetime.date(2024, 3, 10),
+            "amount": Decimal("10.00"),
+            "type": Transaction.EXPENSE,
+            "category": self.category,
+            "currency": self.currency_code,
+        }
+        values.update(kwargs)
+        return TransactionFactory(**values)
+
+    def get_rollup(self):
+        return {
+            (row.month, row.category_id, row.type): (row.total, row.count)
+            for row in MonthlySpend.objects.filter(user=self.user, count__gt=0)
+        }
+
+    def assert_matches_rebuild(self):
+        rollup = self.get_rollup()
+        call_command(
+            "rebuild_monthly_spend", user=[self.user.username], stdout=StringIO()
+        )
+        self.assertEqual(rollup, self.get_rollup())
+
+    def test_create_update_and_delete(self):
+        march = datetime.date(2024, 3, 1)
+        tr = self.create_transaction()
+        self.create_transaction(amount=Decimal("5.50"))
+        self.assertEqual(
+            self.get_rollup(),
+            {(march, self.category.pk, "Expense"): (Decimal("15.50"), 2)},
+        )
+
+        tr.category = self.other_category
+        tr.date = datetime.date(2024, 4, 2)
+        tr.save()
+        self.assertEqual(
+            self.get_rollup(),
+            {
+                (march, self.category.pk, "Expense"): (Decimal("5.50"), 1),
+                (datetime.date(2024, 4, 1), self.other_category.pk, "Expense"): (
+                    Decimal("10.00"),
+                    1,
+                ),
+            },
+        )
+        self.assert_matches_rebuild()
+
+        tr.delete()
+        self.assertEqual(
+            self.get_rollup(),
+            {(march, self.category.pk, "Expense"): (Decimal("5.50"), 1)},
+        )
+        self.assert_matches_rebuild()
+
+    def test_soft_delete_and_undelete(self):
+        tr = self.create_transaction()
+
+        tr.soft_delete(deleted_by=self.user)
+        self.assertEqual(self.get_rollup(), {})
+
+        tr.undelete(undeleted_by=self.user)
+        self.assertEqual(
+            self.get_rollup(),
+            {
+                (datetime.date(2024, 3, 1), self.category.pk, "Expense"): (
+                    Decimal("10.00"),
+                    1,
+                )
+            },
+        )
+
+    def test_bulk_soft_delete_and_undelete(self):
+        kept = self.create_transaction()
+        removed = [
+            self.create_transaction(amount=Decimal("1.00")),
+            self.create_transaction(category=self.other_category),
+        ]
+        queryset = Transaction.all_objects.filter(pk__in=[tr.pk for tr in removed])
+
+        self.assertEqual(soft_delete_transactions(queryset), 2)
+        self.assertEqual(
+            self.get_rollup(),
+            {
+                (datetime.date(2024, 3, 1), self.category.pk, "Expense"): (
+                    kept.amount,
+                    1,
+                )
+            },
+        )
+        self.assert_matches_rebuild()
+
+        # Already deleted rows aren't removed twice.
+        self.assertEqual(soft_delete_transactions(queryset), 0)
+        self.assert_matches_rebuild()
+
+        self.assertEqual(undelete_transactions(queryset), 2)
+        self.assertEqual(undelete_transactions(queryset), 0)
+        self.assert_matches_rebuild()
+
+    def test_bulk_update(self):
+        moved = [
+            self.create_transaction(),
+            self.create_transaction(date=datetime.date(2024, 4, 2)),
+        ]
+        kept = self.create_transaction(amount=Decimal("3.00"))
+        deleted = self.create_transaction(amount=Decimal("7.00"))
+        deleted.soft_delete()
+        queryset = Transaction.all_objects.filter(
+            pk__in=[tr.pk for tr in [*moved, deleted]]
+        )
+
+        self.assertEqual(
+            update_transactions(queryset, {"category": self.other_category}), 3
+        )
+        self.assertEqual(
+            self.get_rollup(),
+            {
+                (datetime.date(2024, 3, 1), self.category.pk, "Expense"): (
+                    kept.amount,
+                    1,
+                ),
+                (datetime.date(2024, 3, 1), self.other_category.pk, "Expense"): (
+                    Decimal("10.00"),
+                    1,
+                ),
+                (datetime.date(2024, 4, 1), self.other_category.pk, "Expense"): (
+                    Decimal("10.00"),
+                    1,
+                ),
+            },
+        )
+        self.assert_matches_rebuild()
+
+        update_transactions(queryset, {"type": Transaction.INCOME, "category": None})
+        update_transactions(queryset, {"currency": CurrencyCodeFactory()})
+        self.assert_matches_rebuild()
+
+    def test_deleting_a_category_merges_its_rows(self):
+        march = datetime.date(2024, 3, 1)
+        self.create_transaction(category=None, amount=Decimal("1.00"))
+        self.create_transaction(amount=Decimal("2.00"))
+        self.create_transaction(category=self.other_category)
+
+        self.other_category.delete()
+
+        self.assertEqual(
+            self.get_rollup(),
+            {
+                (march, None, "Expense"): (Decimal("11.00"), 2),
+                (march, self.category.pk, "Expense"): (Decimal("2.00"), 1),
+            },
+        )
+        self.assert_matches_rebuild()
+
+    def test_deleting_a_currency_merges_its_rows(self):
+        self.create_transaction(currency=None)
+        self.create_transaction()
+
+        self.currency_code.delete()
+
+        rows = MonthlySpend.objects.filter(user=self.user)
+        self.assertEqual(
+            list(rows.values_list("currency_id", "total", "count")),
+            [(None, Decimal("20.00"), 2)],
+        )
+
+    def test_report_groups_by_parent_category(self):
+        self.create_transaction()
+        self.create_transaction(category=self.other_category, amount=Decimal("2.00"))
+        self.create_transaction(date=datetime.date(2023, 1, 5))
+
+        url = reverse(self.endpoint_report)
+        response = self.client.get(
+            url, {"group_by": "parent_category", "date_from": "2024-01-01"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "month": "2024-03-01",
+                    "parent_category": self.category.parent.name,
+                    "type": "Expense",
+                    "currency": self.currency_code.code,
+                    "total": "12.00",
+                    "count": 2,
+                }
+            ],
+        )
+
+    def test_report_query_count_is_fixed(self):
+        for month in range(1, 7):
+            self.create_transaction(date=datetime.date(2024, month, 1))
+        # The throttle counter and the report.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse(self.endpoint_report))
+        self.assertEqual(len(response.data), 6)
+
+
+class MonthlySpendUserDeleteTests(TransactionTestCase):
+    """
+    Test case for deleting a user along with their transactions and rollup,
+    with the foreign keys checked at commit.
+    """
+
+    def test_deleting_a_user_deletes_their_rollup(self):
+        user = UserFactory()
+        other = UserFactory()
+        for owner in (user, user, other):
+            TransactionFactory(
+                user=owner, date=datetime.date(2024, 3, 10), amount=Decimal("5.00")
+            )
+        self.assertTrue(MonthlySpend.objects.filter(user=user).exists())
+
+        user.delete()
+
+        self.assertFalse(Transaction.all_objects.filter(user_id=user.pk).exists())
+        self.assertFalse(MonthlySpend.objects.filter(user_id=user.pk).exists())
+        self.assertEqual(
+            list(MonthlySpend.objects.values_list("user_id", "total", "count")),
+            [(other.pk, Decimal("5.00"), 1)],
+        )
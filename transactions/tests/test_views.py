@@ -1,20 +1,30 @@
+import csv
+import io
+import json
 import logging
 import uuid
 from typing import Any, Dict, List, Optional, Set
 
-from django.db import models
+from django.db import connection, models
 from django.db.models import Manager, QuerySet
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
-from transactions.models import Transaction
+from transactions.cache import reference_cache
+from transactions.models import Tag, Transaction, TransactionTag
+from transactions.response_cache import response_cache
+from transactions.search import has_trigram_extension
 
 from .factories import (
     BranchFactory,
     CategoryFactory,
     CurrencyCodeFactory,
     ParentCategoryFactory,
+    TagFactory,
     TransactionFactory,
     UserFactory,
     VendorFactory,
@@ -75,6 +85,8 @@ class TransactionBaseTestCase(APITestCase):
 
     def setUp(self):
         super().setUp()
+        # The cache outlives the rolled back rows of each test.
+        response_cache.cache.clear()
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
@@ -221,7 +233,7 @@ class TransactionCRUDTests(TransactionBaseTestCase):
         url = reverse(self.endpoint_list)
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(response.data["results"]), 5)
 
     def test_retrieve_transaction(self):
         tr = Transaction.objects.get(uuid=self.transactions[0].uuid)
@@ -247,6 +259,21 @@ class TransactionCRUDTests(TransactionBaseTestCase):
         self.assertGreaterEqual(created_tr.tags.count(), 1)
         self.assertLessEqual(created_tr.tags.count(), 3)
 
+    def test_second_write_uses_cached_user(self):
+        # The second write resolves the `user` slug from the reference cache.
+        reference_cache.clear()
+        url = reverse(self.endpoint_create)
+        for _ in range(2):
+            response = self.client.post(
+                url, self.create_transaction_data(), format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            created_tr = Transaction.objects.get(uuid=response.data["uuid"])
+            self.assertEqual(created_tr.user_id, self.user.pk)
+
+        self.assertGreater(reference_cache.stats()["hits"], 0)
+        self.assertEqual(response.data["user"], self.user.username)
+
     def test_update_transaction(self):
         tr = Transaction.objects.get(uuid=self.transactions[0].uuid)
         new_data = Transaction.objects.get(uuid=self.transactions[2].uuid)
@@ -280,7 +307,7 @@ class TransactionCRUDTests(TransactionBaseTestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
-        new_tr = Transaction.objects.get(uuid=tr.uuid)
+        new_tr = Transaction.all_objects.get(uuid=tr.uuid)
 
         self.assert_equal_fields(
             tr,
@@ -347,10 +374,740 @@ class TransactionCRUDTests(TransactionBaseTestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(
-            Transaction.objects.filter(pk=tr.pk).exists(),
+            Transaction.all_objects.filter(pk=tr.pk).exists(),
         )
 
 
+class TransactionPaginationTests(TransactionBaseTestCase):
+    """
+    Test case for the cursor pagination of the transaction list.
+
+    Verifies that following the `next` and `previous` links walks the whole
+    history exactly once in `(date, uuid)` order and that page sizes are
+    bounded.
+    """
+
+    def collect_pages(self, url, link="next"):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data["results"])
+            url = response.data[link]
+        return pages
+
+    def test_pages_cover_all_transactions_in_order(self):
+        url = reverse(self.endpoint_list) + "?page_size=2"
+        pages = self.collect_pages(url)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        uuids = [row["uuid"] for page in pages for row in page]
+        expected = Transaction.objects.filter(user=self.user).order_by("-date", "-uuid")
+        self.assertEqual(uuids, [str(tr.uuid) for tr in expected])
+
+    def test_previous_link_walks_back(self):
+        url = reverse(self.endpoint_list) + "?page_size=2"
+        first = self.client.get(url).data
+        self.assertIsNone(first["previous"])
+
+        second = self.client.get(first["next"]).data
+        back = self.client.get(second["previous"]).data
+        self.assertEqual(back["results"], first["results"])
+
+    def test_page_size_is_capped(self):
+        url = reverse(self.endpoint_list) + "?page_size=4"
+        with self.settings(TRANSACTION_MAX_PAGE_SIZE=3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_invalid_cursor(self):
+        url = reverse(self.endpoint_list) + "?cursor=not-a-cursor"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TransactionQueryCountTests(TransactionBaseTestCase):
+    """
+    Test case for the number of queries run when serializing Transactions.
+
+    Listing and retrieving must take a fixed number of queries no matter how
+    many transactions and related rows are rendered.
+    """
+
+    def test_list_query_count_is_fixed(self):
+        url = reverse(self.endpoint_list)
+        # One query for the throttle counter, one for the ETag, one for the
+        # page and one to prefetch the tag names.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 5)
+
+        TransactionFactory.create_batch(10, user=self.user, currency=self.currency_code)
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 15)
+
+    def test_list_renders_related_slugs(self):
+        response = self.client.get(reverse(self.endpoint_list))
+        rendered = {row["uuid"]: row for row in response.data["results"]}
+
+        for tr in self.transactions:
+            row = rendered[str(tr.uuid)]
+            self.assertEqual(row["vendor"], tr.vendor.name)
+            self.assertEqual(row["branch"], tr.branch.name)
+            self.assertEqual(row["category"], tr.category.name)
+            self.assertEqual(row["currency"], tr.currency.code)
+            self.assertEqual(row["user"], self.user.username)
+            self.assertEqual(row["created_by"], self.user.pk)
+            self.assertEqual(
+                sorted(row["tags"]), sorted(tag.name for tag in tr.tags.all())
+            )
+
+    def test_retrieve_query_count_is_fixed(self):
+        tr = self.transactions[0]
+        url = reverse(self.endpoint_retrieve, kwargs={"pk": tr.pk})
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TransactionConditionalGetTests(TransactionBaseTestCase):
+    """
+    Test case for the ETag and Last-Modified validators of the transaction
+    list and detail.
+
+    A request repeating the validators of an unchanged resource must get a
+    304 after a single query, and any write must change the validators.
+    """
+
+    def test_list_not_modified(self):
+        url = reverse(self.endpoint_list)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+
+        # Check the validators rather than the cached response.
+        response_cache.cache.clear()
+        # The throttle counter and the validators.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_list_etag_changes_on_writes(self):
+        url = reverse(self.endpoint_list)
+        etags = [self.client.get(url)["ETag"]]
+
+        tr = self.transactions[0]
+        tr.comment = "Changed"
+        tr.save()
+        etags.append(self.client.get(url)["ETag"])
+
+        tr.delete()
+        etags.append(self.client.get(url)["ETag"])
+
+        self.assertEqual(len(set(etags)), 3)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_depends_on_the_page(self):
+        url = reverse(self.endpoint_list)
+        first = self.client.get(url, {"page_size": 2})
+        second = self.client.get(first.data["next"])
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+        response = self.client.get(first.data["next"], HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_is_per_user(self):
+        url = reverse(self.endpoint_list)
+        etag = self.client.get(url)["ETag"]
+
+        self.client.force_authenticate(user=UserFactory())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_not_modified(self):
+        tr = self.transactions[0]
+        url = reverse(self.endpoint_retrieve, kwargs={"pk": tr.pk})
+        response = self.client.get(url)
+
+        response_cache.cache.clear()
+        # The throttle counter and the validators.
+        with self.assertNumQueries(2):
+            not_modified = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            )
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+        self.client.patch(url, {"comment": "Changed"}, format="json")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_of_another_user_is_not_found(self):
+        tr = TransactionFactory(currency=self.currency_code)
+        url = reverse(self.endpoint_retrieve, kwargs={"pk": tr.pk})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TransactionBulkCreateTests(TransactionBaseTestCase):
+    """
+    Test case for creating many transactions in a single request.
+
+    Verifies that valid payloads are inserted with their tags, that invalid
+    rows either reject the request or are reported per row, and that the
+    number of queries doesn't grow with the number of rows.
+    """
+
+    endpoint_bulk_create = "api:transaction-bulk-create"
+
+    def bulk_create(self, rows, allow_partial=False):
+        url = reverse(self.endpoint_bulk_create)
+        if allow_partial:
+            url += "?allow_partial=true"
+        return self.client.post(url, rows, format="json")
+
+    def test_bulk_create_transactions(self):
+        rows = [self.create_transaction_data() for _ in range(3)]
+        before = Transaction.objects.count()
+
+        response = self.bulk_create(rows)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 3)
+        self.assertEqual(response.data["errors"], [])
+        self.assertEqual(Transaction.objects.count(), before + 3)
+        for row, created in zip(rows, response.data["created"]):
+            tr = Transaction.objects.get(uuid=created["uuid"])
+            self.assertEqual(tr.created_by, self.user)
+            self.assertEqual(
+                sorted(tag.name for tag in tr.tags.all()), sorted(row["tags"])
+            )
+
+    def test_invalid_row_rejects_the_request(self):
+        rows = [self.create_transaction_data() for _ in range(2)]
+        rows[1]["vendor"] = "missing vendor"
+        before = Transaction.objects.count()
+
+        response = self.bulk_create(rows)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("vendor", response.data[1])
+        self.assertEqual(Transaction.objects.count(), before)
+
+    def test_allow_partial_creates_valid_rows(self):
+        rows = [self.create_transaction_data() for _ in range(3)]
+        rows[1]["currency"] = "XXX"
+        before = Transaction.objects.count()
+
+        response = self.bulk_create(rows, allow_partial=True)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 2)
+        self.assertEqual(len(response.data["errors"]), 1)
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        self.assertIn("currency", response.data["errors"][0]["errors"])
+        self.assertEqual(Transaction.objects.count(), before + 2)
+
+    def test_query_count_does_not_depend_on_rows(self):
+        few = [self.create_transaction_data() for _ in range(2)]
+        many = [self.create_transaction_data() for _ in range(6)]
+        # The monthly rollup is written once per month, category, type and
+        # currency, keep those the same in both payloads.
+        for row in few + many:
+            row.update(date="2024-01-15", type=Transaction.EXPENSE)
+        # Create the rollup row up front so both requests only update it.
+        self.bulk_create(few)
+
+        with CaptureQueriesContext(connection) as few_queries:
+            self.bulk_create(few)
+        with CaptureQueriesContext(connection) as many_queries:
+            self.bulk_create(many)
+
+        self.assertEqual(len(few_queries), len(many_queries))
+
+
+class TransactionTagWriteTests(TransactionBaseTestCase):
+    """
+    Test case for the tag writes done when creating and updating
+    Transactions.
+
+    Verifies that unknown tags are created once, that updates only touch the
+    links that changed and that the number of queries doesn't depend on the
+    number of tags.
+    """
+
+    def patch_tags(self, tr, tags):
+        url = reverse(self.endpoint_update, kwargs={"pk": str(tr.uuid)})
+        return self.client.patch(url, {"tags": tags}, format="json")
+
+    def test_create_with_new_tags(self):
+        data = self.create_transaction_data()
+        data["tags"] = ["brand new tag", "brand new tag", "another new tag"]
+
+        response = self.client.post(reverse(self.endpoint_create), data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(name="brand new tag").count(), 1)
+        created_tr = Transaction.objects.get(uuid=response.data["uuid"])
+        self.assertEqual(
+            sorted(tag.name for tag in created_tr.tags.all()),
+            ["another new tag", "brand new tag"],
+        )
+
+    def test_update_only_touches_changed_links(self):
+        tags = TagFactory.create_batch(3)
+        tr = TransactionFactory(user=self.user, tags=tags)
+        kept = {
+            link.tag_id: link.pk
+            for link in TransactionTag.objects.filter(transaction=tr)
+            if link.tag_id != tags[0].pk
+        }
+
+        response = self.patch_tags(tr, [tags[1].name, tags[2].name, "added"])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        links = TransactionTag.objects.filter(transaction=tr).select_related("tag")
+        self.assertEqual(
+            sorted(link.tag.name for link in links),
+            sorted([tags[1].name, tags[2].name, "added"]),
+        )
+        for link in links:
+            if link.tag_id in kept:
+                self.assertEqual(kept[link.tag_id], link.pk)
+
+    def test_update_with_empty_list_clears_tags(self):
+        tr = TransactionFactory(user=self.user)
+
+        response = self.patch_tags(tr, [])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(tr.tags.exists())
+
+    def test_update_query_count_does_not_depend_on_tags(self):
+        few = TransactionFactory(user=self.user, tags=[])
+        many = TransactionFactory(user=self.user, tags=[])
+
+        with CaptureQueriesContext(connection) as few_queries:
+            self.patch_tags(few, [f"few_{n}" for n in range(2)])
+        with CaptureQueriesContext(connection) as many_queries:
+            self.patch_tags(many, [f"many_{n}" for n in range(10)])
+
+        self.assertEqual(len(few_queries), len(many_queries))
+
+
+class TransactionSearchTests(TransactionBaseTestCase):
+    """
+    Test case for the free text search of the transaction listing.
+
+    Matches must be ranked, kept up to date on writes and combined with the
+    user and date filters.
+    """
+
+    def create_transaction(self, **kwargs):
+        values = {
+            "user": self.user,
+            "date": "2024-03-10",
+            "currency": self.currency_code,
+            "item": "Stapler",
+            "brand": "Acme",
+            "comment": "",
+        }
+        values.update(kwargs)
+        return TransactionFactory(**values)
+
+    def search(self, text, **params):
+        response = self.client.get(
+            reverse(self.endpoint_list), {"search": text, **params}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["uuid"] for row in response.data["results"]]
+
+    def test_ranks_item_matches_first(self):
+        in_comment = self.create_transaction(comment="Bought some coffee beans")
+        in_item = self.create_transaction(item="Coffee")
+        in_brand = self.create_transaction(brand="Coffee Roasters")
+
+        self.assertEqual(
+            self.search("coffee"),
+            [str(in_item.uuid), str(in_brand.uuid), str(in_comment.uuid)],
+        )
+
+    def test_matches_word_forms(self):
+        tr = self.create_transaction(comment="Two coffees for the team")
+        self.assertEqual(self.search("coffee"), [str(tr.uuid)])
+
+    def test_combines_with_user_and_date_filters(self):
+        march = self.create_transaction(item="Coffee", date="2024-03-10")
+        self.create_transaction(item="Coffee", date="2024-04-10")
+        TransactionFactory(item="Coffee", currency=self.currency_code)
+
+        results = self.search("coffee", date_from="2024-03-01", date_to="2024-03-31")
+
+        self.assertEqual(results, [str(march.uuid)])
+
+    def test_pages_through_ranked_results(self):
+        expected = set()
+        for comment in ("coffee", "coffee coffee", "coffee and tea", "tea"):
+            expected.add(str(self.create_transaction(comment=comment).uuid))
+        expected.discard(str(Transaction.objects.get(comment="tea").uuid))
+
+        url = reverse(self.endpoint_list) + "?search=coffee&page_size=1"
+        uuids = []
+        while url:
+            response = self.client.get(url)
+            uuids.extend(row["uuid"] for row in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(len(uuids), 3)
+        self.assertEqual(set(uuids), expected)
+
+    def test_search_vector_follows_writes(self):
+        tr = self.create_transaction(item="Stapler")
+        url = reverse(self.endpoint_retrieve, kwargs={"pk": tr.pk})
+
+        self.client.patch(url, {"item": "Espresso machine"}, format="json")
+        self.assertEqual(self.search("espresso"), [str(tr.uuid)])
+        self.assertEqual(self.search("stapler"), [])
+
+        Transaction.objects.filter(pk=tr.pk).update(brand="Lavazza")
+        self.assertEqual(self.search("lavazza"), [str(tr.uuid)])
+
+    def test_misspelled_words(self):
+        tr = self.create_transaction(item="Cappuccino")
+        if not has_trigram_extension():
+            self.assertEqual(self.search("capuccino"), [])
+            self.skipTest("pg_trgm is not installed")
+        self.assertEqual(self.search("capuccino"), [str(tr.uuid)])
+
+
+class TransactionBulkDeleteTests(TransactionBaseTestCase):
+    """
+    Test case for the bulk soft delete and undelete endpoint.
+    """
+
+    endpoint_bulk_delete = "api:transaction-bulk-delete"
+
+    def post(self, data):
+        return self.client.post(reverse(self.endpoint_bulk_delete), data, format="json")
+
+    def test_soft_deletes_and_undeletes(self):
+        uuids = [str(tr.uuid) for tr in self.transactions[:3]]
+
+        response = self.post({"uuids": uuids})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"updated": 3})
+        listed = self.client.get(reverse(self.endpoint_list)).data["results"]
+        self.assertEqual(len(listed), 2)
+        deleted = Transaction.all_objects.filter(pk__in=uuids)
+        self.assertTrue(all(tr.is_deleted for tr in deleted))
+        self.assertTrue(all(tr.updated_by == self.user for tr in deleted))
+
+        response = self.post({"uuids": uuids[:2], "is_deleted": False})
+        self.assertEqual(response.data, {"updated": 2})
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 4)
+
+    def test_only_touches_the_users_transactions(self):
+        other = TransactionFactory(currency=self.currency_code)
+
+        response = self.post({"uuids": [str(other.uuid), str(uuid.uuid4())]})
+
+        self.assertEqual(response.data, {"updated": 0})
+        self.assertTrue(Transaction.objects.filter(pk=other.pk).exists())
+
+    def test_deleted_transactions_can_be_retrieved(self):
+        tr = self.transactions[0]
+        self.post({"uuids": [str(tr.uuid)]})
+
+        url = reverse(self.endpoint_retrieve, kwargs={"pk": tr.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["is_deleted"])
+
+        listed = self.client.get(reverse(self.endpoint_list), {"is_deleted": "true"})
+        self.assertEqual(
+            [row["uuid"] for row in listed.data["results"]], [str(tr.uuid)]
+        )
+
+    def test_invalid_payloads(self):
+        for data in ({"uuids": []}, {"uuids": ["not-a-uuid"]}, {}):
+            with self.subTest(data=data):
+                response = self.post(data)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.settings(TRANSACTION_BULK_MAX_ROWS=2):
+            response = self.post({"uuids": [str(uuid.uuid4()) for _ in range(3)]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionBulkUpdateTests(TransactionBaseTestCase):
+    """
+    Test case for the bulk update endpoint.
+    """
+
+    endpoint_bulk_update = "api:transaction-bulk-update"
+
+    def patch(self, data):
+        return self.client.patch(
+            reverse(self.endpoint_bulk_update), data, format="json"
+        )
+
+    def test_updates_by_uuids_in_one_statement(self):
+        uuids = [str(tr.uuid) for tr in self.transactions[:3]]
+        other_user = UserFactory()
+        before = timezone.now()
+
+        self.client.force_authenticate(user=other_user)
+        self.assertEqual(self.patch({"uuids": uuids, "set": {}}).status_code, 400)
+        response = self.patch({"uuids": uuids, "set": {"category": self.category.name}})
+        self.assertEqual(response.data, {"updated": 0})
+
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(
+                {
+                    "uuids": uuids,
+                    "set": {
+                        "category": self.category.name,
+                        "vendor": None,
+                        "payment_method": "Card",
+                    },
+                }
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"updated": 3})
+        updates = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "transactions_transaction"')
+        ]
+        self.assertEqual(len(updates), 1)
+        for tr in Transaction.objects.filter(pk__in=uuids):
+            self.assertEqual(tr.category, self.category)
+            self.assertIsNone(tr.vendor)
+            self.assertEqual(tr.payment_method, "Card")
+            self.assertEqual(tr.updated_by, self.user)
+            self.assertGreaterEqual(tr.updated_at, before)
+        untouched = Transaction.objects.get(pk=self.transactions[3].pk)
+        self.assertNotEqual(untouched.payment_method, "Card")
+
+    def test_updates_by_filter(self):
+        TransactionFactory(user=self.user, type=Transaction.INCOME)
+        expenses = Transaction.objects.filter(
+            user=self.user, type=Transaction.EXPENSE
+        ).count()
+
+        response = self.patch(
+            {
+                "filter": {"type": Transaction.EXPENSE},
+                "set": {"currency": self.currency_code.code},
+            }
+        )
+
+        self.assertEqual(response.data, {"updated": expenses})
+        self.assertEqual(
+            Transaction.objects.filter(
+                user=self.user, currency=self.currency_code
+            ).count(),
+            expenses,
+        )
+        self.assertFalse(
+            Transaction.objects.filter(
+                user=self.user, type=Transaction.INCOME, currency=self.currency_code
+            ).exists()
+        )
+
+    @override_settings(TRANSACTION_BULK_MAX_ROWS=4)
+    def test_filter_matching_too_many_rows_is_rejected(self):
+        uuids = [str(tr.uuid) for tr in self.transactions]
+        payment_methods = set(
+            Transaction.objects.values_list("payment_method", flat=True)
+        )
+
+        for data in ({"filter": {}}, {"uuids": uuids}):
+            with self.subTest(data=data):
+                response = self.patch({**data, "set": {"payment_method": "Card"}})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            set(Transaction.objects.values_list("payment_method", flat=True)),
+            payment_methods,
+        )
+
+    def test_invalid_payloads(self):
+        uuids = [str(self.transactions[0].uuid)]
+        cases = [
+            {"set": {"type": Transaction.INCOME}},
+            {"uuids": uuids, "filter": {}, "set": {"type": Transaction.INCOME}},
+            {"uuids": uuids},
+            {"uuids": uuids, "set": {}},
+            {"uuids": uuids, "set": {"type": "Gift"}},
+            {"uuids": uuids, "set": {"category": "No such category"}},
+            {"filter": {"amount_min": "5", "amount_max": "1"}, "set": {"type": ""}},
+        ]
+        for data in cases:
+            with self.subTest(data=data):
+                response = self.patch(data)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Fields outside of the bulk update set are ignored, not written.
+        response = self.patch(
+            {"uuids": uuids, "set": {"type": Transaction.INCOME, "amount": "1.00"}}
+        )
+        self.assertEqual(response.data, {"updated": 1})
+        self.assertEqual(
+            Transaction.objects.get(pk=uuids[0]).amount, self.transactions[0].amount
+        )
+
+
+@override_settings(TRANSACTION_SYNC_LAG=0)
+class TransactionChangesTests(TransactionBaseTestCase):
+    """
+    Test case for the delta sync feed.
+
+    Following the watermarks must hand out every change exactly once, with
+    soft deleted rows as tombstones.
+    """
+
+    endpoint_changes = "api:transaction-changes"
+
+    def sync(self, since=None, page_size=None):
+        """
+        Follow the feed from `since` until it's drained, returning the
+        responses and the last watermark.
+        """
+        responses = []
+        while True:
+            params = {}
+            if since:
+                params["since"] = since
+            if page_size:
+                params["page_size"] = page_size
+            response = self.client.get(reverse(self.endpoint_changes), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            responses.append(response.data)
+            since = response.data["watermark"]
+            if not response.data["has_more"]:
+                return responses, since
+
+    def test_initial_sync_returns_everything_once(self):
+        Transaction.objects.filter(user=self.user).update(updated_at=timezone.now())
+        responses, _ = self.sync(page_size=2)
+
+        self.assertEqual(len(responses), 3)
+        uuids = [row["uuid"] for data in responses for row in data["results"]]
+        self.assertEqual(len(uuids), 5)
+        self.assertEqual(set(uuids), {str(tr.uuid) for tr in self.transactions})
+
+    def test_returns_only_changes_after_the_watermark(self):
+        _, watermark = self.sync()
+        updated, deleted = self.transactions[0], self.transactions[1]
+        updated.comment = "Changed"
+        updated.save()
+        deleted.soft_delete()
+        TransactionFactory(currency=self.currency_code)
+
+        responses, new_watermark = self.sync(since=watermark)
+
+        self.assertEqual(len(responses), 1)
+        data = responses[0]
+        self.assertEqual([row["uuid"] for row in data["results"]], [str(updated.uuid)])
+        self.assertEqual(data["results"][0]["comment"], "Changed")
+        self.assertEqual([row["uuid"] for row in data["deleted"]], [str(deleted.uuid)])
+        self.assertIsNotNone(data["deleted"][0]["deleted_at"])
+
+        data = self.sync(since=new_watermark)[0][0]
+        self.assertEqual(data["results"], [])
+        self.assertEqual(data["deleted"], [])
+        self.assertEqual(data["watermark"], new_watermark)
+
+    def test_undelete_is_a_change(self):
+        tr = self.transactions[0]
+        tr.soft_delete()
+        _, watermark = self.sync()
+
+        tr.undelete()
+        data = self.sync(since=watermark)[0][0]
+
+        self.assertEqual([row["uuid"] for row in data["results"]], [str(tr.uuid)])
+        self.assertEqual(data["deleted"], [])
+
+    def test_recent_writes_are_held_back(self):
+        with self.settings(TRANSACTION_SYNC_LAG=60):
+            data = self.sync()[0][0]
+        self.assertEqual(data["results"], [])
+        self.assertIsNone(data["watermark"])
+
+    def test_invalid_watermark(self):
+        response = self.client.get(
+            reverse(self.endpoint_changes), {"since": "not-a-watermark"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionExportTests(TransactionBaseTestCase):
+    """
+    Test case for the streaming CSV and NDJSON exports.
+    """
+
+    endpoint_export = "api:transaction-export"
+
+    def export(self, export_format, **params):
+        url = reverse(self.endpoint_export, kwargs={"export_format": export_format})
+        response = self.client.get(url, params)
+        if response.status_code == status.HTTP_200_OK:
+            self.assertTrue(response.streaming)
+            content = b"".join(response.streaming_content).decode()
+            return response, content
+        return response, None
+
+    def test_csv_export(self):
+        response, content = self.export("csv")
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 5)
+        dates = [row["date"] for row in rows]
+        self.assertEqual(dates, sorted(dates))
+
+        tr = self.transactions[0]
+        row = next(row for row in rows if row["uuid"] == str(tr.uuid))
+        self.assertEqual(row["vendor"], tr.vendor.name)
+        self.assertEqual(row["parent_category"], tr.category.parent.name)
+        self.assertEqual(
+            row["tags"], "|".join(sorted(tag.name for tag in tr.tags.all()))
+        )
+
+    def test_ndjson_export_with_date_range(self):
+        saved = Transaction.objects.filter(user=self.user).order_by("date", "uuid")
+        dates = [tr.date for tr in saved]
+        response, content = self.export(
+            "ndjson", date_from=dates[1].isoformat(), date_to=dates[3].isoformat()
+        )
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["date"], dates[1].isoformat())
+        self.assertEqual(rows[0]["uuid"], str(saved[1].uuid))
+        self.assertEqual(rows[0]["amount"], str(saved[1].amount))
+
+    def test_export_skips_soft_deleted(self):
+        self.transactions[0].soft_delete()
+        _, content = self.export("ndjson")
+        self.assertEqual(len(content.splitlines()), 4)
+
+    def test_unknown_format(self):
+        response, _ = self.export("xlsx")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_date_range(self):
+        response, _ = self.export("csv", date_from="2023-02-01", date_to="2023-01-01")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class TransactionUnauthorizedTests(TransactionBaseTestCase):
     """
     Test case for unauthorized access to Transactions.
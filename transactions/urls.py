@@ -1,6 +1,21 @@
 from django.urls import path
 
-from .views import TransactionListCreateView, TransactionRetrieveUpdateDestroyView
+from .async_views import AsyncTransactionDetailView, AsyncTransactionListView
+from .views import (
+    ConvertedTotalsView,
+    MonthlySpendView,
+    ReceiptUploadCreateView,
+    ReceiptUploadDetailView,
+    ReferenceCacheStatsView,
+    ResponseCacheStatsView,
+    TransactionBulkCreateView,
+    TransactionBulkDeleteView,
+    TransactionBulkUpdateView,
+    TransactionChangesView,
+    TransactionExportView,
+    TransactionListCreateView,
+    TransactionRetrieveUpdateDestroyView,
+)
 
 app_name = "transactions"
 
@@ -10,10 +25,75 @@ urlpatterns = [
         TransactionListCreateView.as_view(),
         name="transaction-list-create",
     ),
+    path(
+        "transactions/bulk/",
+        TransactionBulkCreateView.as_view(),
+        name="transaction-bulk-create",
+    ),
+    path(
+        "transactions/bulk/delete/",
+        TransactionBulkDeleteView.as_view(),
+        name="transaction-bulk-delete",
+    ),
+    path(
+        "transactions/bulk/update/",
+        TransactionBulkUpdateView.as_view(),
+        name="transaction-bulk-update",
+    ),
+    path(
+        "transactions/changes/",
+        TransactionChangesView.as_view(),
+        name="transaction-changes",
+    ),
+    path(
+        "transactions/export/<str:export_format>/",
+        TransactionExportView.as_view(),
+        name="transaction-export",
+    ),
     path(
         "transactions/<uuid:pk>/",
         TransactionRetrieveUpdateDestroyView.as_view(),
         name="transaction-retrieve-update-destroy",
     ),
+    path(
+        "async/transactions/",
+        AsyncTransactionListView.as_view(),
+        name="transaction-list-async",
+    ),
+    path(
+        "async/transactions/<uuid:pk>/",
+        AsyncTransactionDetailView.as_view(),
+        name="transaction-detail-async",
+    ),
+    path(
+        "reports/monthly/",
+        MonthlySpendView.as_view(),
+        name="monthly-spend",
+    ),
+    path(
+        "reports/converted/",
+        ConvertedTotalsView.as_view(),
+        name="converted-totals",
+    ),
+    path(
+        "receipts/uploads/",
+        ReceiptUploadCreateView.as_view(),
+        name="receipt-upload-create",
+    ),
+    path(
+        "receipts/uploads/<uuid:pk>/",
+        ReceiptUploadDetailView.as_view(),
+        name="receipt-upload-detail",
+    ),
+    path(
+        "cache/reference/",
+        ReferenceCacheStatsView.as_view(),
+        name="reference-cache-stats",
+    ),
+    path(
+        "cache/responses/",
+        ResponseCacheStatsView.as_view(),
+        name="response-cache-stats",
+    ),
     path("", TransactionListCreateView.as_view(), name="transaction-home"),
 ]
@@ -1,28 +1,117 @@
 """
 Transaction views from serializers
 """
+import re
+
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.http import StreamingHttpResponse
 from rest_framework import status
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import (
+    CreateAPIView,
+    GenericAPIView,
+    ListCreateAPIView,
+    RetrieveAPIView,
+    RetrieveUpdateDestroyAPIView,
+)
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .bulk import (
+    TooManyRows,
+    soft_delete_transactions,
+    undelete_transactions,
+    update_transactions,
+)
+from .cache import reference_cache
+from .conditional import (
+    TransactionDetailValidatorsMixin,
+    TransactionListValidatorsMixin,
+)
+from .exchange import reporting_amount
+from .exports import EXPORT_FORMATS, get_export_rows
+from .filters import filter_transactions
+from .models import MonthlySpend, ReceiptUpload, Transaction
+from .pagination import TransactionCursorPagination
+from .receipts import IncompleteChunk, UploadConflict, append_chunk
+from .response_cache import ResponseCacheMixin, response_cache
+from .serializers import (
+    ConvertedTotalSerializer,
+    MonthlySpendFilterSerializer,
+    MonthlySpendSerializer,
+    ReceiptUploadSerializer,
+    TransactionBulkDeleteSerializer,
+    TransactionBulkUpdateSerializer,
+    TransactionExportFilterSerializer,
+    TransactionListFilterSerializer,
+    TransactionSerializer,
+    TransactionTombstoneSerializer,
+)
+from .sync import InvalidWatermark, decode_watermark, encode_watermark, get_changes
+
+# `Content-Range` header of a receipt upload chunk
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class TransactionListQueryMixin:
+    """
+    Builds the queryset and ordering of a transaction listing from the
+    filters of `TransactionListFilterSerializer` in the query string.
+    """
+
+    def get_filters(self):
+        """
+        Return the validated listing filters of the request.
+        """
+        if not hasattr(self, "_filters"):
+            filters = TransactionListFilterSerializer(data=self.request.query_params)
+            filters.is_valid(raise_exception=True)
+            self._filters = filters.validated_data
+        return self._filters
 
-from .models import Transaction
-from .serializers import TransactionSerializer
+    def get_ordering(self):
+        filters = self.get_filters()
+        if filters.get("ordering"):
+            return filters["ordering"]
+        return "-rank" if filters.get("search") else "-date"
+
+    def get_queryset(self):
+        filters = self.get_filters()
+        # Soft deleted rows are only listed when asked for with `is_deleted`.
+        if filters.get("is_deleted") is None:
+            manager = Transaction.objects
+        else:
+            manager = Transaction.all_objects
+        queryset = filter_transactions(manager.filter(user=self.request.user), filters)
+        return TransactionSerializer.optimize_queryset(queryset)
 
 
-class TransactionListCreateView(ListCreateAPIView):
+class TransactionListCreateView(
+    TransactionListQueryMixin,
+    ResponseCacheMixin,
+    TransactionListValidatorsMixin,
+    ListCreateAPIView,
+):
     """
     Handles the creation of new transactions and the listing of all
     transactions.
+
+    Listings are paginated newest first with an opaque `(date, uuid)` cursor,
+    and carry an ETag and Last-Modified so an unchanged listing is answered
+    with a 304. Rendered listings are kept in the response cache until the
+    user's transactions change.
+
+    Accepts the filters of `TransactionListFilterSerializer`, `search` to get
+    the transactions matching a free text, best matches first, and
+    `ordering` to sort by another indexed field.
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = TransactionSerializer
-
-    def get_queryset(self):
-        return Transaction.objects.filter(
-            user=self.request.user,
-        ).prefetch_related("tags")
+    pagination_class = TransactionCursorPagination
 
     def perform_create(self, serializer):
         """
@@ -34,18 +123,24 @@ class TransactionListCreateView(ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
-class TransactionRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
+class TransactionRetrieveUpdateDestroyView(
+    ResponseCacheMixin, TransactionDetailValidatorsMixin, RetrieveUpdateDestroyAPIView
+):
     """
     Handles retrieving, updating and destroying a single transaction.
+
+    Retrievals carry an ETag and Last-Modified so an unchanged transaction is
+    answered with a 304, and kept in the response cache. Soft deleted
+    transactions can still be retrieved and undeleted.
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = TransactionSerializer
 
     def get_queryset(self):
-        return Transaction.objects.filter(
-            user=self.request.user,
-        ).prefetch_related("tags")
+        return TransactionSerializer.optimize_queryset(
+            Transaction.all_objects.filter(user=self.request.user)
+        )
 
     def update(self, request, *args, **kwargs):
         """
@@ -74,3 +169,382 @@ class TransactionRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
         """
         if self.request.data.get("is_deleted", None) is None:
             serializer.save(updated_by=self.request.user)
+
+
+class TransactionBulkCreateView(GenericAPIView):
+    """
+    Handles the creation of many transactions from a single JSON array.
+
+    All rows are validated first and the valid ones are inserted in one
+    atomic block. By default any invalid row rejects the whole request; with
+    `?allow_partial=true` the valid rows are created and the invalid ones are
+    reported by their index in the payload.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = TransactionSerializer
+
+    def allow_partial(self):
+        value = self.request.query_params.get("allow_partial", "")
+        return value.lower() in ("1", "true", "yes")
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["allow_partial"] = self.allow_partial()
+        return context
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.TRANSACTION_BULK_MAX_ROWS,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        if not serializer.validated_data:
+            return Response(
+                {"created": [], "errors": serializer.row_errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer.save(created_by=request.user)
+        return Response(
+            {"created": serializer.data, "errors": serializer.row_errors},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class TransactionChangesView(APIView):
+    """
+    Returns the user's transactions changed since a watermark, for clients
+    that keep a local copy.
+
+    `?since=` takes the `watermark` of the previous response, without it the
+    feed starts from the beginning. Live rows are rendered in full under
+    `results` and soft deleted ones as tombstones under `deleted`; when
+    `has_more` is set the client should ask again right away with the new
+    watermark. Hard deletes aren't reported, clients that sync should delete
+    with `is_deleted`.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        token = request.query_params.get("since")
+        watermark = None
+        if token:
+            try:
+                watermark = decode_watermark(token)
+            except InvalidWatermark:
+                raise ValidationError({"since": ["Invalid watermark."]})
+
+        limit = TransactionCursorPagination().get_page_size(request)
+        rows, has_more = get_changes(
+            TransactionSerializer.optimize_queryset(
+                Transaction.all_objects.filter(user=request.user)
+            ),
+            watermark,
+            limit,
+        )
+        context = {"request": request, "view": self}
+        return Response(
+            {
+                "results": TransactionSerializer(
+                    [row for row in rows if not row.is_deleted],
+                    many=True,
+                    context=context,
+                ).data,
+                "deleted": TransactionTombstoneSerializer(
+                    [row for row in rows if row.is_deleted], many=True
+                ).data,
+                "watermark": encode_watermark(rows[-1]) if rows else token,
+                "has_more": has_more,
+            }
+        )
+
+
+class TransactionBulkDeleteView(GenericAPIView):
+    """
+    Soft deletes (or undeletes, with `"is_deleted": false`) the user's
+    transactions with the given uuids in a single statement.
+
+    Unknown uuids and transactions already in the requested state are
+    skipped, the response has the number of transactions changed.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = TransactionBulkDeleteSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        queryset = Transaction.all_objects.filter(
+            user=request.user, pk__in=serializer.validated_data["uuids"]
+        )
+        if serializer.validated_data["is_deleted"]:
+            updated = soft_delete_transactions(queryset, deleted_by=request.user)
+        else:
+            updated = undelete_transactions(queryset, undeleted_by=request.user)
+        return Response({"updated": updated})
+
+
+class TransactionBulkUpdateView(GenericAPIView):
+    """
+    Sets the category, vendor, branch, payment method, currency or type of
+    many of the user's transactions in a single statement.
+
+    The transactions are given by `uuids`, or by a `filter` with the same
+    fields as the listing's query parameters, soft deleted ones included
+    only when asked for with `is_deleted`, and at most
+    `TRANSACTION_BULK_MAX_ROWS` of them. The response has the number of
+    transactions changed.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = TransactionBulkUpdateSerializer
+
+    def patch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if "uuids" in serializer.validated_data:
+            queryset = Transaction.all_objects.filter(
+                user=request.user, pk__in=serializer.validated_data["uuids"]
+            )
+        else:
+            filters = serializer.validated_data["filter"]
+            if filters.get("is_deleted") is None:
+                manager = Transaction.objects
+            else:
+                manager = Transaction.all_objects
+            queryset = filter_transactions(manager.filter(user=request.user), filters)
+
+        try:
+            updated = update_transactions(
+                queryset,
+                serializer.validated_data["set"],
+                updated_by=request.user,
+                max_rows=settings.TRANSACTION_BULK_MAX_ROWS,
+            )
+        except TooManyRows as exc:
+            raise ValidationError(
+                {
+                    "filter": f"Matches more than {exc.max_rows} transactions, "
+                    "narrow it down."
+                }
+            )
+        return Response({"updated": updated})
+
+
+class TransactionExportView(APIView):
+    """
+    Streams the user's whole transaction history as CSV or NDJSON.
+
+    Rows are written while they are read from the database, so the export
+    takes the same memory for ten rows or a million. Accepts `date_from` and
+    `date_to` to export a date range.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, export_format, *args, **kwargs):
+        if export_format not in EXPORT_FORMATS:
+            raise NotFound(f"Unknown export format '{export_format}'.")
+        stream, content_type = EXPORT_FORMATS[export_format]
+
+        filters = TransactionExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+
+        rows = get_export_rows(request.user, **filters.validated_data)
+        response = StreamingHttpResponse(stream(rows), content_type=content_type)
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="transactions.{export_format}"'
+        return response
+
+
+class MonthlySpendView(APIView):
+    """
+    Returns the user's totals per month, category (or parent category), type
+    and currency.
+
+    Totals are read from the monthly rollup, so the cost depends on the
+    number of months and categories, not on the number of transactions.
+    Accepts `date_from`, `date_to` and `group_by=category|parent_category`.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        filters = MonthlySpendFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        date_from = filters.validated_data.get("date_from")
+        date_to = filters.validated_data.get("date_to")
+        group_by = filters.validated_data["group_by"]
+
+        rows = MonthlySpend.objects.filter(user=request.user, count__gt=0)
+        if date_from is not None:
+            rows = rows.filter(month__gte=date_from.replace(day=1))
+        if date_to is not None:
+            rows = rows.filter(month__lte=date_to)
+
+        group_field = (
+            "category__parent__name"
+            if group_by == "parent_category"
+            else "category__name"
+        )
+        rows = (
+            rows.values("month", "type")
+            .annotate(
+                **{group_by: F(group_field), "currency_code": F("currency__code")}
+            )
+            .values("month", group_by, "type", "currency_code")
+            .annotate(total=Sum("total"), count=Sum("count"))
+            .order_by("month", group_by, "type", "currency_code")
+        )
+        data = [{**row, "currency": row.pop("currency_code")} for row in rows]
+        serializer = MonthlySpendSerializer(
+            data, many=True, context={"group_by": group_by}
+        )
+        return Response(serializer.data)
+
+
+class ConvertedTotalsView(APIView):
+    """
+    Returns the user's totals per month and type in their base currency.
+
+    Amounts are converted in the database with the rate in force on each
+    transaction's date. Transactions without a rate for their day are left
+    out of the total and counted as `unconverted`. Accepts `date_from` and
+    `date_to`.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        base_currency = request.user.base_currency
+        if base_currency is None:
+            return Response(
+                {"detail": "Set a base currency to get converted totals."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        filters = TransactionExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        date_from = filters.validated_data.get("date_from")
+        date_to = filters.validated_data.get("date_to")
+
+        rows = Transaction.objects.filter(user=request.user, is_deleted=False)
+        if date_from is not None:
+            rows = rows.filter(date__gte=date_from)
+        if date_to is not None:
+            rows = rows.filter(date__lte=date_to)
+
+        rows = (
+            rows.annotate(
+                month=TruncMonth("date"),
+                converted=reporting_amount(base_currency.pk),
+            )
+            .values("month", "type")
+            .annotate(
+                total=Sum("converted", default=0),
+                count=Count("pk"),
+                unconverted=Count("pk", filter=Q(converted__isnull=True)),
+            )
+            .order_by("month", "type")
+        )
+        serializer = ConvertedTotalSerializer(rows, many=True)
+        return Response({"currency": base_currency.code, "results": serializer.data})
+
+
+class ReceiptUploadCreateView(CreateAPIView):
+    """
+    Starts a chunked receipt upload, announcing its filename, content type
+    and size, and optionally the transaction it belongs to.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReceiptUploadSerializer
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, created_by=self.request.user)
+
+
+class ReceiptUploadDetailView(RetrieveAPIView):
+    """
+    Reports how much of a receipt upload was received, and receives its
+    chunks.
+
+    Chunks are sent with `PUT`, the raw bytes as the body and their position
+    in a `Content-Range: bytes <first>-<last>/<size>` header. They are
+    streamed to disk, never held in memory whole. A chunk that doesn't start
+    at the received offset is answered with a 409 and the offset to resume
+    from. The last chunk stores the receipt, deduplicated by content, and
+    attaches it to the upload's transaction.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReceiptUploadSerializer
+
+    def get_queryset(self):
+        return ReceiptUpload.objects.filter(user=self.request.user).select_related(
+            "blob"
+        )
+
+    def get_content_range(self, request, upload):
+        """
+        Return the offset and length of the chunk in the request.
+        """
+        match = CONTENT_RANGE.fullmatch(request.headers.get("Content-Range", ""))
+        if match is None:
+            raise ValidationError(
+                {"Content-Range": "Expected 'bytes <first>-<last>/<size>'."}
+            )
+        first, last, size = (int(value) for value in match.groups())
+        if size != upload.size or not first <= last < size:
+            raise ValidationError(
+                {"Content-Range": f"Expected a range within {upload.size} bytes."}
+            )
+        length = last - first + 1
+        if int(request.META.get("CONTENT_LENGTH") or 0) != length:
+            raise ValidationError(
+                {"Content-Range": "The range doesn't match the body length."}
+            )
+        return first, length
+
+    def put(self, request, *args, **kwargs):
+        upload = self.get_object()
+        offset, length = self.get_content_range(request, upload)
+        try:
+            upload = append_chunk(upload.pk, request.stream, offset, length)
+        except UploadConflict as exc:
+            return Response({"received": exc.received}, status=status.HTTP_409_CONFLICT)
+        except IncompleteChunk:
+            raise ValidationError("The request body ended before the chunk.")
+        except ReceiptUpload.DoesNotExist:
+            raise NotFound("The upload expired.")
+        return Response(self.get_serializer(upload).data)
+
+
+class ReferenceCacheStatsView(APIView):
+    """
+    Exposes the hit and miss counters of this process' reference cache.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(reference_cache.stats())
+
+
+class ResponseCacheStatsView(APIView):
+    """
+    Exposes the hit and miss counters of this process' response cache.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(response_cache.stats())